@@ -0,0 +1,18 @@
+import formato_salida
+import memoria_acotada
+import metricas
+import texto_paginas
+
+# Opciones comunes a todos los scripts de extracción. Se quitan de sys.argv antes
+# de que cada script valide sus argumentos, así que pueden ir en cualquier posición:
+#   --timings, --perfil=<archivo>    métricas por etapa (metricas.py)
+#   --motor=<motor>                  motor de texto (texto_paginas.py)
+#   --paralelo[=N]                   extracción de páginas en N procesos (texto_paginas.py)
+#   --compact[=json|columnas|ndjson] formato de salida (formato_salida.py)
+#   --memoria-max=<MB>               modo de memoria acotada (memoria_acotada.py)
+
+def procesar(argumentos):
+    """Aplica las opciones comunes y regresa los argumentos restantes"""
+    return memoria_acotada.configurar(
+        formato_salida.configurar(texto_paginas.configurar(metricas.configurar(argumentos)))
+    )
@@ -0,0 +1,375 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import texto_paginas
+from texto_paginas import textos_paginas, unir_textos
+import extraer_datos_syscom
+import extraer_datos_grupo_dice
+import extraer_datos_tvc
+import extraer_datos_portenntum
+import extraer_datos_portenntum_aruba
+
+# Mide por separado la decodificación del PDF y el parseo del texto de cada
+# proveedor, con PDFs reales del repositorio y con cotizaciones sintéticas
+# generadas con el formato de cada proveedor. Con --importacion mide el
+# arranque (-X importtime) de extractores.py y de cada módulo de proveedor.
+
+DIRECTORIO_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+DIRECTORIO_SERVER = os.path.join(DIRECTORIO_SCRIPTS, '..')
+PDFS_REPOSITORIO = [
+    os.path.join(DIRECTORIO_SERVER, 'pdfs', '*.pdf'),
+    os.path.join(DIRECTORIO_SERVER, 'uploads', 'documentos', '*.pdf'),
+    os.path.join(DIRECTORIO_SERVER, '..', 'inventario-crud', 'tests', 'OrdenCompraTest', '*.pdf'),
+]
+DIRECTORIO_RESULTADOS = os.path.join(DIRECTORIO_SERVER, 'data', 'benchmarks')
+TAMANOS = [10, 100, 1000, 10000]
+LINEAS_POR_PAGINA = 50
+
+# ==== GENERADORES SINTÉTICOS ====
+
+def generar_syscom(lineas, semilla=1):
+    r = random.Random(semilla)
+    texto = [
+        "FOLIO: 123456", "FECHA: 01/02/2025",
+        "DATOS FISCALES DATOS DE ENVÍO", "EMPRESA SA DE CV EMBARCAR",
+        "RFC: ABC010203XYZ", "EJECUTIVO VENTAS: JUAN PEREZ EMAIL: juan@empresa.mx",
+        "CANT UNIDAD CÓDIGO DESCRIPCIÓN ALM P.LISTA DESC P.UNIT IMPORTE",
+    ]
+    i = 0
+    while len(texto) < lineas:
+        i += 1
+        cantidad = r.randint(1, 9)
+        unidad = r.choice(["PIEZA", "KIT", "SERVICIO", "BOBINA"])
+        codigo = f"AB{r.randint(100, 99999)}-{r.choice('XYZ')}"
+        if r.random() < 0.5:
+            texto.append(f"{cantidad} {unidad} {codigo} CAMARA BALA {i} 2MP TIJ 1,234.00 10.00% 1,110.60 {cantidad * 1110.6:,.2f}")
+        else:
+            texto.append(f"{cantidad} {unidad} {codigo} DISCO DURO {i}TB")
+            texto.append("PARA VIDEOVIGILANCIA")
+            texto.append("Clave Producto: 43201803")
+            texto.append(f"TIJ 2,000.00 5% 1,900.00 {cantidad * 1900:,.2f}")
+    texto += ["SUB-TOTAL $ 4,910.60", "I.V.A. $ 785.70", "TOTAL $ 5,696.30"]
+    return texto
+
+def generar_dice(lineas, semilla=1):
+    r = random.Random(semilla)
+    texto = ["QUOTE: Q-123", "FECHA 01/02/2025", "Vendedor JUAN PEREZ"]
+    i = 0
+    while len(texto) < lineas:
+        i += 1
+        cantidad = r.randint(1, 9)
+        texto.append(f"{i} {cantidad} DS-2CD{r.randint(1000, 9999)} HIKVISION CAMARA {i} $1,234.00 $1,110.60 10.00% ${cantidad * 1110.6:,.2f} DISPONIBLE")
+    texto += ["SUBTOTAL $1,000.00", "I.V.A. 16% $160.00", "TOTAL $1,160.00"]
+    return texto
+
+def generar_tvc(lineas, semilla=1):
+    r = random.Random(semilla)
+    texto = [
+        "Folio 123456", "Fecha 2025-02-01", "Vendedor asignado: 12 - JUAN PEREZ / Tijuana",
+        "Detalle del pedido", "Clave Descripción Cantidad Precio lista Desc Precio Importe",
+    ]
+    i = 0
+    while len(texto) < lineas:
+        i += 1
+        cantidad = r.randint(1, 9)
+        clave = f"TVD{r.randint(100000, 999999)}"
+        # PyPDF2 deja la descripción en una línea y las columnas numéricas en la siguiente
+        texto.append(f"{clave} CAMARA DOMO {i} LENTE 2.8MM")
+        texto.append(f"{cantidad} $1,234.00 -10.00% $1,110.60 ${cantidad * 1110.6:,.2f}")
+    texto += ["Los precios mostrados incluyen IVA", "Envío MXN $150.00",
+              "Subtotal MXN $1,000.00", "IVA MXN $160.00", "Total MXN $1,160.00"]
+    return texto
+
+def generar_portenntum_clasico(lineas, semilla=1):
+    r = random.Random(semilla)
+    texto = [
+        "Cot. 22040 558", "Fecha:", "01/02/2025", "Cotización para:", "EMPRESA SA DE CV",
+        "Email: ventas@empresa.mx", "Telefono: 6861234567",
+        "Linea Parte Descripción Cantidad U/M Precio lista % Dto. Precio costo Importe",
+    ]
+    i = 0
+    while len(texto) < lineas:
+        i += 1
+        cantidad = r.randint(1, 9)
+        texto.append(f"{i} JL{r.randint(100, 999)}A SWITCH {i} PUERTOS {cantidad}.0000 PZA 1,000.00 10.00 900.00 {cantidad * 900:,.2f}")
+        for _ in range(r.randint(0, 2)):
+            texto.append(f"GIGABIT POE {r.randint(1, 99)}")
+    texto += ["SubTotal: 1,800.00", "I.V.A.: 288.00", "Total: 2,088.00", "Atentamente:", "JUAN PEREZ"]
+    return texto
+
+def generar_portenntum_aruba(lineas, semilla=1):
+    r = random.Random(semilla)
+    texto = [
+        "Folio: ABC123", "Fecha: 01-feb-25", "Elaborado por: Juan Perez",
+        "Concepto Cantidad No. De Parte Nombre de Producto P.Lista P.Unitario Inventario % P.Extendido Disponibilidad",
+    ]
+    i = 0
+    while len(texto) < lineas:
+        i += 1
+        cantidad = r.randint(1, 9)
+        if r.random() < 0.5:
+            texto.append(f"*Switch{i} {cantidad} JL{r.randint(100, 999)}A Aruba 2930F $ 1 2,120.00 $ 12,120.00 15 10.00% $ 10,908.00 $ 21,816.00 Inmediata")
+        else:
+            texto.append(f"*AP{i} {cantidad} R{r.randint(100, 999)}B Aruba AP 515")
+            texto.append("$ 9 87.00 $ 987.00 2")
+            texto.append("050.00% $ 4 93.50 $ 987.00 2 semanas")
+    texto += ["Total P. Lista", "P.Venta Canal $ 2 1,816.00"]
+    return texto
+
+# ==== PROVEEDORES ====
+
+def _parser_texto(funcion, separador, omitir_vacias):
+    # Une las páginas igual que el extractor del proveedor antes de parsear
+    return lambda paginas: funcion(unir_textos(paginas, separador, omitir_vacias))
+
+# proveedor: (motor de texto declarado, parser sobre la lista de páginas, generador sintético)
+PROVEEDORES = {
+    'syscom': (extraer_datos_syscom.MOTOR_TEXTO,
+               _parser_texto(extraer_datos_syscom.extraer_informacion_syscom, "\n", True), generar_syscom),
+    'grupo dice': (extraer_datos_grupo_dice.MOTOR_TEXTO,
+                   _parser_texto(extraer_datos_grupo_dice.extraer_informacion_cotizacion_dice, "", False), generar_dice),
+    'tvc': (extraer_datos_tvc.MOTOR_TEXTO,
+            _parser_texto(extraer_datos_tvc.extraer_informacion_cotizacion_tvc, "", False), generar_tvc),
+    'portenntum clasico': (extraer_datos_portenntum.MOTOR_TEXTO,
+                           _parser_texto(extraer_datos_portenntum.extraer_informacion_portentum, "\n", True), generar_portenntum_clasico),
+    'portenntum aruba': (extraer_datos_portenntum_aruba.MOTOR_TEXTO,
+                         extraer_datos_portenntum_aruba.extraer_informacion_aruba, generar_portenntum_aruba),
+}
+
+def paginar(lineas):
+    """Divide las líneas sintéticas en páginas; cada página termina sin salto de línea"""
+    paginas = []
+    for inicio in range(0, len(lineas), LINEAS_POR_PAGINA):
+        # PyPDF2 suele dejar el salto de línea al final de cada página
+        paginas.append("\n".join(lineas[inicio:inicio + LINEAS_POR_PAGINA]) + "\n")
+    return paginas
+
+# ==== MEDICIÓN ====
+
+def medir(funcion, repeticiones):
+    """Regresa (mejor tiempo en segundos, memoria pico y retenida en bytes, resultado)"""
+    mejor = None
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+
+    # La memoria se mide en una corrida aparte porque tracemalloc altera los tiempos.
+    # La retenida es la que sigue ocupando el resultado después de la función.
+    tracemalloc.start()
+    try:
+        retenido = funcion()
+        actual, pico = tracemalloc.get_traced_memory()
+        del retenido
+    finally:
+        tracemalloc.stop()
+    return mejor, pico, actual, resultado
+
+def registro(proveedor, origen, motor, lineas, paginas, productos, decodificacion, parseo, memoria_decodificacion, memoria_parseo,
+             memoria_resultado):
+    return {
+        "proveedor": proveedor,
+        "origen": origen,
+        "motor": motor,
+        "lineas": lineas,
+        "paginas": paginas,
+        "productos": productos,
+        "decodificacion_ms": None if decodificacion is None else round(decodificacion * 1000, 3),
+        "parseo_ms": round(parseo * 1000, 3),
+        "productos_por_s": round(productos / parseo, 1) if parseo > 0 else None,
+        "memoria_pico_decodificacion_kb": None if memoria_decodificacion is None else round(memoria_decodificacion / 1024, 1),
+        "memoria_pico_parseo_kb": round(memoria_parseo / 1024, 1),
+        # Memoria del resultado escalada a 10 000 productos
+        "memoria_10k_productos_kb": round(memoria_resultado / productos * 10000 / 1024, 1) if productos else None,
+    }
+
+def contar_productos(resultado):
+    return len(resultado.get("productos", [])) if isinstance(resultado, dict) else 0
+
+def benchmark_sintetico(proveedor, tamanos, repeticiones):
+    _, parser, generador = PROVEEDORES[proveedor]
+    for tamano in tamanos:
+        lineas = generador(tamano)
+        paginas = paginar(lineas)
+        parseo, memoria, retenida, resultado = medir(lambda: parser(paginas), repeticiones)
+        yield registro(proveedor, 'sintetico', None, len(lineas), len(paginas), contar_productos(resultado),
+                       None, parseo, None, memoria, retenida)
+
+def benchmark_pdf(proveedor, archivo_pdf, repeticiones):
+    declarado, parser, _ = PROVEEDORES[proveedor]
+    motor = texto_paginas.motor_para(proveedor, declarado)
+    decodificacion, memoria_decodificacion, _, paginas = medir(lambda: textos_paginas(archivo_pdf, motor), repeticiones)
+    parseo, memoria_parseo, memoria_resultado, resultado = medir(lambda: parser(paginas), repeticiones)
+    lineas = sum(pagina.count("\n") + 1 for pagina in paginas if pagina)
+    return registro(proveedor, os.path.relpath(archivo_pdf, DIRECTORIO_SERVER), motor, lineas, len(paginas),
+                    contar_productos(resultado), decodificacion, parseo, memoria_decodificacion, memoria_parseo,
+                    memoria_resultado)
+
+# ==== REPORTE ====
+
+def clave_registro(r):
+    return (r["proveedor"], r["origen"], r["lineas"] if r["origen"] == 'sintetico' else None)
+
+def imprimir_tabla(resultados, anteriores=None):
+    previos = {clave_registro(r): r for r in (anteriores or [])}
+    encabezado = f"{'proveedor':<20} {'origen':<45} {'motor':<10} {'lineas':>7} {'prods':>6} {'decod ms':>10} {'parseo ms':>10} {'prods/s':>12} {'mem KB':>9} {'KB/10k':>9}"
+    if previos:
+        encabezado += f" {'vs anterior':>12}"
+    print(encabezado)
+    for r in resultados:
+        fila = (f"{r['proveedor']:<20} {r['origen'][-45:]:<45} {r['motor'] or '-':<10} {r['lineas']:>7} {r['productos']:>6} "
+                f"{'-' if r['decodificacion_ms'] is None else r['decodificacion_ms']:>10} {r['parseo_ms']:>10} "
+                f"{'-' if r['productos_por_s'] is None else r['productos_por_s']:>12} {r['memoria_pico_parseo_kb']:>9} "
+                f"{'-' if r['memoria_10k_productos_kb'] is None else r['memoria_10k_productos_kb']:>9}")
+        previo = previos.get(clave_registro(r))
+        if previo and r['parseo_ms']:
+            # Con PDF reales se compara decodificación + parseo para medir el cambio de motor
+            actual = (r['decodificacion_ms'] or 0) + r['parseo_ms']
+            anterior = (previo['decodificacion_ms'] or 0) + previo['parseo_ms']
+            fila += f" {anterior / actual:>11.2f}x"
+        print(fila)
+
+def benchmark_paralelo(archivo_pdf, motor, procesos, repeticiones):
+    """Extracción de texto secuencial contra rangos de páginas en N procesos (texto_paginas)"""
+    anterior = os.environ.get('TIMANAGER_PARALELO')
+    try:
+        texto_paginas.activar_paralelo(1)
+        secuencial, _, _, paginas = medir(lambda: textos_paginas(archivo_pdf, motor), repeticiones)
+        texto_paginas.activar_paralelo(procesos)
+        paralelo, _, _, paginas_paralelo = medir(lambda: textos_paginas(archivo_pdf, motor), repeticiones)
+    finally:
+        if anterior is None:
+            os.environ.pop('TIMANAGER_PARALELO', None)
+        else:
+            texto_paginas.activar_paralelo(anterior)
+    return {
+        "origen": os.path.relpath(archivo_pdf, DIRECTORIO_SERVER),
+        "motor": motor,
+        "paginas": len(paginas),
+        "procesos": procesos,
+        "secuencial_ms": round(secuencial * 1000, 3),
+        "paralelo_ms": round(paralelo * 1000, 3),
+        "aceleracion": round(secuencial / paralelo, 2),
+        "mismo_texto": paginas == paginas_paralelo,
+    }
+
+def imprimir_tabla_paralelo(resultados):
+    print(f"{'origen':<45} {'motor':<10} {'paginas':>7} {'procesos':>8} {'secuencial ms':>13} {'paralelo ms':>11} {'acel.':>6}")
+    for r in sorted(resultados, key=lambda r: r['paginas']):
+        print(f"{r['origen'][-45:]:<45} {r['motor']:<10} {r['paginas']:>7} {r['procesos']:>8} {r['secuencial_ms']:>13} "
+              f"{r['paralelo_ms']:>11} {r['aceleracion']:>5.2f}x" + ("" if r['mismo_texto'] else "  TEXTO DISTINTO"))
+
+def importacion(codigo, repeticiones):
+    """
+    Mejor tiempo de importación (-X importtime, en ms) de un proceso nuevo que ejecuta el
+    código, y si llegó a cargar pdfplumber o PyPDF2
+    """
+    mejor = None
+    for _ in range(repeticiones):
+        proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=DIRECTORIO_SCRIPTS,
+                                 capture_output=True, text=True, check=True)
+        modulos = {}
+        for linea in proceso.stderr.splitlines():
+            if linea.startswith('import time:') and '|' in linea:
+                _, acumulado, nombre = linea.split('|')
+                if acumulado.strip().isdigit():
+                    modulos[nombre.rstrip()] = int(acumulado)
+        # Solo las importaciones de primer nivel; las anidadas ya están en su acumulado
+        total = sum(us for nombre, us in modulos.items() if not nombre.startswith('  '))
+        mejor = total if mejor is None else min(mejor, total)
+    cargados = {nombre.strip() for nombre in modulos}
+    return round(mejor / 1000, 1), sorted(cargados & {'pdfplumber', 'PyPDF2'})
+
+def benchmark_importacion(repeticiones):
+    """Costo de importar extractores.py y después el módulo de cada proveedor"""
+    import extractores
+
+    base, bibliotecas = importacion("import extractores", repeticiones)
+    yield {"proveedor": None, "importacion_ms": base, "bibliotecas_pdf": bibliotecas}
+    for clave in extractores.EXTRACTORES:
+        total, bibliotecas = importacion(f"import extractores; extractores.cargar_extractor({clave!r})", repeticiones)
+        yield {"proveedor": clave, "importacion_ms": total, "bibliotecas_pdf": bibliotecas}
+
+def imprimir_tabla_importacion(resultados):
+    print(f"{'proveedor':<20} {'importación ms':>14}  bibliotecas PDF")
+    for r in resultados:
+        print(f"{r['proveedor'] or '(extractores)':<20} {r['importacion_ms']:>14}  {', '.join(r['bibliotecas_pdf']) or '-'}")
+
+def guardar_resultados(resultados, salida):
+    if not salida:
+        os.makedirs(DIRECTORIO_RESULTADOS, exist_ok=True)
+        salida = os.path.join(DIRECTORIO_RESULTADOS, f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    datos = {
+        "fecha": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+    }
+    with open(salida, 'w', encoding='utf-8') as file:
+        json.dump(datos, file, indent=2, ensure_ascii=False)
+    return salida
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los extractores de cotizaciones")
+    parser.add_argument('--proveedor', action='append', choices=sorted(PROVEEDORES), help="Limitar a uno o más proveedores")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=TAMANOS, help="Líneas de las cotizaciones sintéticas")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Se reporta el mejor tiempo de N corridas")
+    parser.add_argument('--pdf', action='append', help="PDF adicional a medir (por defecto, los PDFs del repositorio)")
+    parser.add_argument('--motor', help="Reemplazar el motor de texto declarado (crudo, o tvc=crudo,syscom=pypdf2)")
+    parser.add_argument('--sin-pdfs', action='store_true', help="Solo cotizaciones sintéticas")
+    parser.add_argument('--salida', help="Archivo JSON de resultados (por defecto en server/data/benchmarks)")
+    parser.add_argument('--paralelo', type=int, help="Comparar la extracción de texto secuencial contra N procesos por PDF")
+    parser.add_argument('--importacion', action='store_true', help="Medir con -X importtime el arranque de cada proveedor")
+    parser.add_argument('--comparar', help="JSON de una corrida anterior para comparar tiempos de parseo")
+    args = parser.parse_args()
+    if args.motor:
+        texto_paginas.forzar_motor(args.motor)
+    # Se mide la decodificación del PDF: con las capturas de texto (capturas_texto.py)
+    # las repeticiones después de la primera leerían la captura en lugar del PDF
+    os.environ['TIMANAGER_CAPTURAS'] = '0'
+
+    proveedores = args.proveedor or list(PROVEEDORES)
+    pdfs = []
+    if not args.sin_pdfs:
+        pdfs = args.pdf or sorted(p for patron in PDFS_REPOSITORIO for p in glob.glob(patron))
+
+    if args.importacion:
+        resultados = list(benchmark_importacion(args.repeticiones))
+        imprimir_tabla_importacion(resultados)
+        print(f"\nResultados guardados en {guardar_resultados(resultados, args.salida)}", file=sys.stderr)
+        return
+
+    if args.paralelo:
+        motor = texto_paginas.motor_forzado('*') or 'pdfplumber'
+        resultados = [benchmark_paralelo(archivo_pdf, motor, args.paralelo, args.repeticiones) for archivo_pdf in pdfs]
+        imprimir_tabla_paralelo(resultados)
+        print(f"\nResultados guardados en {guardar_resultados(resultados, args.salida)}", file=sys.stderr)
+        return
+
+    resultados = []
+    for proveedor in proveedores:
+        for archivo_pdf in pdfs:
+            resultados.append(benchmark_pdf(proveedor, archivo_pdf, args.repeticiones))
+        resultados.extend(benchmark_sintetico(proveedor, args.tamanos, args.repeticiones))
+
+    anteriores = None
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as file:
+            anteriores = json.load(file)["resultados"]
+
+    imprimir_tabla(resultados, anteriores)
+    print(f"\nResultados guardados en {guardar_resultados(resultados, args.salida)}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+import indice_precios
+import memoria_acotada
+import metricas
+from modelo_cotizacion import a_json
+import texto_paginas
+
+# Caché en disco de resultados de extracción.
+# Estructura: <directorio>/<proveedor>/<version del parser>/<sha256 del PDF>.json
+# Al cambiar la versión de un parser solo se descartan las entradas de ese proveedor.
+
+DIRECTORIO_CACHE = os.environ.get(
+    'TIMANAGER_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cache_extraccion')
+)
+TAMANO_MAXIMO = int(float(os.environ.get('TIMANAGER_CACHE_MAX_MB', '64')) * 1024 * 1024)
+
+def cache_habilitado():
+    return os.environ.get('TIMANAGER_CACHE', '1') != '0'
+
+# Huellas de los archivos ya leídos en este proceso: (ruta, tamaño, mtime) -> sha256.
+# Una extracción calcula la huella para la caché y para las capturas de texto. En
+# procesos de larga vida (--serve, servicio, cola) se conservan solo las más recientes.
+HUELLAS_MAXIMAS = 256
+_huellas = OrderedDict()
+
+def hash_pdf(archivo_pdf):
+    """Calcula el SHA-256 del contenido del PDF (ruta o bytes)"""
+    if texto_paginas.es_bytes(archivo_pdf):
+        return hashlib.sha256(archivo_pdf).hexdigest()
+    info = os.stat(archivo_pdf)
+    clave = (os.path.abspath(archivo_pdf), info.st_size, info.st_mtime_ns)
+    huella = _huellas.get(clave)
+    if huella is not None:
+        _huellas.move_to_end(clave)
+        return huella
+    sha = hashlib.sha256()
+    with open(archivo_pdf, 'rb') as file:
+        for bloque in iter(lambda: file.read(1024 * 1024), b''):
+            sha.update(bloque)
+    huella = _huellas[clave] = sha.hexdigest()
+    if len(_huellas) > HUELLAS_MAXIMAS:
+        _huellas.popitem(last=False)
+    return huella
+
+def _directorio_proveedor(proveedor):
+    return os.path.join(DIRECTORIO_CACHE, proveedor.strip().lower().replace(' ', '_'))
+
+def _ruta_entrada(proveedor, version, huella):
+    return os.path.join(_directorio_proveedor(proveedor), str(version), huella + '.json')
+
+def obtener(proveedor, version, huella):
+    """Regresa el resultado guardado o None si no existe"""
+    ruta = _ruta_entrada(proveedor, version, huella)
+    try:
+        with open(ruta, 'r', encoding='utf-8') as file:
+            resultado = json.load(file)
+        # Marcar la entrada como usada recientemente para el desalojo LRU
+        os.utime(ruta, None)
+        return resultado
+    except (OSError, ValueError):
+        return None
+
+def guardar(proveedor, version, huella, resultado):
+    """Guarda el resultado de forma atómica y aplica el límite de tamaño"""
+    ruta = _ruta_entrada(proveedor, version, huella)
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    _purgar_versiones(proveedor, version)
+
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            json.dump(resultado, file, ensure_ascii=False, default=a_json)
+        os.replace(temporal, ruta)
+    except Exception:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+    desalojar()
+
+def _purgar_versiones(proveedor, version):
+    # Las entradas de versiones anteriores del mismo parser ya no son válidas
+    directorio = _directorio_proveedor(proveedor)
+    for nombre in os.listdir(directorio):
+        if nombre != str(version):
+            shutil.rmtree(os.path.join(directorio, nombre), ignore_errors=True)
+
+def desalojar(tamano_maximo=None):
+    """Elimina las entradas usadas hace más tiempo hasta quedar bajo el límite"""
+    limite = TAMANO_MAXIMO if tamano_maximo is None else tamano_maximo
+    entradas = []
+    total = 0
+    for raiz, _, archivos in os.walk(DIRECTORIO_CACHE):
+        for nombre in archivos:
+            if not nombre.endswith('.json'):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            try:
+                info = os.stat(ruta)
+            except OSError:
+                continue
+            entradas.append((info.st_mtime, info.st_size, ruta))
+            total += info.st_size
+
+    if total <= limite:
+        return
+
+    entradas.sort()
+    for _, tamano, ruta in entradas:
+        if total <= limite:
+            break
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+        total -= tamano
+
+def version_cache(proveedor, version):
+    """
+    Versión con la que se guardan los resultados; incluye el motor de texto cuando
+    está forzado por configuración para no mezclarlos con los del motor declarado
+    """
+    motor = texto_paginas.motor_forzado(proveedor)
+    return f"{version}-{motor}" if motor else version
+
+def resultado_en_cache(proveedor, version, archivo_pdf):
+    """
+    Resultado guardado para el PDF o None. Para los extractores en streaming,
+    que no guardan el resultado completo (formato_salida.escribir_ndjson).
+    """
+    if not cache_habilitado():
+        return None
+    with metricas.etapa('cache'):
+        resultado = obtener(proveedor, version_cache(proveedor, version), hash_pdf(archivo_pdf))
+    metricas.marcar_cache('hit' if resultado is not None else 'miss')
+    return resultado
+
+def extraer_con_cache(proveedor, version, archivo_pdf, extractor):
+    """
+    Ejecuta extractor(archivo_pdf) solo si no hay un resultado guardado
+    para el mismo PDF, proveedor y versión del parser. El resultado se registra
+    en el índice de precios (indice_precios.py). En modo de memoria acotada se
+    regresa una copia con el RSS pico de la extracción en _metadata.memoria.
+    """
+    if memoria_acotada.acotada():
+        memoria_acotada.reiniciar_pico()
+        return memoria_acotada.anotar(_extraer_con_cache(proveedor, version, archivo_pdf, extractor))
+    return _extraer_con_cache(proveedor, version, archivo_pdf, extractor)
+
+def _extraer_con_cache(proveedor, version, archivo_pdf, extractor):
+    if not cache_habilitado():
+        resultado = extractor(archivo_pdf)
+        indice_precios.registrar_extraccion(proveedor, archivo_pdf, resultado)
+        return resultado
+    version = version_cache(proveedor, version)
+
+    with metricas.etapa('cache'):
+        huella = hash_pdf(archivo_pdf)
+        resultado = obtener(proveedor, version, huella)
+    if resultado is not None:
+        metricas.marcar_cache('hit')
+        indice_precios.registrar_extraccion(proveedor, archivo_pdf, resultado, huella, reemplazar=False)
+        return resultado
+
+    metricas.marcar_cache('miss')
+    resultado = extractor(archivo_pdf)
+    with metricas.etapa('cache'):
+        try:
+            guardar(proveedor, version, huella, resultado)
+        except OSError:
+            # Un error de escritura en la caché no debe afectar la extracción
+            pass
+    indice_precios.registrar_extraccion(proveedor, archivo_pdf, resultado, huella)
+    return resultado
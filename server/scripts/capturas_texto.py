@@ -0,0 +1,236 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+
+import metricas
+
+# Capturas del texto extraído de cada PDF, para volver a correr los parsers sin
+# decodificar los PDFs (la decodificación es casi todo el costo de una extracción).
+# Estructura: <directorio>/<motor>/<sha256[:2]>/<sha256 del PDF>.jsonl.gz, una línea
+# JSON por página con el texto que produjo ese motor.
+# texto_paginas.iterar_paginas lee la captura si existe y la escribe al terminar de
+# recorrer un documento completo, así que los cambios de VERSION_PARSER (que
+# invalidan la caché de resultados) ya no vuelven a decodificar el PDF.
+# TIMANAGER_CAPTURAS=0 las desactiva; TIMANAGER_CAPTURAS_DIR cambia la ubicación.
+# Como la caché de resultados, el directorio se limita a TIMANAGER_CAPTURAS_MAX_MB
+# (256 MB por defecto) desalojando las capturas usadas hace más tiempo.
+#
+#   python capturas_texto.py reparsear <directorio|patrón> <proveedor|auto> [--recursivo]
+#   python capturas_texto.py texto <sha256> [--motor pdfplumber]
+#   python capturas_texto.py estado
+
+# Configurar la codificación de salida para evitar problemas en Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+DIRECTORIO_CAPTURAS = os.environ.get(
+    'TIMANAGER_CAPTURAS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'capturas_texto')
+)
+TAMANO_MAXIMO = int(float(os.environ.get('TIMANAGER_CAPTURAS_MAX_MB', '256')) * 1024 * 1024)
+# El texto se comprime unas 5-10 veces; el nivel 6 es casi igual de chico que el 9 y más rápido
+NIVEL_COMPRESION = 6
+
+def capturas_habilitadas():
+    return os.environ.get('TIMANAGER_CAPTURAS', '1') != '0'
+
+def ruta_captura(huella, motor):
+    return os.path.join(DIRECTORIO_CAPTURAS, motor, huella[:2], huella + '.jsonl.gz')
+
+def existe(huella, motor):
+    return os.path.exists(ruta_captura(huella, motor))
+
+def iterar_captura(huella, motor):
+    """Texto de cada página guardado para el PDF y el motor; FileNotFoundError si no hay captura"""
+    with gzip.open(ruta_captura(huella, motor), 'rt', encoding='utf-8') as file:
+        for linea in file:
+            yield json.loads(linea)
+
+def textos(huella, motor):
+    """
+    Lista con el texto de cada página, p. ej. para correr un parser directamente:
+    extraer_informacion_cotizacion_tvc(unir_textos(textos(huella, 'pypdf2'), "", False))
+    """
+    return list(iterar_captura(huella, motor))
+
+def grabar(huella, motor, paginas):
+    """
+    Pasa los textos de paginas conforme llegan y los guarda al terminar el documento.
+    Si el recorrido se interrumpe (error o iterador sin consumir) no se guarda nada.
+    """
+    ruta = ruta_captura(huella, motor)
+    try:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    except OSError:
+        # Sin espacio o sin permisos: la extracción sigue sin captura
+        yield from paginas
+        return
+    completo = False
+    try:
+        with os.fdopen(descriptor, 'wb') as crudo, \
+                gzip.GzipFile(fileobj=crudo, mode='wb', compresslevel=NIVEL_COMPRESION, mtime=0) as file:
+            for texto in paginas:
+                file.write(json.dumps(texto, ensure_ascii=False).encode('utf-8') + b"\n")
+                yield texto
+        completo = True
+    finally:
+        if completo:
+            os.replace(temporal, ruta)
+            desalojar()
+        elif os.path.exists(temporal):
+            os.remove(temporal)
+
+def paginas(archivo_pdf, motor, extraer_paginas):
+    """
+    Texto de cada página desde la captura del PDF, o de extraer_paginas() (que
+    decodifica el PDF) grabando la captura para la siguiente vez
+    """
+    from cache_extraccion import hash_pdf
+
+    with metricas.etapa('capturas'):
+        huella = hash_pdf(archivo_pdf)
+        encontrada = existe(huella, motor)
+    if encontrada:
+        entregadas = 0
+        try:
+            # Marcar la captura como usada recientemente para el desalojo LRU
+            os.utime(ruta_captura(huella, motor), None)
+            captura = iterar_captura(huella, motor)
+            while True:
+                with metricas.etapa('capturas'):
+                    texto = next(captura, None)
+                if texto is None:
+                    return
+                metricas.contar_pagina(texto)
+                entregadas += 1
+                yield texto
+        except (OSError, EOFError, ValueError):
+            # Captura dañada: se descarta y, si aún no se entregaron páginas, se
+            # vuelve a decodificar el PDF; a media lectura se propaga el error
+            try:
+                os.remove(ruta_captura(huella, motor))
+            except OSError:
+                pass
+            if entregadas:
+                raise
+    yield from grabar(huella, motor, extraer_paginas())
+
+def desalojar(tamano_maximo=None):
+    """Elimina las capturas usadas hace más tiempo hasta quedar bajo el límite"""
+    limite = TAMANO_MAXIMO if tamano_maximo is None else tamano_maximo
+    capturas = []
+    total = 0
+    for raiz, _, archivos in os.walk(DIRECTORIO_CAPTURAS):
+        for nombre in archivos:
+            if not nombre.endswith('.jsonl.gz'):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            try:
+                info = os.stat(ruta)
+            except OSError:
+                continue
+            capturas.append((info.st_mtime, info.st_size, ruta))
+            total += info.st_size
+
+    if total <= limite:
+        return
+
+    capturas.sort()
+    for _, tamano, ruta in capturas:
+        if total <= limite:
+            break
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+        total -= tamano
+
+def estado():
+    """Capturas y tamaño comprimido por motor"""
+    motores = {}
+    for raiz, _, archivos in os.walk(DIRECTORIO_CAPTURAS):
+        for nombre in archivos:
+            if nombre.endswith('.jsonl.gz'):
+                motor = os.path.relpath(raiz, DIRECTORIO_CAPTURAS).split(os.sep)[0]
+                datos = motores.setdefault(motor, {"capturas": 0, "kb": 0.0})
+                datos["capturas"] += 1
+                datos["kb"] += os.path.getsize(os.path.join(raiz, nombre)) / 1024
+    for datos in motores.values():
+        datos["kb"] = round(datos["kb"], 1)
+    return motores
+
+def reparsear(origen, proveedor, recursivo=False):
+    """
+    Vuelve a correr el parser del proveedor sobre los PDFs, con el texto de las
+    capturas y sin caché de resultados ni índice de precios. Genera un registro por PDF.
+    """
+    from extractores import extraer
+    from extraer_lote import listar_pdfs
+
+    # Se valida el parser actual: no se leen ni se escriben resultados guardados
+    os.environ['TIMANAGER_CACHE'] = '0'
+    os.environ['TIMANAGER_INDICE'] = '0'
+    for archivo_pdf in listar_pdfs(origen, recursivo):
+        inicio = time.perf_counter()
+        registro = {"archivo": archivo_pdf, "proveedor": proveedor}
+        try:
+            resultado = extraer(proveedor, archivo_pdf)
+            registro["ok"] = 'error' not in resultado
+            registro["productos"] = len(resultado.get("productos") or [])
+            registro["resultado"] = resultado
+        except Exception as e:
+            registro["ok"] = False
+            registro["error"] = f"Error procesando PDF: {str(e)}"
+        registro["ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+        yield registro
+
+def main():
+    parser = argparse.ArgumentParser(description="Capturas del texto extraído de los PDFs")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    p_reparsear = comandos.add_parser('reparsear', help="Correr los parsers sobre las capturas de un directorio de PDFs (NDJSON)")
+    p_reparsear.add_argument('origen')
+    p_reparsear.add_argument('proveedor', help="syscom, grupo dice, tvc, portenntum, ... o auto")
+    p_reparsear.add_argument('--recursivo', action='store_true')
+
+    p_texto = comandos.add_parser('texto', help="Texto de cada página de una captura")
+    p_texto.add_argument('huella', help="SHA-256 del PDF")
+    p_texto.add_argument('--motor', default='pdfplumber')
+
+    comandos.add_parser('estado', help="Capturas y tamaño por motor")
+
+    args = parser.parse_args()
+    if args.comando == 'texto':
+        try:
+            print(json.dumps(textos(args.huella, args.motor), indent=2, ensure_ascii=False))
+        except FileNotFoundError:
+            print(f"No hay captura {args.motor} de {args.huella}", file=sys.stderr)
+            sys.exit(1)
+        return
+    if args.comando == 'estado':
+        print(json.dumps(estado(), indent=2, ensure_ascii=False))
+        return
+
+    from modelo_cotizacion import a_json
+
+    inicio = time.perf_counter()
+    correctos = errores = 0
+    for registro in reparsear(args.origen, args.proveedor, args.recursivo):
+        if registro["ok"]:
+            correctos += 1
+        else:
+            errores += 1
+        sys.stdout.write(json.dumps(registro, ensure_ascii=False, default=a_json) + "\n")
+    segundos = time.perf_counter() - inicio
+    print(f"{correctos + errores} PDFs en {segundos:.2f} s: {correctos} correctos, {errores} con error",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import formato_salida
+import metricas
+from modelo_cotizacion import a_json
+
+# Cola persistente de trabajos de extracción en SQLite, para que las cargas
+# masivas no dejen esperando al usuario que sube una cotización en el
+# formulario de órdenes de compra.
+# Cada trabajo tiene una clase de prioridad (las interactivas salen antes que
+# las de lote), un tiempo límite y un número de intentos propios. N procesos
+# trabajadores toman los trabajos; un supervisor termina el proceso que excede
+# el tiempo límite de su trabajo, lo reemplaza y reintenta el trabajo con
+# espera creciente; también reintenta los resultados {"error": ...} de los
+# extractores. Los errores que se repetirían en cada intento (ValueError,
+# FileNotFoundError) marcan el trabajo con error sin reintentarlo. El resultado
+# queda en la cola y se consulta por id.
+#
+#   python cola_extraccion.py trabajadores [-n 2] [--reservados 1]
+#   python cola_extraccion.py enviar <proveedor> archivo.pdf [--prioridad lote] [--timeout 120] [--esperar 60]
+#   python cola_extraccion.py consultar <id>
+#   python cola_extraccion.py resumen
+
+# Configurar la codificación de salida para evitar problemas en Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+RUTA_COLA = os.environ.get(
+    'TIMANAGER_COLA_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cola_extraccion.sqlite3')
+)
+
+# clase: (prioridad, tiempo límite en segundos, intentos); menor prioridad sale primero
+CLASES = {
+    'interactiva': (0, 30, 2),
+    'lote': (10, 300, 3),
+}
+ESPERA_REINTENTO = 2
+INTERVALO_SONDEO = 0.2
+INTERVALO_SUPERVISOR = 0.5
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id INTEGER PRIMARY KEY,
+    proveedor TEXT NOT NULL,
+    archivo TEXT NOT NULL,
+    clase TEXT NOT NULL,
+    prioridad INTEGER NOT NULL,
+    estado TEXT NOT NULL,
+    timeout REAL NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    max_intentos INTEGER NOT NULL,
+    disponible REAL NOT NULL,
+    limite REAL,
+    trabajador INTEGER,
+    creado TEXT NOT NULL,
+    terminado TEXT,
+    ms REAL,
+    resultado TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_pendientes ON trabajos (estado, prioridad, id);
+"""
+
+def conectar(ruta=None):
+    ruta = ruta or RUTA_COLA
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    # isolation_level=None: las transacciones se abren a mano con BEGIN IMMEDIATE
+    conexion = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+    conexion.row_factory = sqlite3.Row
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute("PRAGMA synchronous=NORMAL")
+    conexion.executescript(ESQUEMA)
+    return conexion
+
+def _ahora_iso():
+    return datetime.now().isoformat(timespec='seconds')
+
+def enviar(proveedor, archivo, clase='interactiva', timeout=None, intentos=None, ruta=None):
+    """Agrega un trabajo a la cola y regresa su id"""
+    if clase not in CLASES:
+        raise ValueError(f"Clase de prioridad no soportada: {clase}")
+    if not os.path.exists(archivo):
+        raise FileNotFoundError(f"El archivo {archivo} no existe")
+    prioridad, timeout_clase, intentos_clase = CLASES[clase]
+    conexion = conectar(ruta)
+    try:
+        cursor = conexion.execute(
+            "INSERT INTO trabajos (proveedor, archivo, clase, prioridad, estado, timeout, max_intentos, disponible, creado)"
+            " VALUES (?, ?, ?, ?, 'pendiente', ?, ?, ?, ?)",
+            (proveedor, os.path.abspath(archivo), clase, prioridad, timeout or timeout_clase,
+             intentos or intentos_clase, time.time(), _ahora_iso()),
+        )
+        return cursor.lastrowid
+    finally:
+        conexion.close()
+
+def consultar(id_trabajo, ruta=None):
+    """Estado del trabajo con su resultado cuando terminó, o None si no existe"""
+    conexion = conectar(ruta)
+    try:
+        fila = conexion.execute("SELECT * FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+    finally:
+        conexion.close()
+    if fila is None:
+        return None
+    trabajo = {
+        "id": fila["id"], "proveedor": fila["proveedor"], "archivo": fila["archivo"], "clase": fila["clase"],
+        "estado": fila["estado"], "intentos": fila["intentos"], "max_intentos": fila["max_intentos"],
+        "creado": fila["creado"], "terminado": fila["terminado"], "ms": fila["ms"],
+    }
+    if fila["resultado"] is not None:
+        trabajo["resultado"] = json.loads(fila["resultado"])
+    if fila["error"] is not None:
+        trabajo["error"] = fila["error"]
+    return trabajo
+
+def esperar(id_trabajo, segundos, ruta=None):
+    """Consulta el trabajo hasta que termine (o hasta agotar los segundos)"""
+    fin = time.monotonic() + segundos
+    while True:
+        trabajo = consultar(id_trabajo, ruta)
+        if trabajo is None or trabajo["estado"] in ('terminado', 'error') or time.monotonic() >= fin:
+            return trabajo
+        time.sleep(INTERVALO_SONDEO)
+
+def resumen(ruta=None):
+    """Trabajos por clase y estado"""
+    conexion = conectar(ruta)
+    try:
+        filas = conexion.execute("SELECT clase, estado, COUNT(*) AS n FROM trabajos GROUP BY clase, estado").fetchall()
+    finally:
+        conexion.close()
+    datos = {}
+    for fila in filas:
+        datos.setdefault(fila["clase"], {})[fila["estado"]] = fila["n"]
+    return datos
+
+# ==== TRABAJADORES ====
+
+def tomar(conexion, solo_interactivos=False):
+    """Marca como en proceso el siguiente trabajo disponible y lo regresa (o None)"""
+    ahora = time.time()
+    condicion = "AND prioridad = ?" if solo_interactivos else ""
+    parametros = [ahora] + ([CLASES['interactiva'][0]] if solo_interactivos else [])
+    conexion.execute("BEGIN IMMEDIATE")
+    try:
+        fila = conexion.execute(
+            f"SELECT * FROM trabajos WHERE estado = 'pendiente' AND disponible <= ? {condicion}"
+            " ORDER BY prioridad, id LIMIT 1", parametros
+        ).fetchone()
+        if fila is not None:
+            conexion.execute(
+                "UPDATE trabajos SET estado = 'en_proceso', intentos = intentos + 1, limite = ?, trabajador = ?"
+                " WHERE id = ?", (ahora + fila["timeout"], os.getpid(), fila["id"])
+            )
+        conexion.execute("COMMIT")
+    except BaseException:
+        conexion.execute("ROLLBACK")
+        raise
+    return fila
+
+def fallar(conexion, id_trabajo, trabajador, error):
+    """
+    Registra un intento fallido: el trabajo vuelve a la cola con espera creciente
+    o queda en error al agotar sus intentos
+    """
+    ahora = time.time()
+    conexion.execute(
+        "UPDATE trabajos SET"
+        " estado = CASE WHEN intentos < max_intentos THEN 'pendiente' ELSE 'error' END,"
+        " disponible = ? + ? * (1 << (intentos - 1)),"
+        " terminado = CASE WHEN intentos < max_intentos THEN NULL ELSE ? END,"
+        " limite = NULL, trabajador = NULL, error = ?"
+        " WHERE id = ? AND estado = 'en_proceso' AND trabajador = ?",
+        (ahora, ESPERA_REINTENTO, _ahora_iso(), error, id_trabajo, trabajador),
+    )
+
+def descartar(conexion, id_trabajo, trabajador, error):
+    """Marca el trabajo con error sin reintentarlo: la falla se repetiría en cada intento"""
+    conexion.execute(
+        "UPDATE trabajos SET estado = 'error', terminado = ?, limite = NULL, trabajador = NULL, error = ?"
+        " WHERE id = ? AND estado = 'en_proceso' AND trabajador = ?",
+        (_ahora_iso(), error, id_trabajo, trabajador),
+    )
+
+def ejecutar(trabajo):
+    """Extrae el PDF del trabajo con las funciones de cada proveedor (extractores.extraer)"""
+    from extractores import extraer
+
+    resultado, medicion = metricas.medir(extraer, trabajo["proveedor"], trabajo["archivo"])
+    return formato_salida.preparar(metricas.agregar_timings(resultado, medicion))
+
+def trabajador(ruta=None, solo_interactivos=False):
+    """Proceso trabajador: toma trabajos de la cola hasta que el supervisor lo termine"""
+    conexion = conectar(ruta)
+    pid = os.getpid()
+    while True:
+        trabajo = tomar(conexion, solo_interactivos)
+        if trabajo is None:
+            time.sleep(INTERVALO_SONDEO)
+            continue
+        inicio = time.perf_counter()
+        try:
+            resultado = ejecutar(trabajo)
+        except (ValueError, FileNotFoundError) as e:
+            # Proveedor no soportado, formato no reconocido o archivo inexistente
+            descartar(conexion, trabajo["id"], pid, f"Error procesando PDF: {str(e)}")
+            continue
+        except Exception as e:
+            fallar(conexion, trabajo["id"], pid, f"Error procesando PDF: {str(e)}")
+            continue
+        if isinstance(resultado, dict) and "error" in resultado:
+            # Los extractores reportan sus fallas como {"error": ...}; se reintentan igual
+            fallar(conexion, trabajo["id"], pid, resultado["error"])
+            continue
+        conexion.execute(
+            "UPDATE trabajos SET estado = 'terminado', terminado = ?, ms = ?, resultado = ?, error = NULL,"
+            " limite = NULL WHERE id = ? AND estado = 'en_proceso' AND trabajador = ?",
+            (_ahora_iso(), round((time.perf_counter() - inicio) * 1000, 2),
+             json.dumps(resultado, ensure_ascii=False, default=a_json, separators=(',', ':')),
+             trabajo["id"], pid),
+        )
+
+def _iniciar_trabajador(ruta, solo_interactivos):
+    import multiprocessing
+    proceso = multiprocessing.Process(target=trabajador, args=(ruta, solo_interactivos), daemon=True)
+    proceso.start()
+    return proceso
+
+def supervisar(procesos=2, reservados=None, ruta=None):
+    """
+    Inicia los trabajadores y vigila sus tiempos límite. Los primeros `reservados`
+    solo toman trabajos interactivos, para que un lote largo no los ocupe todos.
+    """
+    if reservados is None:
+        reservados = 1
+    # Al menos un trabajador debe tomar trabajos de lote para que no esperen indefinidamente
+    reservados = max(0, min(reservados, procesos - 1))
+    conexion = conectar(ruta)
+    # Trabajos que quedaron en proceso al detenerse un supervisor anterior
+    for fila in conexion.execute("SELECT id, trabajador FROM trabajos WHERE estado = 'en_proceso'").fetchall():
+        fallar(conexion, fila["id"], fila["trabajador"], "El supervisor se detuvo durante el trabajo")
+
+    trabajadores = [(_iniciar_trabajador(ruta, i < reservados), i < reservados) for i in range(procesos)]
+    print(f"Cola de extracción en {os.path.abspath(ruta or RUTA_COLA)} ({procesos} trabajadores, "
+          f"{reservados} reservados para trabajos interactivos)", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(INTERVALO_SUPERVISOR)
+            vencidos = {fila["trabajador"]: fila for fila in conexion.execute(
+                "SELECT id, trabajador, timeout FROM trabajos WHERE estado = 'en_proceso' AND limite < ?",
+                (time.time(),))}
+            for i, (proceso, solo_interactivos) in enumerate(trabajadores):
+                fila = vencidos.get(proceso.pid)
+                if fila is not None:
+                    proceso.terminate()
+                    proceso.join()
+                elif proceso.is_alive():
+                    continue
+                # El proceso murió (p. ej. memoria agotada) o se terminó por tiempo. Entre la
+                # consulta de vencidos y terminate() pudo terminar el trabajo vencido y tomar
+                # otro, así que se falla todo lo que tenía en curso, no solo el vencido.
+                for perdido in conexion.execute(
+                        "SELECT id FROM trabajos WHERE estado = 'en_proceso' AND trabajador = ?",
+                        (proceso.pid,)).fetchall():
+                    if fila is None:
+                        motivo = "El proceso trabajador terminó inesperadamente"
+                    elif perdido["id"] == fila["id"]:
+                        motivo = f"Tiempo agotado ({fila['timeout']:g} s)"
+                    else:
+                        motivo = f"El proceso trabajador se terminó por el tiempo agotado del trabajo {fila['id']}"
+                    fallar(conexion, perdido["id"], proceso.pid, motivo)
+                trabajadores[i] = (_iniciar_trabajador(ruta, solo_interactivos), solo_interactivos)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proceso, _ in trabajadores:
+            proceso.terminate()
+        for proceso, _ in trabajadores:
+            proceso.join()
+        # Lo que quedó a medias vuelve a la cola para el siguiente supervisor
+        for fila in conexion.execute("SELECT id, trabajador FROM trabajos WHERE estado = 'en_proceso'").fetchall():
+            conexion.execute("UPDATE trabajos SET estado = 'pendiente', intentos = intentos - 1, limite = NULL,"
+                             " trabajador = NULL WHERE id = ?", (fila["id"],))
+        conexion.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Cola persistente de trabajos de extracción con prioridades")
+    parser.add_argument('--cola', help="Ruta de la base SQLite de la cola (TIMANAGER_COLA_DB)")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    p_trabajadores = comandos.add_parser('trabajadores', help="Iniciar los procesos trabajadores")
+    p_trabajadores.add_argument('-n', '--procesos', type=int, default=int(os.environ.get('TIMANAGER_COLA_PROCESOS', '2')))
+    p_trabajadores.add_argument('--reservados', type=int, default=None,
+                                help="Trabajadores solo para trabajos interactivos (por defecto 1, a lo más n - 1)")
+    p_trabajadores.add_argument('--timings', action='store_true', help="Agregar _metadata.timings a cada resultado")
+    p_trabajadores.add_argument('--compact', nargs='?', const='json', choices=('json', 'columnas'),
+                                help="Resultados con un solo nombre por campo (json) o en columnas")
+
+    p_enviar = comandos.add_parser('enviar', help="Agregar un trabajo; imprime su id")
+    p_enviar.add_argument('proveedor', help="syscom, grupo dice, tvc, portenntum, ... o auto")
+    p_enviar.add_argument('archivo')
+    p_enviar.add_argument('--prioridad', choices=sorted(CLASES), default='interactiva')
+    p_enviar.add_argument('--timeout', type=float, help="Segundos por intento (por defecto según la prioridad)")
+    p_enviar.add_argument('--intentos', type=int, help="Intentos antes de marcar el trabajo con error")
+    p_enviar.add_argument('--esperar', type=float, help="Esperar hasta N segundos e imprimir el trabajo")
+
+    p_consultar = comandos.add_parser('consultar', help="Estado y resultado de un trabajo")
+    p_consultar.add_argument('id', type=int)
+
+    comandos.add_parser('resumen', help="Trabajos por prioridad y estado")
+
+    args = parser.parse_args()
+    if args.comando == 'trabajadores':
+        metricas.activar(args.timings)
+        if args.compact:
+            formato_salida.activar(formato_salida.MODOS_COMPACT[args.compact])
+        supervisar(args.procesos, args.reservados, args.cola)
+        return
+
+    if args.comando == 'enviar':
+        try:
+            id_trabajo = enviar(args.proveedor, args.archivo, args.prioridad, args.timeout, args.intentos, args.cola)
+        except (ValueError, FileNotFoundError) as e:
+            print(json.dumps({"error": str(e)}, ensure_ascii=False))
+            sys.exit(1)
+        datos = esperar(id_trabajo, args.esperar, args.cola) if args.esperar else {"id": id_trabajo, "estado": 'pendiente'}
+    elif args.comando == 'consultar':
+        datos = consultar(args.id, args.cola)
+        if datos is None:
+            print(json.dumps({"error": f"No existe el trabajo {args.id}"}, ensure_ascii=False))
+            sys.exit(1)
+    else:
+        datos = resumen(args.cola)
+    print(json.dumps(datos, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
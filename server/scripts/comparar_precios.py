@@ -0,0 +1,240 @@
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from array import array
+
+import indice_precios
+from modelo_cotizacion import numero
+
+# Comparación de precios entre proveedores por código de parte.
+# Carga varias cotizaciones extraídas (JSON de los scripts o PDFs) o el último
+# precio de cada proveedor en el índice de precios, en columnas (array('d') para
+# los números) con una fila por código y proveedor, y calcula en una sola pasada
+# el proveedor más barato, la diferencia contra él y el descuento sobre precioLista.
+#
+#   python comparar_precios.py syscom=cot_syscom.json tvc=cot_tvc.pdf "grupo dice=cot_dice.json"
+#   python comparar_precios.py --historial [--proveedor syscom --proveedor tvc] [--comunes] [--tabla]
+
+# Configurar la codificación de salida para evitar problemas en Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+NAN = float('nan')
+PATRON_NO_ALFANUMERICO = re.compile(r'[^0-9A-Z]')
+
+def normalizar_codigo(codigo):
+    """'DS-2CD1023G0E-I' y 'ds 2cd1023g0e i' son el mismo código"""
+    return PATRON_NO_ALFANUMERICO.sub('', str(codigo or "").upper())
+
+class TablaPrecios:
+    """
+    Una fila por (código normalizado, proveedor) en columnas paralelas. Si un
+    proveedor cotiza el mismo código en varias líneas se queda la más barata y
+    se suman las cantidades.
+    """
+    def __init__(self):
+        self.claves = []
+        self.codigos = []
+        self.descripciones = []
+        self.proveedores = []
+        self.precios = array('d')
+        self.listas = array('d')
+        self.cantidades = array('d')
+        self._filas = {}
+
+    def __len__(self):
+        return len(self.claves)
+
+    def agregar(self, proveedor, codigo, descripcion, precio, lista, cantidad):
+        clave = normalizar_codigo(codigo)
+        # Los precios llegan como float; cantidad puede llegar como texto (Syscom) o int
+        # (Grupo Dice), así que se convierte explícitamente con numero(), igual que los
+        # precios de JSON anteriores con texto
+        precio = precio if type(precio) is float else numero(precio)
+        if not clave or not precio or precio <= 0:
+            return
+        lista = (lista if type(lista) is float else numero(lista)) or NAN
+        cantidad = (cantidad if type(cantidad) is float else numero(cantidad)) or 0.0
+
+        fila = self._filas.get((clave, proveedor))
+        if fila is None:
+            self._filas[(clave, proveedor)] = len(self.claves)
+            self.claves.append(clave)
+            self.codigos.append(str(codigo).strip())
+            self.descripciones.append(descripcion or "")
+            self.proveedores.append(proveedor)
+            self.precios.append(precio)
+            self.listas.append(lista)
+            self.cantidades.append(cantidad)
+            return
+        self.cantidades[fila] += cantidad
+        if precio < self.precios[fila]:
+            self.precios[fila] = precio
+            self.listas[fila] = lista
+
+    def agregar_cotizacion(self, proveedor, resultado):
+        for producto in resultado.get("productos") or []:
+            self.agregar(proveedor, producto.get("codigo"), producto.get("descripcion"),
+                         producto.get("precioUnitario"), producto.get("precioLista"), producto.get("cantidad"))
+
+def cargar_cotizacion(tabla, proveedor, archivo):
+    """Agrega un JSON de los extractores o un PDF (se extrae con extractores.extraer)"""
+    proveedor = indice_precios.normalizar_proveedor(proveedor)
+    if archivo.lower().endswith('.pdf'):
+        from extractores import extraer
+        resultado = extraer(proveedor, archivo)
+    else:
+        with open(archivo, 'r', encoding='utf-8') as file:
+            resultado = json.load(file)
+    if 'error' in resultado:
+        raise ValueError(f"{archivo}: {resultado['error']}")
+    tabla.agregar_cotizacion(proveedor, resultado)
+
+def cargar_historial(tabla, proveedores=None, ruta=None):
+    """Agrega el último precio de cada código y proveedor registrado en el índice de precios"""
+    condicion = ""
+    parametros = []
+    if proveedores:
+        proveedores = [indice_precios.normalizar_proveedor(p) for p in proveedores]
+        condicion = f"WHERE proveedor IN ({', '.join('?' * len(proveedores))})"
+        parametros = proveedores
+    # Con MAX() SQLite toma las demás columnas de la fila con la fecha más reciente
+    sql = (f"SELECT proveedor, codigo, descripcion, precioUnitario, precioLista, cantidad, MAX(fecha) "
+           f"FROM precios {condicion} GROUP BY codigo, proveedor")
+    for fila in indice_precios.conectar(ruta).execute(sql, parametros):
+        tabla.agregar(fila[0], fila[1], fila[2], fila[3], fila[4], fila[5])
+
+class Comparacion:
+    """
+    Resultado de comparar() en columnas alineadas con el orden (código, precio):
+    rango dentro del código, diferencia contra el más barato y descuento sobre
+    precioLista. Los grupos (inicio, fin, ahorro) van del mayor al menor ahorro.
+    """
+    def __init__(self, tabla, orden, rangos, diferencias, descuentos, grupos):
+        self.tabla = tabla
+        self.orden = orden
+        self.rangos = rangos
+        self.diferencias = diferencias
+        self.descuentos = descuentos
+        self.grupos = grupos
+
+    def __len__(self):
+        return len(self.grupos)
+
+    def renglones(self, limite=None):
+        """Un renglón por código con sus proveedores del más barato al más caro"""
+        tabla = self.tabla
+        renglones = []
+        for inicio, fin, ahorro in self.grupos[:limite]:
+            filas = self.orden[inicio:fin]
+            mejor = tabla.precios[filas[0]]
+            ofertas = []
+            for k, i in enumerate(filas, inicio):
+                lista = tabla.listas[i]
+                descuento = self.descuentos[k]
+                ofertas.append({
+                    "rango": self.rangos[k],
+                    "proveedor": tabla.proveedores[i],
+                    "codigo": tabla.codigos[i],
+                    "precioUnitario": tabla.precios[i],
+                    "precioLista": None if math.isnan(lista) else lista,
+                    "descuentoLista": None if math.isnan(descuento) else round(descuento, 2),
+                    "diferencia": round(self.diferencias[k], 2),
+                    "diferenciaPct": round(self.diferencias[k] / mejor * 100, 2),
+                })
+            renglones.append({
+                "codigo": tabla.claves[filas[0]],
+                "descripcion": next((tabla.descripciones[i] for i in filas if tabla.descripciones[i]), ""),
+                "mejorProveedor": tabla.proveedores[filas[0]],
+                "mejorPrecio": mejor,
+                "ahorro": round(ahorro, 2),
+                "proveedores": ofertas,
+            })
+        return renglones
+
+def comparar(tabla, comunes=False):
+    """
+    Compara todas las filas de la tabla. Cada cálculo es una pasada sobre las
+    columnas en el orden (código, precio), que deja cada código contiguo y con
+    el proveedor más barato primero.
+    """
+    claves, precios, listas, cantidades = tabla.claves, tabla.precios, tabla.listas, tabla.cantidades
+    total = len(tabla)
+    # Dos ordenamientos estables con llaves en C: por precio y luego por código
+    orden = sorted(range(total), key=precios.__getitem__)
+    orden.sort(key=claves.__getitem__)
+    claves_orden = list(map(claves.__getitem__, orden))
+    precios_orden = array('d', map(precios.__getitem__, orden))
+    listas_orden = array('d', map(listas.__getitem__, orden))
+
+    # Inicio de cada código y, por fila, el inicio de su código
+    inicios = [k for k in range(total) if k == 0 or claves_orden[k] != claves_orden[k - 1]]
+    limites = list(zip(inicios, inicios[1:] + [total]))
+    inicio_fila = [inicio for inicio, fin in limites for _ in range(fin - inicio)]
+
+    rangos = array('l', [k - inicio + 1 for k, inicio in enumerate(inicio_fila)])
+    diferencias = array('d', [precio - precios_orden[inicio] for precio, inicio in zip(precios_orden, inicio_fila)])
+    # NaN cuando no hay precio de lista (NaN > 0 es falso)
+    descuentos = array('d', [(1 - precio / lista) * 100 if lista > 0 else NAN
+                             for precio, lista in zip(precios_orden, listas_orden)])
+
+    grupos = [
+        (inicio, fin, (precios_orden[fin - 1] - precios_orden[inicio])
+         * (max(map(cantidades.__getitem__, orden[inicio:fin])) or 1.0))
+        for inicio, fin in limites if not comunes or fin - inicio > 1
+    ]
+    grupos.sort(key=lambda g: (-g[2], claves_orden[g[0]]))
+    return Comparacion(tabla, orden, rangos, diferencias, descuentos, grupos)
+
+def imprimir_tabla(renglones, salida=None):
+    salida = salida or sys.stdout
+    print(f"{'codigo':<22} {'mejor':<20} {'precio':>12} {'ahorro':>12}  otros", file=salida)
+    for r in renglones:
+        otros = ", ".join(f"{o['proveedor']} +{o['diferenciaPct']}%" for o in r["proveedores"][1:])
+        print(f"{r['codigo'][:22]:<22} {r['mejorProveedor'][:20]:<20} {r['mejorPrecio']:>12.2f} {r['ahorro']:>12.2f}  {otros}",
+              file=salida)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara precios por código entre cotizaciones de varios proveedores")
+    parser.add_argument('cotizaciones', nargs='*', help="proveedor=archivo.json o proveedor=archivo.pdf")
+    parser.add_argument('--historial', action='store_true', help="Usar el último precio de cada proveedor en el índice de precios")
+    parser.add_argument('--proveedor', action='append', help="Con --historial, limitar a estos proveedores")
+    parser.add_argument('--comunes', action='store_true', help="Solo códigos cotizados por dos o más proveedores")
+    parser.add_argument('--tabla', action='store_true', help="Tabla de texto en lugar de JSON")
+    parser.add_argument('--limite', type=int, default=None, help="Solo los N códigos con mayor ahorro")
+    args = parser.parse_args()
+    if not args.cotizaciones and not args.historial:
+        parser.error("Indique cotizaciones proveedor=archivo o --historial")
+
+    inicio = time.perf_counter()
+    tabla = TablaPrecios()
+    try:
+        for argumento in args.cotizaciones:
+            proveedor, separador, archivo = argumento.partition('=')
+            if not separador:
+                parser.error(f"Se esperaba proveedor=archivo: {argumento}")
+            cargar_cotizacion(tabla, proveedor, archivo)
+        if args.historial:
+            cargar_historial(tabla, args.proveedor)
+    except Exception as e:
+        print(json.dumps({"error": f"Error cargando cotizaciones: {str(e)}"}, indent=2, ensure_ascii=False))
+        sys.exit(1)
+    carga = time.perf_counter() - inicio
+
+    comparacion = comparar(tabla, args.comunes)
+    segundos = time.perf_counter() - inicio - carga
+    renglones = comparacion.renglones(args.limite)
+    if args.tabla:
+        imprimir_tabla(renglones)
+    else:
+        print(json.dumps(renglones, indent=2, ensure_ascii=False))
+    print(f"{len(tabla)} líneas, {len(comparacion)} códigos: carga {carga * 1000:.1f} ms, "
+          f"comparación {segundos * 1000:.1f} ms", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
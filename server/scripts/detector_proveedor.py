@@ -0,0 +1,176 @@
+import re
+import time
+
+import texto_paginas
+
+# Detección del proveedor de una cotización sin que el usuario lo elija.
+# Primero revisa los metadatos del PDF (Title, Subject, Author, Creator, Producer)
+# y después el texto crudo de la primera página (texto_crudo.py), que se lee sin
+# análisis de layout. Todos los indicadores de texto están en un solo patrón
+# compilado, así que el texto se recorre una sola vez.
+
+# proveedor: [(patrón, peso)]; las claves son las de EXTRACTORES en extractores.py
+INDICADORES = {
+    'syscom': [
+        (r'CANT\s+UNIDAD\s+C[ÓO]DIGO', 2),
+        (r'EJECUTIVO\s+VENTAS', 1),
+        (r'DATOS\s+FISCALES', 1),
+        (r'SUB-TOTAL', 1),
+        (r'\bSYSCOM\b', 1),
+    ],
+    'grupo dice': [
+        (r'QUOTE:', 2),
+        (r'GRUPO\s+DICE', 2),
+        (r'I\.V\.A\.\s+\d+%', 1),
+        (r'\bDISPONIBLE\b', 1),
+    ],
+    'tvc': [
+        (r'Detalle\s+del\s+pedido', 2),
+        (r'Vendedor\s+asignado', 2),
+        (r'\bMXN\s+\$', 1),
+        (r'\bTVC\b', 1),
+    ],
+    'portenntum clasico': [
+        (r'Linea\s+Parte\s+Descripci[óo]n', 2),
+        (r'Cot\.\s*\d+', 1),
+        (r'%\s*Dto\.', 1),
+        (r'Precio\s+costo', 1),
+        (r'U/M', 1),
+        (r'PORTENNTUM', 1),
+    ],
+    'portenntum aruba': [
+        (r'Concepto\s+Cantidad\s+No\.\s+De\s+Parte', 2),
+        (r'P\.Venta\s+Canal', 2),
+        (r'Elaborado\s+por:', 1),
+        (r'(?-i:Folio:)\s*\w+', 1),
+        (r'\*\w+\s+\d+\s+[A-Z0-9\-]+', 1),
+        (r'PORTENNTUM', 1),
+    ],
+}
+
+# Nombres de proveedor en los metadatos; Portenntum necesita el texto para distinguir el formato
+METADATOS = {
+    'syscom': r'\bsyscom\b',
+    'grupo dice': r'grupo\s*dice',
+    'tvc': r'\btvc\b',
+    'portenntum': r'portenntum|portentum',
+}
+CAMPOS_METADATOS = ('/Title', '/Subject', '/Author', '/Creator', '/Producer', '/Keywords')
+
+# Formato de una cotización de Portenntum ya identificada (script_auto_portenntum.py).
+# Regla propia, no la de puntuar/elegir: Aruba si coinciden al menos 3 de sus
+# indicadores y si no, clásico con 3 de los suyos. Se revisa Aruba primero.
+FORMATOS_PORTENNTUM = [
+    ('aruba', [
+        r'Folio:\s*\w+',                     # Campo "Folio:"
+        r'Elaborado por:',                   # Campo "Elaborado por:"
+        r'P\.Venta Canal',                   # Total "P.Venta Canal"
+        r'\*\w+\s+\d+\s+[A-Z0-9\-]+',         # Productos con asterisco
+        r'Concepto\s+Cantidad\s+No\.\s+De\s+Parte',  # Encabezados de la tabla
+    ]),
+    ('clasico', [
+        r'Cot\.\s*\d+',                      # Campo "Cot."
+        r'Linea\s+Parte\s+Descripción',      # Encabezados de la tabla
+        r'% Dto\.',                          # Columna "% Dto."
+        r'Precio costo',                     # Columna "Precio costo"
+        r'U/M',                              # Columna "U/M"
+    ]),
+]
+INDICADORES_FORMATO = 3
+
+PUNTOS_MINIMOS = 2
+# Con estos puntos y sin competidor la confianza es 1.0
+PUNTOS_SEGURO = 4
+CONFIANZA_METADATOS = 0.9
+PAGINAS_DETECCION = 2
+
+def _combinar(indicadores):
+    # Un grupo con nombre por patrón distinto; un patrón puede sumar a varios proveedores
+    partes = []
+    grupos = {}
+    for proveedor, lista in indicadores.items():
+        for patron, peso in lista:
+            if patron not in grupos:
+                grupos[patron] = (f"i{len(grupos)}", [])
+                partes.append(f"(?P<{grupos[patron][0]}>{patron})")
+            grupos[patron][1].append((proveedor, peso))
+    pesos = {nombre: destinos for nombre, destinos in grupos.values()}
+    return re.compile("|".join(partes), re.IGNORECASE), pesos
+
+PATRON_INDICADORES, PESOS_INDICADORES = _combinar(INDICADORES)
+PATRON_METADATOS = re.compile(
+    "|".join(f"(?P<m{i}>{patron})" for i, patron in enumerate(METADATOS.values())), re.IGNORECASE
+)
+PROVEEDORES_METADATOS = {f"m{i}": proveedor for i, proveedor in enumerate(METADATOS)}
+PATRONES_FORMATOS = [(formato, [re.compile(patron, re.IGNORECASE) for patron in patrones])
+                     for formato, patrones in FORMATOS_PORTENNTUM]
+
+def puntuar(texto, candidatos=None):
+    """Puntos de cada proveedor según los indicadores distintos encontrados en el texto"""
+    encontrados = {match.lastgroup for match in PATRON_INDICADORES.finditer(texto)}
+    puntos = {proveedor: 0 for proveedor in (candidatos or INDICADORES)}
+    for nombre in encontrados:
+        for proveedor, peso in PESOS_INDICADORES[nombre]:
+            if proveedor in puntos:
+                puntos[proveedor] += peso
+    return puntos
+
+def elegir(puntos):
+    """Regresa (proveedor, confianza) o (None, 0.0) si ningún proveedor destaca"""
+    ordenados = sorted(puntos.items(), key=lambda item: item[1], reverse=True)
+    mejor, puntos_mejor = ordenados[0]
+    segundo = ordenados[1][1] if len(ordenados) > 1 else 0
+    if puntos_mejor < PUNTOS_MINIMOS or puntos_mejor == segundo:
+        return None, 0.0
+    confianza = min(1.0, puntos_mejor / PUNTOS_SEGURO) * (puntos_mejor - segundo) / puntos_mejor
+    return mejor, round(confianza, 2)
+
+def proveedor_metadatos(metadatos):
+    """Proveedor nombrado en los metadatos del PDF, o None"""
+    if not metadatos:
+        return None
+    texto = " ".join(str(metadatos.get(campo) or "") for campo in CAMPOS_METADATOS)
+    nombrados = {PROVEEDORES_METADATOS[match.lastgroup] for match in PATRON_METADATOS.finditer(texto)}
+    return nombrados.pop() if len(nombrados) == 1 else None
+
+def formato_portenntum(texto):
+    """Formato de una cotización de Portenntum: 'aruba', 'clasico' o 'desconocido'"""
+    for formato, patrones in PATRONES_FORMATOS:
+        if sum(1 for patron in patrones if patron.search(texto)) >= INDICADORES_FORMATO:
+            return formato
+    return 'desconocido'
+
+def detectar(archivo_pdf, candidatos=None):
+    """
+    Detecta el proveedor de una cotización (ruta o bytes del PDF).
+    Regresa {"proveedor", "confianza", "fuente", "ms"}; ValueError si no se reconoce.
+    """
+    import PyPDF2
+    from texto_crudo import texto_pagina
+
+    inicio = time.perf_counter()
+    candidatos = list(candidatos or INDICADORES)
+
+    def respuesta(proveedor, confianza, fuente):
+        return {"proveedor": proveedor, "confianza": confianza, "fuente": fuente,
+                "ms": round((time.perf_counter() - inicio) * 1000, 2)}
+
+    with texto_paginas.abrir_origen(archivo_pdf) as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+
+        nombrado = proveedor_metadatos(pdf_reader.metadata)
+        if nombrado in candidatos:
+            return respuesta(nombrado, CONFIANZA_METADATOS, 'metadatos')
+        if nombrado == 'portenntum':
+            candidatos = [c for c in candidatos if c.startswith('portenntum')] or candidatos
+
+        texto = ""
+        for numero, page in enumerate(pdf_reader.pages):
+            if numero >= PAGINAS_DETECCION:
+                break
+            texto += texto_pagina(page) + "\n"
+            proveedor, confianza = elegir(puntuar(texto, candidatos))
+            if proveedor:
+                return respuesta(proveedor, confianza, 'texto')
+
+    raise ValueError("No se pudo identificar al proveedor del PDF")
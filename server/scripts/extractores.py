@@ -0,0 +1,168 @@
+import importlib
+import json
+import sys
+
+# Configurar la codificación de salida para evitar problemas en Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+from cache_extraccion import extraer_con_cache
+import argumentos
+import formato_salida
+import metricas
+from modelo_cotizacion import a_json
+import texto_paginas
+
+# Los módulos de proveedor (y con ellos pdfplumber y PyPDF2) se importan hasta
+# que se pide su extractor; medido con -X importtime, importar todos al inicio
+# costaba ~220 ms en cada llamada, aunque el resultado viniera de la caché.
+# En modo --serve se precargan para que el proceso los mantenga cargados.
+
+# Mismas claves que usa getScriptPath en ordenCompraController.
+# Cada proveedor se registra con el módulo y la función de extracción; la
+# versión del parser es el VERSION_PARSER del módulo.
+EXTRACTORES = {
+    'syscom': ('extraer_datos_syscom', 'extraer_datos'),
+    'grupo dice': ('extraer_datos_grupo_dice', 'extraer_datos_dice'),
+    'tvc': ('extraer_datos_tvc', 'extraer_datos_tvc'),
+    'portenntum': ('script_auto_portenntum', 'extraer_datos_portentum_auto'),
+    'portenntum clasico': ('extraer_datos_portenntum', 'extraer_datos_portentum'),
+    'portenntum aruba': ('extraer_datos_portenntum_aruba', 'extraer_datos_aruba'),
+}
+
+# Extractores que escriben la salida NDJSON conforme leen cada página
+EXTRACTORES_NDJSON = {
+    'portenntum aruba': ('extraer_datos_portenntum_aruba', 'eventos_pdf_aruba'),
+}
+
+def cargar_extractor(clave, registro=EXTRACTORES):
+    """Importa el módulo del proveedor y regresa (función, versión del parser)"""
+    nombre_modulo, nombre_funcion = registro[clave]
+    modulo = importlib.import_module(nombre_modulo)
+    return getattr(modulo, nombre_funcion), getattr(modulo, 'VERSION_PARSER', None)
+
+def precargar():
+    """Importa todos los proveedores y las bibliotecas de PDF (modo --serve)"""
+    import PyPDF2
+    import pdfplumber
+    import detector_proveedor
+    for clave in EXTRACTORES:
+        cargar_extractor(clave)
+
+def normalizar_proveedor(proveedor):
+    return " ".join(str(proveedor).lower().replace('_', ' ').split())
+
+def detectar_proveedor(archivo_pdf):
+    """
+    Identifica al proveedor por los metadatos y el texto crudo de la primera página
+    (ver detector_proveedor.py); Portenntum se distingue en clásico o Aruba
+    """
+    import detector_proveedor
+    return detector_proveedor.detectar(archivo_pdf)["proveedor"]
+
+def extraer(proveedor, archivo_pdf):
+    """
+    Extrae la cotización con el parser del proveedor indicado ('auto' para detectarlo)
+    """
+    if not texto_paginas.origen_existe(archivo_pdf):
+        raise FileNotFoundError(f"El archivo {archivo_pdf} no existe")
+    clave = normalizar_proveedor(proveedor)
+    deteccion = None
+    if clave == 'auto':
+        import detector_proveedor
+        deteccion = detector_proveedor.detectar(archivo_pdf)
+        clave = deteccion["proveedor"]
+    if clave not in EXTRACTORES:
+        raise ValueError(f"Proveedor no soportado: {proveedor}")
+    extractor, version = cargar_extractor(clave)
+    resultado = extraer_con_cache(clave, version, archivo_pdf, extractor)
+    if deteccion and isinstance(resultado, dict):
+        # Copia para no guardar la detección dentro de la entrada de caché
+        resultado = dict(resultado, _metadata=dict(resultado.get("_metadata") or {}, deteccion=deteccion))
+    return resultado
+
+def leer_trama(entrada, longitud):
+    """Lee exactamente los bytes del PDF que siguen al encabezado del trabajo"""
+    # read(-1) consumiría el resto de la entrada y dejaría al trabajador esperando
+    # para siempre; un float se truncaría y desincronizaría la entrada
+    if isinstance(longitud, (bool, float)):
+        raise ValueError(f"Longitud de trama inválida: {longitud}")
+    try:
+        longitud = int(longitud)
+    except (TypeError, ValueError):
+        raise ValueError(f"Longitud de trama inválida: {longitud}")
+    if longitud < 0:
+        raise ValueError(f"Longitud de trama inválida: {longitud}")
+    datos = entrada.read(longitud)
+    if len(datos) != longitud:
+        raise ValueError(f"Trama incompleta: se esperaban {longitud} bytes y llegaron {len(datos)}")
+    return datos
+
+def atender_trabajo(linea, entrada=None):
+    """
+    Procesa un trabajo {vendor, path} o {vendor, length} seguido de los bytes
+    del PDF y regresa la respuesta como diccionario
+    """
+    trabajo_id = None
+    try:
+        trabajo = json.loads(linea)
+        trabajo_id = trabajo.get('id')
+        # La trama se consume antes de validar el trabajo para no desincronizar la entrada
+        origen = leer_trama(entrada, trabajo['length']) if 'length' in trabajo else trabajo['path']
+        resultado, medicion = metricas.medir(extraer, trabajo['vendor'], origen)
+        resultado = formato_salida.preparar(metricas.agregar_timings(resultado, medicion))
+        return {"id": trabajo_id, "ok": True, "resultado": resultado}
+    except Exception as e:
+        return {"id": trabajo_id, "ok": False, "error": f"Error procesando PDF: {str(e)}"}
+
+def servir(entrada=None, salida=None):
+    """
+    Modo trabajador: lee un trabajo JSON por línea y escribe una respuesta JSON por línea.
+    Un trabajo con "length" en lugar de "path" va seguido de ese número de bytes del PDF.
+    """
+    entrada = entrada or sys.stdin.buffer
+    salida = salida or sys.stdout
+    for linea in iter(entrada.readline, b''):
+        if not linea.strip():
+            continue
+        respuesta = atender_trabajo(linea, entrada)
+        salida.write(json.dumps(respuesta, ensure_ascii=False, separators=formato_salida.separadores(),
+                                default=a_json) + "\n")
+        salida.flush()
+
+def main(programa='python extractores.py'):
+    sys.argv = argumentos.procesar(sys.argv)
+    if len(sys.argv) == 2 and sys.argv[1] == '--serve':
+        precargar()
+        servir()
+        return
+
+    if len(sys.argv) != 3:
+        print(f"Uso: {programa} [--timings] [--perfil=archivo.prof] [--motor=crudo] [--compact[=columnas]] --serve", file=sys.stderr)
+        print(f"     {programa} [--timings] [--perfil=archivo.prof] [--motor=crudo] [--compact[=json|columnas|ndjson]] <proveedor> archivo.pdf|-", file=sys.stderr)
+        sys.exit(1)
+
+    clave = normalizar_proveedor(sys.argv[1])
+    if formato_salida.modo() == 'ndjson' and clave in EXTRACTORES_NDJSON:
+        medicion = metricas.iniciar()
+        try:
+            eventos_pdf, _ = cargar_extractor(clave, EXTRACTORES_NDJSON)
+            eventos = eventos_pdf(texto_paginas.leer_origen(sys.argv[2]))
+            formato_salida.escribir_ndjson(eventos, sys.stdout, medicion, ensure_ascii=False)
+        except Exception as e:
+            metricas.terminar(medicion)
+            print(json.dumps({"error": f"Error procesando PDF: {str(e)}"}))
+            sys.exit(1)
+        return
+
+    try:
+        datos, medicion = metricas.medir(extraer, sys.argv[1], texto_paginas.leer_origen(sys.argv[2]))
+        print(formato_salida.serializar(datos, medicion, indent=2, ensure_ascii=False))
+    except Exception as e:
+        print(json.dumps({"error": f"Error procesando PDF: {str(e)}"}, indent=2))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,19 @@
 import re
 import json
-import PyPDF2
 import sys
 
+from cache_extraccion import extraer_con_cache
+import argumentos
+import formato_salida
+import metricas
+from modelo_cotizacion import Cotizacion, Producto, ESQUEMA_DICE
+import texto_paginas
+
+# Cambiar al modificar el parser para invalidar los resultados en caché
+VERSION_PARSER = "3"
+# Motor de texto con el que se validó el parser (ver texto_paginas)
+MOTOR_TEXTO = 'pypdf2'
+
 def extraer_informacion_cotizacion_dice(texto_pdf):
     """
     Extrae información de una cotización Grupo Dice y la convierte a JSON
@@ -50,17 +61,18 @@ def extraer_informacion_cotizacion_dice(texto_pdf):
         precio_extendido = float(match[7].replace(',', ''))
         stock = match[8].strip()
         
-        producto = {
-            "partida": partida,
-            "cantidad": cantidad,
-            "codigo": codigo,
-            "descripcion": descripcion,
-            "precioLista": precio_lista,
-            "precioUnitario": precio_unitario,
-            "descuento": f"{descuento}%",
-            "precioExtendido": precio_extendido,
-            "stock": stock
-        }
+        producto = Producto(
+            ESQUEMA_DICE,
+            partida=partida,
+            cantidad=cantidad,
+            codigo=codigo,
+            descripcion=descripcion,
+            precioLista=precio_lista,
+            precioUnitario=precio_unitario,
+            descuento=f"{descuento}%",
+            importe=precio_extendido,
+            stock=stock
+        )
         productos.append(producto)
     
     # Si no se encontraron productos con el patrón anterior, usar método alternativo más robusto
@@ -92,17 +104,18 @@ def extraer_informacion_cotizacion_dice(texto_pdf):
                     precio_extendido = float(precio_match.group(4).replace(',', ''))
                     stock = precio_match.group(5).strip()
                     
-                    producto = {
-                        "partida": partida,
-                        "cantidad": cantidad,
-                        "codigo": codigo,
-                        "descripcion": descripcion_partes,
-                        "precioLista": precio_lista,
-                        "precioUnitario": precio_unitario,
-                        "descuento": f"{descuento}%",
-                        "precioExtendido": precio_extendido,
-                        "stock": stock
-                    }
+                    producto = Producto(
+                        ESQUEMA_DICE,
+                        partida=partida,
+                        cantidad=cantidad,
+                        codigo=codigo,
+                        descripcion=descripcion_partes,
+                        precioLista=precio_lista,
+                        precioUnitario=precio_unitario,
+                        descuento=f"{descuento}%",
+                        importe=precio_extendido,
+                        stock=stock
+                    )
                     productos.append(producto)
     
     # Extraer totales - Patrones específicos para el formato del PDF
@@ -126,42 +139,42 @@ def extraer_informacion_cotizacion_dice(texto_pdf):
     total = float(total_match.group(1).replace(',', '')) if total_match else 0.0
     
     # Crear el JSON final
-    resultado = {
-        "folio": folio,
-        "fecha": fecha,
-        "ejecutivo": ejecutivo,
-        "productos": productos,
-        "totales": {
+    return Cotizacion(
+        folio=folio,
+        fecha=fecha,
+        ejecutivo=ejecutivo,
+        productos=productos,
+        totales={
             "subTotal": subtotal,
             "iva": iva,
             "total": total
         }
-    }
+    )
+
+def extraer_datos_dice(archivo_pdf):
+    """
+    Lee el PDF de Grupo Dice y regresa el diccionario con la información extraída
+    """
+    texto_completo = texto_paginas.texto_completo(archivo_pdf, texto_paginas.motor_para('grupo dice', MOTOR_TEXTO), separador="", omitir_vacias=False)
     
-    return resultado
+    return extraer_informacion_cotizacion_dice(texto_completo)
 
 def procesar_pdf_dice(archivo_pdf):
     """
     Función principal para procesar un archivo PDF de cotización Grupo Dice
     """
     try:
-        with open(archivo_pdf, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            texto_completo = ""
-            
-            for page in pdf_reader.pages:
-                texto_completo += page.extract_text()
-            
-            resultado = extraer_informacion_cotizacion_dice(texto_completo)
-            return json.dumps(resultado, indent=2, ensure_ascii=False)
+        resultado, medicion = metricas.medir(extraer_con_cache, 'grupo dice', VERSION_PARSER, archivo_pdf, extraer_datos_dice)
+        return formato_salida.serializar(resultado, medicion, indent=2, ensure_ascii=False)
     
     except Exception as e:
         return json.dumps({"error": f"Error procesando PDF: {str(e)}"}, indent=2)
 
 if __name__ == "__main__":
+    sys.argv = argumentos.procesar(sys.argv)
     if len(sys.argv) < 2:
-        print("Uso: python extraer_datos_grupo_dice.py <archivo_pdf>")
+        print("Uso: python extraer_datos_grupo_dice.py <archivo_pdf | ->")
         sys.exit(1)
     
-    archivo = sys.argv[1]
+    archivo = texto_paginas.leer_origen(sys.argv[1])
     print(procesar_pdf_dice(archivo))
\ No newline at end of file
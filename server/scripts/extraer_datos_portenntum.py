@@ -1,8 +1,18 @@
-import pdfplumber
 import re
-import json
 import sys
-import os
+
+from cache_extraccion import extraer_con_cache
+import argumentos
+import formato_salida
+import memoria_acotada
+import metricas
+from modelo_cotizacion import Cotizacion, Producto, ESQUEMA_PORTENNTUM
+import texto_paginas
+
+# Cambiar al modificar el parser para invalidar los resultados en caché
+VERSION_PARSER = "3"
+# Motor de texto con el que se validó el parser (ver texto_paginas)
+MOTOR_TEXTO = 'pdfplumber'
 
 def try_float(valor):
     if not valor:
@@ -13,145 +23,183 @@ def try_float(valor):
         return None
 
 def extraer_datos_portentum(path_pdf):
-    with pdfplumber.open(path_pdf) as pdf:
-        texto = "\n".join([p.extract_text() for p in pdf.pages if p.extract_text()])
-        lineas = texto.split('\n')
-
-        # ==== DATOS GENERALES ====
-        folio = ""
-        match_folio = re.search(r'22040.*?(\d+)', texto, re.DOTALL)
-        if match_folio:
-            folio = match_folio.group(1).strip()
-
-        fecha = ""
-        datos_fiscales = ""
-        rfc = ""
-        ejecutivo = ""
-        email = ""
-        telefono = ""
-        sub_total = 0.0
-        iva = 0.0
-        total = 0.0
-
-        for i, linea in enumerate(lineas):
-            if re.match(r"^Fecha:", linea.strip()):
-                if i+1 < len(lineas):
-                    fecha = lineas[i+1].strip()
-            if "Cotización para:" in linea:
-                if i+1 < len(lineas):
-                    datos_fiscales = lineas[i+1].strip()
-            if "Email:" in linea:
-                email = linea.split("Email:")[-1].strip()
-            if "Telefono:" in linea:
-                telefono = linea.split("Telefono:")[-1].strip()
-            if "Atentamente:" in linea:
-                if i+1 < len(lineas):
-                    ejecutivo = lineas[i+1].strip()
-            if "SubTotal:" in linea:
-                sub_total = try_float(linea.split("SubTotal:")[-1])
-            if "I.V.A.:" in linea:
-                iva = try_float(linea.split("I.V.A.:")[-1])
-            if "Total:" in linea:
-                total = try_float(linea.split("Total:")[-1])
-
-        # ==== EXTRACCIÓN DE PRODUCTOS ====
-        productos = []
-        in_productos = False
-        i = 0
-        while i < len(lineas):
-            linea = lineas[i].strip()
-            # Detectar inicio de productos
-            if re.match(r"^Linea Parte", linea):
-                in_productos = True
-                i += 1
+    motor = texto_paginas.motor_para('portenntum clasico', MOTOR_TEXTO)
+    if memoria_acotada.acotada():
+        return extraer_informacion_portentum_lineas(texto_paginas.iterar_lineas(path_pdf, motor))
+    texto = texto_paginas.texto_completo(path_pdf, motor)
+    return extraer_informacion_portentum(texto)
+
+def extraer_informacion_portentum(texto):
+    """
+    Extrae la información de una cotización Portenntum clásica a partir del texto ya extraído
+    """
+    return extraer_informacion_portentum_lineas(texto.split('\n'))
+
+# Patrones compilados una sola vez
+PATRON_NUMERO = re.compile(r'\d+')
+PATRON_FECHA = re.compile(r"^Fecha:")
+PATRON_INICIO_PRODUCTOS = re.compile(r"^Linea Parte")
+PATRON_PRODUCTO = re.compile(
+    r"^(\d+)\s+([A-Z0-9\-]+)\s+(.+?)\s+(\d+\.\d{4})\s+([A-Z]+)\s+([\d,]+\.\d+)\s+([\d\.]+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)$"
+)
+PATRON_SIGUIENTE_PRODUCTO = re.compile(r"^\d+ [A-Z0-9\-]+ ")
+# La descripción de un producto termina en una línea vacía, en el siguiente producto,
+# en los totales o en los textos del pie de página
+INICIOS_FIN_DESCRIPCION = ("SubTotal:", "I.V.A.:", "Total:")
+TEXTOS_FIN_DESCRIPCION = (
+    "Cotización Página",  # Pie de página
+    "Av. Revolución",  # Direcciones
+    "A partir del",  # Políticas
+    "Los precios pueden cambiar",  # Políticas
+    "PORTENNTUM DE MEXICO",  # Información de empresa
+    "Politica de cargo",  # Políticas
+    "Información para pago",  # Info de pago
+    "Atentamente:",  # Cierre
+    "Banorte No.",  # Info bancaria
+    "Bancomer Convenio",  # Info bancaria
+)
+TEXTOS_TOTALES = ("SubTotal:", "I.V.A.:", "Total:")
+
+def fin_descripcion(linea):
+    return (not linea or
+            PATRON_SIGUIENTE_PRODUCTO.match(linea) or
+            linea.startswith(INICIOS_FIN_DESCRIPCION) or
+            any(texto in linea for texto in TEXTOS_FIN_DESCRIPCION))
+
+def producto_portentum(match, desc_lines):
+    # Mapear los campos al formato esperado por la aplicación (compatible con Syscom)
+    # Esquema compatible con Syscom; clave, concepto, precio y total repiten
+    # codigo, descripcion, precioUnitario e importe (ver modelo_cotizacion)
+    return Producto(
+        ESQUEMA_PORTENNTUM,
+        cantidad=float(match.group(4)),
+        unidad=match.group(5),
+        codigo=match.group(2),
+        descripcion=" ".join(desc_lines),
+        marca="",
+        modelo="",
+        precioUnitario=try_float(match.group(8)),
+        importe=try_float(match.group(9)),
+        precioLista=try_float(match.group(6)),
+        descuento=match.group(7),
+        alm=""  # Portentum no maneja almacén como Syscom
+    )
+
+def extraer_informacion_portentum_lineas(lineas):
+    """
+    Recorre las líneas una sola vez conforme llegan. Los campos que están en la
+    línea siguiente a su etiqueta (Fecha:, Cotización para:, Atentamente:) se
+    asignan al llegar esa línea, y el producto cuya descripción continúa en las
+    líneas siguientes se completa con ellas, sin volver a leerlas.
+    """
+    # ==== DATOS GENERALES ====
+    folio = ""
+    buscando_folio = False
+    fecha = ""
+    datos_fiscales = ""
+    rfc = ""
+    ejecutivo = ""
+    email = ""
+    telefono = ""
+    sub_total = 0.0
+    iva = 0.0
+    total = 0.0
+    siguiente = ()
+
+    # ==== EXTRACCIÓN DE PRODUCTOS ====
+    productos = []
+    in_productos = False
+    fin_productos = False
+    # (match del producto, líneas de descripción, termina la tabla al cerrarlo)
+    pendiente = None
+
+    for linea_pdf in lineas:
+        # El folio son los primeros dígitos después de "22040", en la misma línea o en las siguientes
+        if not folio:
+            if buscando_folio:
+                match_folio = PATRON_NUMERO.search(linea_pdf)
+            else:
+                posicion = linea_pdf.find('22040')
+                buscando_folio = posicion >= 0
+                match_folio = PATRON_NUMERO.search(linea_pdf, posicion + 5) if buscando_folio else None
+            if match_folio:
+                folio = match_folio.group(0)
+
+        # Campos cuyo valor es esta línea
+        for campo in siguiente:
+            if campo == 'fecha':
+                fecha = linea_pdf.strip()
+            elif campo == 'datos_fiscales':
+                datos_fiscales = linea_pdf.strip()
+            else:
+                ejecutivo = linea_pdf.strip()
+        siguiente = []
+        if PATRON_FECHA.match(linea_pdf.strip()):
+            siguiente.append('fecha')
+        if "Cotización para:" in linea_pdf:
+            siguiente.append('datos_fiscales')
+        if "Email:" in linea_pdf:
+            email = linea_pdf.split("Email:")[-1].strip()
+        if "Telefono:" in linea_pdf:
+            telefono = linea_pdf.split("Telefono:")[-1].strip()
+        if "Atentamente:" in linea_pdf:
+            siguiente.append('ejecutivo')
+        if "SubTotal:" in linea_pdf:
+            sub_total = try_float(linea_pdf.split("SubTotal:")[-1])
+        if "I.V.A.:" in linea_pdf:
+            iva = try_float(linea_pdf.split("I.V.A.:")[-1])
+        if "Total:" in linea_pdf:
+            total = try_float(linea_pdf.split("Total:")[-1])
+
+        if fin_productos:
+            continue
+        linea = linea_pdf.strip()
+        if pendiente is not None:
+            match, desc_lines, termina = pendiente
+            if not fin_descripcion(linea):
+                desc_lines.append(linea)
                 continue
-            if in_productos:
-                # Detectar línea de producto (empieza con número y código)
-                match = re.match(
-                    r"^(\d+)\s+([A-Z0-9\-]+)\s+(.+?)\s+(\d+\.\d{4})\s+([A-Z]+)\s+([\d,]+\.\d+)\s+([\d\.]+)\s+([\d,]+\.\d+)\s+([\d,]+\.\d+)$",
-                    linea
-                )
-                if match:
-                    parte = match.group(2)
-                    descripcion = match.group(3)
-                    cantidad = match.group(4)
-                    unidad = match.group(5)
-                    precio_lista = try_float(match.group(6))
-                    dto = match.group(7)
-                    precio_costo = try_float(match.group(8))
-                    precio_ext = try_float(match.group(9))
-                    
-                    # Unir líneas de descripción con límites más estrictos
-                    desc_lines = [descripcion]
-                    j = i + 1
-                    while j < len(lineas):
-                        sig = lineas[j].strip()
-                        # Parar si encuentra:
-                        if (not sig or  # Línea vacía
-                            re.match(r"^\d+ [A-Z0-9\-]+ ", sig) or  # Siguiente producto
-                            re.match(r"^SubTotal:", sig) or  # Totales
-                            re.match(r"^I\.V\.A\.:", sig) or
-                            re.match(r"^Total:", sig) or
-                            "Cotización Página" in sig or  # Pie de página
-                            "Av. Revolución" in sig or  # Direcciones
-                            "A partir del" in sig or  # Políticas
-                            "Los precios pueden cambiar" in sig or  # Políticas
-                            "PORTENNTUM DE MEXICO" in sig or  # Información de empresa
-                            "Politica de cargo" in sig or  # Políticas
-                            "Información para pago" in sig or  # Info de pago
-                            "Atentamente:" in sig or  # Cierre
-                            "Banorte No." in sig or  # Info bancaria
-                            "Bancomer Convenio" in sig):  # Info bancaria
-                            break
-                        desc_lines.append(sig)
-                        j += 1
-                    
-                    descripcion = " ".join(desc_lines)
-                    
-                    # Mapear los campos al formato esperado por la aplicación (compatible con Syscom)
-                    productos.append({
-                        "cantidad": float(cantidad),
-                        "unidad": unidad,
-                        "codigo": parte,
-                        "clave": parte,
-                        "descripcion": descripcion,
-                        "concepto": descripcion,
-                        "marca": "",
-                        "modelo": "",
-                        "precioUnitario": precio_costo,
-                        "precio": precio_costo,
-                        "importe": precio_ext,
-                        "total": precio_ext,
-                        "precioLista": precio_lista,
-                        "descuento": dto,
-                        "alm": ""  # Portentum no maneja almacén como Syscom
-                    })
-                    i = j - 1  # Saltar las líneas de descripción ya procesadas
+            productos.append(producto_portentum(match, desc_lines))
+            pendiente = None
+            if termina:
+                fin_productos = True
+                continue
+        # Detectar inicio de productos
+        if PATRON_INICIO_PRODUCTOS.match(linea):
+            in_productos = True
+            continue
+        if in_productos:
+            termina = any(texto in linea for texto in TEXTOS_TOTALES)
+            # Detectar línea de producto (empieza con número y código)
+            match = PATRON_PRODUCTO.match(linea)
+            if match:
+                pendiente = (match, [match.group(3)], termina)
+            elif termina:
                 # Fin de productos
-                if "SubTotal:" in linea or "I.V.A.:" in linea or "Total:" in linea:
-                    break
-            i += 1
-
-        resultado = {
-            "folio": folio,
-            "fecha": fecha,
-            "datosFiscales": datos_fiscales,
-            "rfc": rfc,
-            "ejecutivo": ejecutivo,
-            "email": email,
-            "telefono": telefono,
-            "fechaVencimiento": "",
-            "formaPago": "POR DEFINIR",
-            "usoMercancia": "G03 - GASTOS EN GENERAL",
-            "metodoPago": "",
-            "productos": productos,
-            "totales": {
-                "subTotal": sub_total if sub_total else 0,
-                "iva": iva if iva else 0,
-                "total": total if total else 0
-            }
+                fin_productos = True
+
+    if pendiente is not None:
+        productos.append(producto_portentum(pendiente[0], pendiente[1]))
+
+    return Cotizacion(
+        folio=folio,
+        fecha=fecha,
+        datosFiscales=datos_fiscales,
+        rfc=rfc,
+        ejecutivo=ejecutivo,
+        email=email,
+        telefono=telefono,
+        fechaVencimiento="",
+        formaPago="POR DEFINIR",
+        usoMercancia="G03 - GASTOS EN GENERAL",
+        metodoPago="",
+        productos=productos,
+        totales={
+            "subTotal": sub_total if sub_total else 0,
+            "iva": iva if iva else 0,
+            "total": total if total else 0
         }
-        return resultado
+    )
 
 def imprimir_resumen_productos(productos):
     """Imprime un resumen de los productos extraídos"""
@@ -171,25 +219,26 @@ def imprimir_resumen_productos(productos):
                 print(f"   - {p.get('codigo', 'N/A')}: {p.get('descripcion', 'N/A')[:50]}...", file=sys.stderr)
 
 if __name__ == "__main__":
+    sys.argv = argumentos.procesar(sys.argv)
     if len(sys.argv) != 2:
         print("❌ ERROR: Se requiere la ruta del archivo PDF como argumento", file=sys.stderr)
-        print("Uso: python extraer_datos_portentum.py <archivo_pdf>", file=sys.stderr)
+        print("Uso: python extraer_datos_portentum.py <archivo_pdf | ->", file=sys.stderr)
         sys.exit(1)
     
-    path_pdf = sys.argv[1]
+    path_pdf = texto_paginas.leer_origen(sys.argv[1])
     
-    if not os.path.exists(path_pdf):
+    if not texto_paginas.origen_existe(path_pdf):
         print(f"❌ Error: El archivo {path_pdf} no existe", file=sys.stderr)
         sys.exit(1)
     
     try:
-        datos = extraer_datos_portentum(path_pdf)
+        datos, medicion = metricas.medir(extraer_con_cache, 'portenntum clasico', VERSION_PARSER, path_pdf, extraer_datos_portentum)
         
         # Imprimir resumen en stderr para debug
         imprimir_resumen_productos(datos["productos"])
         
         # Imprimir JSON en stdout para captura
-        print(json.dumps(datos, indent=2, ensure_ascii=False))
+        print(formato_salida.serializar(datos, medicion, indent=2, ensure_ascii=False))
         
     except Exception as e:
         print(f"❌ ERROR al procesar el PDF: {str(e)}", file=sys.stderr)
@@ -1,8 +1,19 @@
-import pdfplumber
 import re
 import json
 import sys
 
+from cache_extraccion import extraer_con_cache, resultado_en_cache
+import argumentos
+import formato_salida
+import metricas
+from modelo_cotizacion import Cotizacion, Producto, ESQUEMA_ARUBA
+import texto_paginas
+
+# Cambiar al modificar el parser para invalidar los resultados en caché
+VERSION_PARSER = "3"
+# Motor de texto con el que se validó el parser (ver texto_paginas)
+MOTOR_TEXTO = 'pdfplumber'
+
 def limpiar_numero(texto):
     return float(re.sub(r'[^\d.]', '', texto.replace(' ', '').replace(',', '')))
 
@@ -22,127 +33,260 @@ def reparar_linea_fragmentada(linea):
     
     return linea
 
-def extraer_productos_fragmentados(lines):
-    """Extrae productos manejando la fragmentación real del PDF"""
-    productos = []
-    buffer = ""
-    productos_raw = []
-    
-    # Unir líneas fragmentadas
-    for line in lines:
-        if line.startswith('*') and buffer:
-            productos_raw.append(buffer.strip())
-            buffer = line
-        else:
-            buffer += " " + line if buffer else line
+# Regex súper flexible para manejar fragmentación
+PATRON_PRODUCTO = re.compile(
+    r'^\*(.+?)\s+(\d+)\s+([A-Z0-9\-]+)\s+(.+?)\s+\$\s*([\d\s,]+\.\d{2})\s+\$\s*[\d\s,]+\.\d{2}\s+([\d\s]+)\s+([\d.]+)%\s+\$\s*([\d\s,]+\.\d{2})\s+\$\s*([\d\s,]+\.\d{2})\s+(.+)$'
+)
+PATRON_CODIGO = re.compile(r'[A-Z0-9\-]+')
+DIGITOS = '0123456789'
+
+def _precio(segmento):
+    """
+    Separa '  1 2,120.00  resto' en (12120.0, '  resto'): el número llega hasta el
+    primer punto y dos decimales, con espacios y comas en cualquier parte como
+    acepta PATRON_PRODUCTO. None si el segmento no empieza así.
+    """
+    punto = segmento.find('.')
+    fin = punto + 3
+    if punto < 0 or fin >= len(segmento) or not segmento[fin].isspace():
+        return None
+    decimales = segmento[punto + 1:fin]
+    # strip() con un conjunto de caracteres deja texto solo si hay otros caracteres
+    cifras = "".join(segmento[:punto].split())
+    enteros = cifras.replace(",", "")
+    if not enteros or cifras.strip(DIGITOS + ",") or decimales.strip(DIGITOS):
+        return None
+    return float(f"{enteros}.{decimales}"), segmento[fin:]
+
+def _porcentaje(segmento):
+    """
+    Texto del descuento de '$ <p.lista> <inventario> <porcentaje>%', igual al que
+    captura PATRON_PRODUCTO. El inventario puede venir pegado al porcentaje
+    ('1510.00%' es inventario 15 y '10.00').
+    None si el segmento necesita las reparaciones de reparar_linea_fragmentada.
+    """
+    precio = _precio(segmento)
+    if precio is None:
+        return None
+    resto = precio[1]
+    tokens = resto.split()
+    if not tokens or not resto[-1].isspace() or resto.count('%') != 1 or tokens[-1][-1] != '%':
+        return None
+    valor = tokens[-1][:-1]
+    inventario = tokens[:-1]
+    if not valor or valor.strip(DIGITOS + ".") or "".join(inventario).strip(DIGITOS):
+        return None
+    enteros = valor.find('.')
+    enteros = len(valor) if enteros < 0 else enteros
+    if enteros <= 2 and inventario:
+        return valor
+    if enteros in (4, 5) and len(valor) == enteros + 3 and not valor[-2:].strip(DIGITOS):
+        return valor[-5:]
+    return None
+
+def tokenizar_producto(linea):
+    """
+    Producto de una línea con la forma normal '*concepto cantidad parte nombre
+    $ p.lista $ p.lista inventario %desc $ p.unitario $ p.extendido disponibilidad'
+    en una sola pasada por sus partes (sin reparar la línea ni aplicar
+    PATRON_PRODUCTO). Regresa None cuando la línea no tiene esa forma exacta.
+    """
+    partes = linea.split('$')
+    if len(partes) != 5:
+        return None
+    cabeza, lista, descuento, unitario, extendido = partes
+
+    tokens = cabeza.split()
+    if (len(tokens) < 4 or len(tokens[0]) < 2 or cabeza[0] != '*' or not cabeza[-1].isspace()
+            or '.' in cabeza or not tokens[1].isascii() or not tokens[1].isdigit()
+            or not PATRON_CODIGO.fullmatch(tokens[2])):
+        return None
+    # El nombre conserva sus espacios internos como en el texto original
+    inicio = cabeza.index(tokens[2], cabeza.index(tokens[1], len(tokens[0]))) + len(tokens[2])
+    nombre = cabeza[inicio:].strip()
+
+    precio_lista = _precio(lista)
+    porcentaje = _porcentaje(descuento)
+    p_unitario = _precio(unitario)
+    p_extendido = _precio(extendido)
+    if precio_lista is None or porcentaje is None or p_unitario is None or p_extendido is None:
+        return None
+    if precio_lista[1].strip() or p_unitario[1].strip():
+        return None
+    disponibilidad = p_extendido[1].strip()
+    if not disponibilidad or '.' in disponibilidad or '%' in disponibilidad:
+        return None
+
+    return Producto(
+        ESQUEMA_ARUBA,
+        cantidad=float(tokens[1]),
+        codigo=tokens[2],
+        descripcion=f"{nombre} - {disponibilidad}",
+        precioLista=precio_lista[0],
+        descuento=porcentaje,
+        precioUnitario=p_unitario[0],
+        importe=p_extendido[0]
+    )
+
+def producto_aruba(prod):
+    """Producto de una línea ya unida, o None si no tiene el formato esperado"""
+    if prod.count('$') < 4:
+        # Sin los cuatro precios PATRON_PRODUCTO no puede coincidir
+        return None
+    producto = tokenizar_producto(prod)
+    if producto is not None:
+        return producto
+
+    # Líneas irregulares: reparar fragmentación antes de aplicar regex
+    prod_reparado = reparar_linea_fragmentada(prod)
     
-    if buffer:
-        productos_raw.append(buffer.strip())
+    match = PATRON_PRODUCTO.match(prod_reparado)
+    if not match:
+        return None
+    cantidad = float(match.group(2))
+    no_parte = match.group(3)
+    nombre = match.group(4).strip()
+    precio_lista = limpiar_numero(match.group(5))
+    porcentaje = match.group(7)
+    p_unitario = limpiar_numero(match.group(8))
+    p_extendido = limpiar_numero(match.group(9))
+    disponibilidad = match.group(10).strip()
     
-    # Regex súper flexible para manejar fragmentación
-    regex = re.compile(
-        r'^\*(.+?)\s+(\d+)\s+([A-Z0-9\-]+)\s+(.+?)\s+\$\s*([\d\s,]+\.\d{2})\s+\$\s*[\d\s,]+\.\d{2}\s+([\d\s]+)\s+([\d.]+)%\s+\$\s*([\d\s,]+\.\d{2})\s+\$\s*([\d\s,]+\.\d{2})\s+(.+)$'
+    return Producto(
+        ESQUEMA_ARUBA,
+        cantidad=cantidad,
+        codigo=no_parte,
+        descripcion=f"{nombre} - {disponibilidad}",
+        precioLista=precio_lista,
+        descuento=porcentaje,
+        precioUnitario=p_unitario,
+        importe=p_extendido
     )
+
+def extraer_datos_aruba(archivo_pdf):
+    """Lee el PDF Aruba de Portenntum y regresa el diccionario con la información extraída"""
+    # El parser recorre las páginas conforme se extraen, sin guardar el texto de todas
+    return extraer_informacion_aruba(texto_paginas.iterar_paginas(archivo_pdf, texto_paginas.motor_para('portenntum aruba', MOTOR_TEXTO)))
+
+def extraer_informacion_aruba(textos_paginas):
+    """Extrae la información de una cotización Aruba a partir del texto de cada página"""
+    encabezado = {}
+    productos = []
+    totales = {}
+    for tipo, datos in iterar_aruba(textos_paginas):
+        if tipo == 'producto':
+            productos.append(datos)
+        elif tipo == 'encabezado':
+            encabezado.update(datos)
+        else:
+            totales = datos.pop('totales')
+            encabezado.update(datos)
     
-    for prod in productos_raw:
-        # Reparar fragmentación antes de aplicar regex
-        prod_reparado = reparar_linea_fragmentada(prod)
-        
-        match = regex.match(prod_reparado)
-        if match:
-            cantidad = float(match.group(2))
-            no_parte = match.group(3)
-            nombre = match.group(4).strip()
-            precio_lista = limpiar_numero(match.group(5))
-            porcentaje = match.group(7)
-            p_unitario = limpiar_numero(match.group(8))
-            p_extendido = limpiar_numero(match.group(9))
-            disponibilidad = match.group(10).strip()
-            
-            productos.append({
-                "cantidad": cantidad,
-                "codigo": no_parte,
-                "descripcion": f"{nombre} - {disponibilidad}",
-                "precioLista": precio_lista,
-                "porcentaje": porcentaje,
-                "precioUnitario": p_unitario,
-                "pExtendido": p_extendido
-            })
-    
-    return productos
+    return Cotizacion(productos=productos, totales=totales, **encabezado)
 
-def procesar_pdf_portentum(archivo_pdf):
-    try:
-        with pdfplumber.open(archivo_pdf) as pdf:
-            lines = []
-            folio = fecha = ejecutivo = ""
-            total = 0.0
-            in_tabla = False
+def iterar_aruba(textos_paginas):
+    """
+    Recorre la cotización página por página y genera sus partes conforme se leen
+    (ver formato_salida.escribir_ndjson): ('encabezado', dict) antes del primer
+    producto, ('producto', Producto) en cuanto se cierra cada uno y ('cierre', dict)
+    con los totales y los campos del encabezado que aparecieron después.
+    """
+    folio = fecha = ejecutivo = ""
+    total = 0.0
+    in_tabla = False
+    buffer = ""
+    emitido = None
+    
+    for text in textos_paginas:
+        for line in text.split('\n'):
+            # Detectar inicio y fin de tabla de productos
+            if 'Concepto Cantidad No. De Parte Nombre de Producto' in line:
+                in_tabla = True
+                continue
+            if 'Total P. Lista' in line:
+                in_tabla = False
+            
+            # Capturar líneas de productos; el anterior termina cuando empieza otro
+            if in_tabla and line.strip().startswith('*'):
+                if buffer:
+                    producto = producto_aruba(buffer)
+                    if producto is not None:
+                        if emitido is None:
+                            emitido = {"folio": folio, "fecha": fecha, "ejecutivo": ejecutivo}
+                            yield 'encabezado', emitido
+                        yield 'producto', producto
+                buffer = line.strip()
             
-            for page in pdf.pages:
-                text = page.extract_text()
-                for line in text.split('\n'):
-                    # Detectar inicio y fin de tabla de productos
-                    if 'Concepto Cantidad No. De Parte Nombre de Producto' in line:
-                        in_tabla = True
-                        continue
-                    if 'Total P. Lista' in line:
-                        in_tabla = False
-                    
-                    # Capturar líneas de productos
-                    if in_tabla and line.strip().startswith('*'):
-                        lines.append(line.strip())
-                    
-                    # Buscar folio
-                    if not folio:
-                        m = re.search(r'Folio:\s*([^\s]+)', line)
-                        if m:
-                            folio = m.group(1)
-                    
-                    # Buscar fecha
-                    if not fecha:
-                        m = re.search(r'Fecha:\s*(\d{2})-(\w{3})-(\d{2})', line)
-                        if m:
-                            dia, mes_texto, anio = m.groups()
-                            meses = {'ene':'01','feb':'02','mar':'03','abr':'04','may':'05','jun':'06','jul':'07','ago':'08','sep':'09','oct':'10','nov':'11','dic':'12'}
-                            mes = meses.get(mes_texto.lower(), '01')
-                            fecha = f"20{anio}-{mes}-{dia}"
-                    
-                    # Buscar ejecutivo
-                    if not ejecutivo:
-                        m = re.search(r'Elaborado por:\s*([^\n\r]+)', line)
-                        if m:
-                            ejecutivo = m.group(1).strip()
-                    
-                    # Buscar total
-                    if 'P.Venta Canal' in line:
-                        m = re.search(r'P\.Venta Canal\s*\$\s*([\d\s,]+\.\d{2})', line)
-                        if m:
-                            total = limpiar_numero(m.group(1))
+            # Buscar folio
+            if not folio:
+                m = re.search(r'Folio:\s*([^\s]+)', line)
+                if m:
+                    folio = m.group(1)
             
-            # Extraer productos
-            productos = extraer_productos_fragmentados(lines)
+            # Buscar fecha
+            if not fecha:
+                m = re.search(r'Fecha:\s*(\d{2})-(\w{3})-(\d{2})', line)
+                if m:
+                    dia, mes_texto, anio = m.groups()
+                    meses = {'ene':'01','feb':'02','mar':'03','abr':'04','may':'05','jun':'06','jul':'07','ago':'08','sep':'09','oct':'10','nov':'11','dic':'12'}
+                    mes = meses.get(mes_texto.lower(), '01')
+                    fecha = f"20{anio}-{mes}-{dia}"
             
-            resultado = {
-                "folio": folio,
-                "fecha": fecha,
-                "ejecutivo": ejecutivo,
-                "productos": productos,
-                "totales": {
-                    "total": total
-                },
-
-            }
+            # Buscar ejecutivo
+            if not ejecutivo:
+                m = re.search(r'Elaborado por:\s*([^\n\r]+)', line)
+                if m:
+                    ejecutivo = m.group(1).strip()
             
-            print(json.dumps(resultado, indent=2, ensure_ascii=False))
+            # Buscar total
+            if 'P.Venta Canal' in line:
+                m = re.search(r'P\.Venta Canal\s*\$\s*([\d\s,]+\.\d{2})', line)
+                if m:
+                    total = limpiar_numero(m.group(1))
+    
+    actual = {"folio": folio, "fecha": fecha, "ejecutivo": ejecutivo}
+    producto = producto_aruba(buffer) if buffer else None
+    if emitido is None:
+        emitido = actual
+        yield 'encabezado', emitido
+    if producto is not None:
+        yield 'producto', producto
+    cierre = {campo: valor for campo, valor in actual.items() if valor != emitido[campo]}
+    cierre["totales"] = {"total": total}
+    yield 'cierre', cierre
+
+def eventos_pdf_aruba(archivo_pdf):
+    """
+    Partes de la cotización para la salida NDJSON en streaming. Solo se tiene en
+    memoria la página en curso; un PDF que no está en caché no se guarda en ella.
+    """
+    guardado = resultado_en_cache('portenntum aruba', VERSION_PARSER, archivo_pdf)
+    if guardado is not None:
+        return formato_salida.eventos_resultado(guardado)
+    return iterar_aruba(texto_paginas.iterar_paginas(archivo_pdf, texto_paginas.motor_para('portenntum aruba', MOTOR_TEXTO)))
+
+def procesar_pdf_portentum(archivo_pdf):
+    if formato_salida.modo() == 'ndjson':
+        medicion = metricas.iniciar()
+        try:
+            formato_salida.escribir_ndjson(eventos_pdf_aruba(archivo_pdf), sys.stdout, medicion, ensure_ascii=False)
+        except Exception as e:
+            metricas.terminar(medicion)
+            print(json.dumps({"error": f"Error procesando PDF: {str(e)}"}, ensure_ascii=False))
+        return
+
+    try:
+        resultado, medicion = metricas.medir(extraer_con_cache, 'portenntum aruba', VERSION_PARSER, archivo_pdf, extraer_datos_aruba)
+        print(formato_salida.serializar(resultado, medicion, indent=2, ensure_ascii=False))
         
     except Exception as e:
         print(json.dumps({"error": f"Error procesando PDF: {str(e)}"}, indent=2))
 
 if __name__ == "__main__":
+    sys.argv = argumentos.procesar(sys.argv)
     if len(sys.argv) != 2:
-        print("Uso: python script.py archivo.pdf")
+        print("Uso: python script.py archivo.pdf|-")
         sys.exit(1)
     
-    archivo = sys.argv[1]
+    archivo = texto_paginas.leer_origen(sys.argv[1])
     procesar_pdf_portentum(archivo)
\ No newline at end of file
@@ -1,14 +1,54 @@
 #!/usr/bin/env python3
-import pdfplumber
 import re
-import json
 import sys
-import os
+
+from cache_extraccion import extraer_con_cache
+import argumentos
+import formato_salida
+import memoria_acotada
+import metricas
+from modelo_cotizacion import Cotizacion, Producto, ESQUEMA_SYSCOM
+import texto_paginas
+
+# Cambiar al modificar el parser para invalidar los resultados en caché
+VERSION_PARSER = "3"
+# Motor de texto con el que se validó el parser (ver texto_paginas)
+MOTOR_TEXTO = 'pdfplumber'
 
 def extraer_datos(path_pdf):
-    with pdfplumber.open(path_pdf) as pdf:
-        texto = "\n".join([p.extract_text() for p in pdf.pages if p.extract_text()])
-    
+    motor = texto_paginas.motor_para('syscom', MOTOR_TEXTO)
+    if memoria_acotada.acotada():
+        return extraer_informacion_syscom_lineas(texto_paginas.iterar_lineas(path_pdf, motor))
+    texto = texto_paginas.texto_completo(path_pdf, motor)
+    return extraer_informacion_syscom(texto)
+
+def extraer_informacion_syscom_lineas(lineas):
+    """
+    Como extraer_informacion_syscom, pero recorriendo las líneas conforme llegan:
+    la tabla de productos se parsea sin guardarla y solo se conserva el texto de
+    fuera de la tabla (encabezado y totales), donde se buscan los demás campos
+    """
+    lineas = iter(lineas)
+    fuera_de_tabla = []
+
+    def separar_tabla():
+        en_tabla = False
+        for linea in lineas:
+            if PATRON_ENCABEZADO.search(linea):
+                en_tabla = True
+            elif not en_tabla or PATRON_SUBTOTAL.search(linea):
+                fuera_de_tabla.append(linea)
+            yield linea
+
+    productos = productos_lineas(separar_tabla())
+    # productos_lineas se detiene en SUB-TOTAL; lo que sigue son los totales
+    fuera_de_tabla.extend(lineas)
+    return extraer_informacion_syscom("\n".join(fuera_de_tabla), productos)
+
+def extraer_informacion_syscom(texto, productos=None):
+    """
+    Extrae la información de una cotización Syscom a partir del texto ya extraído
+    """
     def buscar(pat):
         match = re.search(pat, texto, re.IGNORECASE | re.MULTILINE | re.DOTALL)
         return match.group(1).strip() if match else ""
@@ -30,125 +70,138 @@ def extraer_datos(path_pdf):
     if match_datos:
         datos_fiscales = match_datos.group(1).strip()
 
-    resultado = {
-        "folio": buscar(r"FOLIO:\s*([^\n]+)"),
-        "fecha": buscar(r"FECHA:\s*([^\n]+)"),
-        "datosFiscales": datos_fiscales,
-        "rfc": buscar(r"RFC:\s*([A-Z0-9]{10,13})"),
-        "ejecutivo": buscar(r"EJECUTIVO VENTAS:\s*([^\n]+?)(?:\s+EMAIL|\s+OBSERVACIONES|$)"),
-        "email": buscar(r"EMAIL:\s*([^\s]+)"),
-        "fechaVencimiento": buscar(r"FECHA DE VENCIMIENTO:\s*([^\n]+?)(?:\s*\*|$)"),
-        "formaPago": buscar(r"FORMA DE PAGO:\s*([^\n]+)"),
-        "usoMercancia": buscar(r"USO DE\s+MC[ÍI]A\.?:?\s*([^\n]+)"),
-        "metodoPago": buscar(r"M[ÉE]TODO DE PAGO:\s*([^\n]+)"),
-        "productos": [],
-        "totales": {
+    return Cotizacion(
+        folio=buscar(r"FOLIO:\s*([^\n]+)"),
+        fecha=buscar(r"FECHA:\s*([^\n]+)"),
+        datosFiscales=datos_fiscales,
+        rfc=buscar(r"RFC:\s*([A-Z0-9]{10,13})"),
+        ejecutivo=buscar(r"EJECUTIVO VENTAS:\s*([^\n]+?)(?:\s+EMAIL|\s+OBSERVACIONES|$)"),
+        email=buscar(r"EMAIL:\s*([^\s]+)"),
+        fechaVencimiento=buscar(r"FECHA DE VENCIMIENTO:\s*([^\n]+?)(?:\s*\*|$)"),
+        formaPago=buscar(r"FORMA DE PAGO:\s*([^\n]+)"),
+        usoMercancia=buscar(r"USO DE\s+MC[ÍI]A\.?:?\s*([^\n]+)"),
+        metodoPago=buscar(r"M[ÉE]TODO DE PAGO:\s*([^\n]+)"),
+        productos=extraer_productos_avanzado(texto) if productos is None else productos,
+        totales={
             "subTotal": buscar_numero(r"SUB-TOTAL\s*\$?\s*([\d,]+\.?\d*)"),
             "iva": buscar_numero(r"I\.V\.A\.\s*\$?\s*([\d,]+\.?\d*)"),
             "total": buscar_numero(r"(?<!SUB-)TOTAL\s*\$?\s*([\d,]+\.?\d*)")
         }
-    }
+    )
 
-    productos_extraidos = extraer_productos_avanzado(texto)
-    resultado["productos"] = productos_extraidos
+# Patrones de la tabla de productos, compilados una sola vez
+PATRON_ENCABEZADO = re.compile(r'CANT\s+UNIDAD\s+CÓDIGO\s+DESCRIPCIÓN')
+PATRON_SUBTOTAL = re.compile(r'SUB-TOTAL')
+PATRON_PRODUCTO = re.compile(r'^(\d+)\s+(PIEZA|SERVICIO|KIT|BOBINA)\s+([A-Z0-9/\-\.\(\)]+)\s+(.+)')
+PATRON_INICIO_PRODUCTO = re.compile(r'^\d+\s+(?:PIEZA|SERVICIO|KIT|BOBINA)')
+PATRON_PRECIOS = re.compile(r'([A-Z]{2,4})\s+([\d,]+\.\d{2})\s+[\d\.%\s]+\s+([\d,]+\.\d{2})\s+([\d,]+\.\d{2})$')
+PATRON_ALMACEN_SIN_PRECIO = re.compile(r'^[A-Z]{2,4}\s+--')
+PATRON_CORTE_DESCRIPCION = re.compile(r'(?:Clave Producto:|/).*$')
+PATRON_PRECIOS_EN_DESCRIPCION = re.compile(r'\s+[A-Z]{2,4}\s+[\d,]+\.\d{2}\s+.*$')
 
-    return resultado
+# Un producto sin precios en su línea toma descripción y precios de hasta 4 líneas siguientes
+LINEAS_CONTINUACION = 4
 
 def extraer_productos_avanzado(texto):
+    return productos_lineas(texto.split('\n'))
+
+def productos_lineas(lineas):
+    """
+    Recorre una sola vez las líneas entre el último encabezado CANT UNIDAD CÓDIGO
+    DESCRIPCIÓN y SUB-TOTAL. El producto que aún espera sus precios se completa
+    con las líneas que van llegando, sin volver a leerlas.
+    """
     productos = []
-    lineas = texto.split('\n')
-    inicio_productos = -1
-    fin_productos = -1
-    for i, linea in enumerate(lineas):
-        if re.search(r'CANT\s+UNIDAD\s+CÓDIGO\s+DESCRIPCIÓN', linea):
-            inicio_productos = i + 1
-        elif re.search(r'SUB-TOTAL', linea) and inicio_productos != -1:
-            fin_productos = i
+    en_tabla = False
+    pendiente = None
+    
+    for linea_pdf in lineas:
+        if PATRON_ENCABEZADO.search(linea_pdf):
+            # Un nuevo encabezado reinicia la tabla
+            productos = []
+            pendiente = None
+            en_tabla = True
+            continue
+        if not en_tabla:
+            continue
+        if PATRON_SUBTOTAL.search(linea_pdf):
             break
-    if inicio_productos == -1:
-        return productos
-    if fin_productos == -1:
-        fin_productos = len(lineas)
-    i = inicio_productos
-    while i < fin_productos:
-        linea = lineas[i].strip()
-        match_producto = re.match(
-            r'^(\d+)\s+(PIEZA|SERVICIO|KIT|BOBINA)\s+([A-Z0-9/\-\.\(\)]+)\s+(.+)', 
-            linea
-        )
+        
+        linea = linea_pdf.strip()
+        if pendiente is not None and pendiente.agregar_linea(linea):
+            productos.append(pendiente.cerrar())
+            pendiente = None
+        
+        match_producto = PATRON_PRODUCTO.match(linea)
         if match_producto:
-            cantidad = match_producto.group(1)
-            unidad = match_producto.group(2)
-            codigo = match_producto.group(3)
-            resto_linea = match_producto.group(4)
-            descripcion, alm, precio_lista, precio_unitario, importe = procesar_producto_completo(
-                resto_linea, lineas, i, fin_productos
-            )
-            producto = {
-                "cantidad": cantidad,
-                "unidad": unidad,
-                "codigo": codigo,
-                "descripcion": descripcion,
-                "alm": alm,
-                "precioLista": precio_lista,
-                "precioUnitario": precio_unitario,
-                "importe": importe,
-            }
-            productos.append(producto)
-        i += 1
+            producto = ProductoSyscom(match_producto)
+            if producto.completo:
+                productos.append(producto.datos)
+            else:
+                pendiente = producto
+    
+    if pendiente is not None:
+        productos.append(pendiente.cerrar())
     return productos
 
-def procesar_producto_completo(resto_linea, lineas, indice_actual, fin_productos):
-    match_precios = re.search(
-        r'([A-Z]{2,4})\s+([\d,]+\.\d{2})\s+[\d\.%\s]+\s+([\d,]+\.\d{2})\s+([\d,]+\.\d{2})$', 
-        resto_linea
-    )
-    if match_precios:
-        alm = match_precios.group(1)
-        precio_lista = try_float(match_precios.group(2))
-        precio_unitario = try_float(match_precios.group(3))
-        importe = try_float(match_precios.group(4))
-        descripcion = resto_linea[:match_precios.start()].strip()
-        return descripcion, alm, precio_lista, precio_unitario, importe
-    descripcion = resto_linea
-    alm = ""
-    precio_lista = None
-    precio_unitario = None
-    importe = None
-    j = indice_actual + 1
-    while j < fin_productos and j < indice_actual + 5:
-        siguiente_linea = lineas[j].strip()
-        if re.match(r'^\d+\s+(?:PIEZA|SERVICIO|KIT|BOBINA)', siguiente_linea):
-            break
-        match_precios_siguiente = re.search(
-            r'([A-Z]{2,4})\s+([\d,]+\.\d{2})\s+[\d\.%\s]+\s+([\d,]+\.\d{2})\s+([\d,]+\.\d{2})$', 
-            siguiente_linea
+class ProductoSyscom:
+    """Producto de la tabla Syscom que puede continuar en las líneas siguientes"""
+
+    def __init__(self, match_producto):
+        resto_linea = match_producto.group(4)
+        self.datos = Producto(
+            ESQUEMA_SYSCOM,
+            cantidad=match_producto.group(1),
+            unidad=match_producto.group(2),
+            codigo=match_producto.group(3),
+            descripcion=resto_linea,
+            alm="",
         )
-        if match_precios_siguiente:
-            alm = match_precios_siguiente.group(1)
-            precio_lista = try_float(match_precios_siguiente.group(2))
-            precio_unitario = try_float(match_precios_siguiente.group(3))
-            importe = try_float(match_precios_siguiente.group(4))
-            desc_adicional = siguiente_linea[:match_precios_siguiente.start()].strip()
-            if desc_adicional and not re.search(r'Clave Producto:', desc_adicional):
-                descripcion += " " + desc_adicional
-            break
-        else:
-            if (siguiente_linea and 
-                not re.search(r'Clave Producto:', siguiente_linea) and
-                not re.search(r'^[A-Z]{2,4}\s+--', siguiente_linea) and
-                not siguiente_linea.startswith('/')):
-                descripcion += " " + siguiente_linea
-        j += 1
-    descripcion = limpiar_descripcion(descripcion)
-    return descripcion, alm, precio_lista, precio_unitario, importe
+        self.lineas_restantes = LINEAS_CONTINUACION
+        
+        match_precios = PATRON_PRECIOS.search(resto_linea)
+        self.completo = match_precios is not None
+        if match_precios:
+            # Con precios en la misma línea la descripción se conserva sin limpiar
+            self.asignar_precios(match_precios)
+            self.datos.descripcion = resto_linea[:match_precios.start()].strip()
+
+    def asignar_precios(self, match_precios):
+        self.datos.alm = match_precios.group(1)
+        self.datos.precioLista = try_float(match_precios.group(2))
+        self.datos.precioUnitario = try_float(match_precios.group(3))
+        self.datos.importe = try_float(match_precios.group(4))
+
+    def agregar_linea(self, linea):
+        """Procesa la siguiente línea; regresa True cuando el producto ya no continúa"""
+        if PATRON_INICIO_PRODUCTO.match(linea):
+            return True
+        
+        match_precios = PATRON_PRECIOS.search(linea)
+        if match_precios:
+            self.asignar_precios(match_precios)
+            desc_adicional = linea[:match_precios.start()].strip()
+            if desc_adicional and 'Clave Producto:' not in desc_adicional:
+                self.datos.descripcion += " " + desc_adicional
+            return True
+        
+        if (linea and
+            'Clave Producto:' not in linea and
+            not PATRON_ALMACEN_SIN_PRECIO.match(linea) and
+            not linea.startswith('/')):
+            self.datos.descripcion += " " + linea
+        
+        self.lineas_restantes -= 1
+        return self.lineas_restantes == 0
+
+    def cerrar(self):
+        self.datos.descripcion = limpiar_descripcion(self.datos.descripcion)
+        return self.datos
 
 def limpiar_descripcion(descripcion):
-    descripcion = re.sub(r'Clave Producto:.*$', '', descripcion)
-    descripcion = re.sub(r'/.*$', '', descripcion)
-    descripcion = re.sub(r'\s+[A-Z]{2,4}\s+[\d,]+\.\d{2}\s+.*$', '', descripcion)
-    descripcion = re.sub(r'\s+', ' ', descripcion)
-    return descripcion.strip()
+    descripcion = PATRON_CORTE_DESCRIPCION.sub('', descripcion)
+    descripcion = PATRON_PRECIOS_EN_DESCRIPCION.sub('', descripcion)
+    return " ".join(descripcion.split())
 
 def try_float(valor):
     if not valor:
@@ -159,13 +212,15 @@ def try_float(valor):
         return None
 
 if __name__ == "__main__":
+    sys.argv = argumentos.procesar(sys.argv)
     if len(sys.argv) != 2:
         sys.exit(1)
-    archivo_pdf = sys.argv[1]
-    if not os.path.exists(archivo_pdf):
+    # '-' lee los bytes del PDF de la entrada estándar
+    archivo_pdf = texto_paginas.leer_origen(sys.argv[1])
+    if not texto_paginas.origen_existe(archivo_pdf):
         sys.exit(1)
     try:
-        datos = extraer_datos(archivo_pdf)
-        print(json.dumps(datos, indent=2, ensure_ascii=False))
+        datos, medicion = metricas.medir(extraer_con_cache, 'syscom', VERSION_PARSER, archivo_pdf, extraer_datos)
+        print(formato_salida.serializar(datos, medicion, indent=2, ensure_ascii=False))
     except Exception as e:
         sys.exit(1)
\ No newline at end of file
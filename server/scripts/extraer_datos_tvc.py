@@ -1,7 +1,217 @@
 import re
 import json
-import PyPDF2
 import sys
+from bisect import bisect_right
+
+from cache_extraccion import extraer_con_cache
+import argumentos
+import formato_salida
+import metricas
+from modelo_cotizacion import Cotizacion, Producto, ESQUEMA_TVC, a_json
+import texto_paginas
+
+# Cambiar al modificar el parser para invalidar los resultados en caché
+VERSION_PARSER = "1"
+# Motor de texto con el que se validó el parser (ver texto_paginas)
+MOTOR_TEXTO = 'pypdf2'
+
+# Patrones del detalle del pedido, compilados una sola vez
+PATRON_CLAVE = re.compile(r'\b([A-Z]{2,}\d{6,})\b')
+PATRON_APARICION = re.compile(r'(?=([A-Z]{2,})(\d{6,}))')
+# Cola de cada renglón: cantidad, precio lista, descuento, precio distribuidor e importe
+PATRON_COLA = re.compile(r'(?<=\s)(\d+)\s+\$([0-9,]+\.\d{2})\s+(-?\d+\.\d{2}%)\s+\$([0-9,]+\.\d{2})\s+\$([0-9,]+\.\d{2})')
+PATRON_ESPACIO = re.compile(r'\s')
+PATRON_NO_ESPACIO = re.compile(r'\S')
+PATRON_PRECIO = re.compile(r'\$([0-9,]+\.\d{2})')
+# Método alternativo: descripción y cantidad buscadas por separado
+PATRON_DESC_ALTERNATIVA = re.compile(r'\s+([^\n]+(?:\n[^\$\d]+)*)')
+PATRON_CANTIDAD_ALTERNATIVA = re.compile(r'(\d+)\s+\$')
+
+class EscanerDetalleTVC:
+    """
+    Índice de una sola pasada sobre la sección "Detalle del pedido".
+
+    Localiza todas las colas de precio en un solo recorrido y, recorriendo las
+    líneas de abajo hacia arriba, precalcula para cada línea la cola que elegiría
+    el patrón original clave + descripción + cola. Ese patrón prueba primero cada
+    fin de línea del bloque (una cola al inicio de la línea siguiente) y, si
+    ninguno sirve, la última cola a media línea del bloque contiguo de líneas no
+    vacías. Así cada clave se resuelve sin volver a buscar en todo el texto.
+    """
+
+    def __init__(self, texto):
+        self.texto = texto
+        self.colas = {m.start(): m for m in PATRON_COLA.finditer(texto)}
+        self.lineas = texto.split('\n')
+        self.inicios = []
+        posicion = 0
+        for linea in self.lineas:
+            self.inicios.append(posicion)
+            posicion += len(linea) + 1
+
+        total_lineas = len(self.lineas)
+        # Última cola (la de mayor posición) dentro de cada línea
+        self.ultima_cola_linea = [None] * total_lineas
+        for inicio_cola in sorted(self.colas):
+            self.ultima_cola_linea[bisect_right(self.inicios, inicio_cola) - 1] = self.colas[inicio_cola]
+
+        # Recorrido de abajo hacia arriba
+        self.cola_fin_linea = [None] * total_lineas
+        self.cola_interior = [None] * total_lineas
+        siguiente_contenido = None
+        for j in range(total_lineas - 1, -1, -1):
+            continua = self._continua(j)
+
+            # Cola que empieza en el primer carácter visible después del fin de la línea j,
+            # o la del siguiente fin de línea del mismo bloque
+            cola_fin = self.colas.get(siguiente_contenido) if j < total_lineas - 1 else None
+            if cola_fin is None and continua:
+                cola_fin = self.cola_fin_linea[j + 1]
+            self.cola_fin_linea[j] = cola_fin
+
+            # Última cola a media línea del bloque que empieza en j
+            cola = self.cola_interior[j + 1] if continua else None
+            if cola is None:
+                ultima = self.ultima_cola_linea[j]
+                if ultima is not None and ultima.start() >= self.inicios[j] + 2:
+                    cola = ultima
+            self.cola_interior[j] = cola
+
+            visible = PATRON_NO_ESPACIO.search(texto, self.inicios[j], self.inicios[j] + len(self.lineas[j]))
+            if visible:
+                siguiente_contenido = visible.start()
+
+        self.apariciones = self._indexar_apariciones()
+
+    def _continua(self, j):
+        # La descripción puede seguir mientras la siguiente línea no esté vacía
+        return j + 1 < len(self.lineas) and len(self.lineas[j + 1]) > 0
+
+    def _indexar_apariciones(self):
+        # Todas las apariciones literales de cada clave, aunque estén pegadas a otro
+        # texto: en cada posición se toma la corrida de letras y cada prefijo de sus
+        # dígitos con al menos seis cifras
+        apariciones = {}
+        for match in PATRON_APARICION.finditer(self.texto):
+            letras, digitos = match.group(1), match.group(2)
+            for largo in range(6, len(digitos) + 1):
+                apariciones.setdefault(letras + digitos[:largo], []).append(match.start())
+        return apariciones
+
+    def _cola_desde(self, fin_clave):
+        texto = self.texto
+        if not PATRON_ESPACIO.match(texto, fin_clave):
+            return None
+        visible = PATRON_NO_ESPACIO.search(texto, fin_clave)
+        if not visible:
+            return None
+
+        inicio_desc = visible.start()
+        j = bisect_right(self.inicios, inicio_desc) - 1
+        # 1) Primer fin de línea del bloque seguido directamente por una cola
+        cola = self.cola_fin_linea[j]
+        # 2) Última cola a media línea en las líneas siguientes del bloque
+        if cola is None and self._continua(j):
+            cola = self.cola_interior[j + 1]
+        # 3) Última cola a media línea en la primera línea de la descripción
+        if cola is None:
+            ultima = self.ultima_cola_linea[j]
+            if ultima is not None and ultima.start() >= inicio_desc + 2:
+                cola = ultima
+        # 4) Cola justo después de la clave, con una descripción de solo espacios
+        #    (requiere un espacio que no sea salto de línea antes del último)
+        if cola is None and inicio_desc in self.colas:
+            if texto[fin_clave + 1:inicio_desc - 1].strip('\n'):
+                cola = self.colas[inicio_desc]
+        if cola is None:
+            return None
+        return texto[inicio_desc:cola.start()], cola
+
+    def buscar(self, clave):
+        """
+        Regresa (descripción, cola) igual que el patrón original: la primera
+        aparición de la clave con una cola válida, o None si ninguna la tiene
+        """
+        for posicion in self.apariciones.get(clave, ()):
+            encontrado = self._cola_desde(posicion + len(clave))
+            if encontrado:
+                return encontrado
+        return None
+
+    def buscar_alternativo(self, clave):
+        """
+        Descripción y cantidad del método alternativo: la primera aparición de la
+        clave seguida de texto y la primera cantidad con precio después de su línea
+        """
+        texto = self.texto
+        posiciones = self.apariciones.get(clave, ())
+        desc_match = None
+        for posicion in posiciones:
+            desc_match = PATRON_DESC_ALTERNATIVA.match(texto, posicion + len(clave))
+            if desc_match:
+                break
+
+        cantidad_match = None
+        if posiciones:
+            salto = texto.find('\n', posiciones[0] + len(clave))
+            if salto >= 0:
+                cantidad_match = PATRON_CANTIDAD_ALTERNATIVA.search(texto, salto + 1)
+        return desc_match, cantidad_match
+
+def extraer_productos_detalle_tvc(detalle_texto):
+    """
+    Extrae los productos de la sección "Detalle del pedido" en el orden de sus claves
+    """
+    productos = []
+    escaner = EscanerDetalleTVC(detalle_texto)
+    precios_matches = None
+
+    # Buscar claves de producto (formato alfanumérico)
+    for match_clave in PATRON_CLAVE.finditer(detalle_texto):
+        clave = match_clave.group(1)
+        encontrado = escaner.buscar(clave)
+
+        if encontrado:
+            descripcion_texto, cola = encontrado
+            descripcion = re.sub(r'\s+', ' ', descripcion_texto.strip())
+            cantidad = float(cola.group(1))
+            precio_distribuidor = float(cola.group(4).replace(',', ''))
+            importe = float(cola.group(5).replace(',', ''))
+
+            # Solo campos con valor real según encabezados TVC
+            producto = Producto(
+                ESQUEMA_TVC,
+                codigo=clave,
+                descripcion=descripcion,
+                cantidad=cantidad,
+                precioUnitario=precio_distribuidor,
+                importe=importe
+            )
+            productos.append(producto)
+        else:
+            # Método alternativo: buscar datos por separado
+            desc_match, cantidad_match = escaner.buscar_alternativo(clave)
+            if precios_matches is None:
+                precios_matches = PATRON_PRECIO.findall(detalle_texto)
+
+            if desc_match and cantidad_match and len(precios_matches) >= 3:
+                descripcion = re.sub(r'\s+', ' ', desc_match.group(1).strip())
+                cantidad = float(cantidad_match.group(1))
+                precio_distribuidor = float(precios_matches[1].replace(',', ''))
+                importe = float(precios_matches[2].replace(',', ''))
+
+                # Solo campos con valor real según encabezados TVC
+                producto = Producto(
+                    ESQUEMA_TVC,
+                    codigo=clave,
+                    descripcion=descripcion,
+                    cantidad=cantidad,
+                    precioUnitario=precio_distribuidor,
+                    importe=importe
+                )
+                productos.append(producto)
+
+    return productos
 
 def extraer_informacion_cotizacion_tvc(texto_pdf):
     """
@@ -28,66 +238,21 @@ def extraer_informacion_cotizacion_tvc(texto_pdf):
     detalle_match = re.search(r'Detalle del pedido(.*?)(?=Los precios mostrados|©|$)', texto_pdf, re.DOTALL)
     
     if detalle_match:
-        detalle_texto = detalle_match.group(1)
-        
-        # Buscar claves de producto (formato alfanumérico)
-        claves_productos = re.findall(r'\b([A-Z]{2,}\d{6,})\b', detalle_texto)
-        
-        for clave in claves_productos:
-            # Para cada clave, buscar los datos asociados
-            patron_producto = rf'{re.escape(clave)}\s+([^\n]+(?:\n[^\n]+)*?)\s+(\d+)\s+\$([0-9,]+\.\d{{2}})\s+(-?\d+\.\d{{2}}%)\s+\$([0-9,]+\.\d{{2}})\s+\$([0-9,]+\.\d{{2}})'
-            
-            match = re.search(patron_producto, detalle_texto, re.MULTILINE | re.DOTALL)
-            
-            if match:
-                descripcion = re.sub(r'\s+', ' ', match.group(1).strip())
-                cantidad = float(match.group(2))
-                precio_distribuidor = float(match.group(5).replace(',', ''))
-                importe = float(match.group(6).replace(',', ''))
-                
-                # Solo campos con valor real según encabezados TVC
-                producto = {
-                    "codigo": clave,
-                    "descripcion": descripcion,
-                    "cantidad": cantidad,
-                    "precioUnitario": precio_distribuidor,
-                    "importe": importe
-                }
-                productos.append(producto)
-            else:
-                # Método alternativo: buscar datos por separado
-                desc_match = re.search(rf'{re.escape(clave)}\s+([^\n]+(?:\n[^\$\d]+)*)', detalle_texto)
-                cantidad_match = re.search(rf'{re.escape(clave)}.*?\n.*?(\d+)\s+\$', detalle_texto, re.DOTALL)
-                precios_matches = re.findall(r'\$([0-9,]+\.\d{2})', detalle_texto)
-                
-                if desc_match and cantidad_match and len(precios_matches) >= 3:
-                    descripcion = re.sub(r'\s+', ' ', desc_match.group(1).strip())
-                    cantidad = float(cantidad_match.group(1))
-                    precio_distribuidor = float(precios_matches[1].replace(',', ''))
-                    importe = float(precios_matches[2].replace(',', ''))
-
-                    # Solo campos con valor real según encabezados TVC
-                    producto = {
-                        "codigo": clave,
-                        "descripcion": descripcion,
-                        "cantidad": cantidad,
-                        "precioUnitario": precio_distribuidor,
-                        "importe": importe
-                    }
-                    productos.append(producto)
+        productos = extraer_productos_detalle_tvc(detalle_match.group(1))
     
     # Extraer costo de envío
     envio_match = re.search(r'Envío\s+MXN\s+\$([0-9,]+\.\d{2})', texto_pdf)
     if envio_match:
         costo_envio = float(envio_match.group(1).replace(',', ''))
         if costo_envio > 0:
-            producto_envio = {
-                "codigo": "ENVIO",
-                "descripcion": "Servicio de envío",
-                "cantidad": 1.0,
-                "precioUnitario": costo_envio,
-                "importe": costo_envio
-            }
+            producto_envio = Producto(
+                ESQUEMA_TVC,
+                codigo="ENVIO",
+                descripcion="Servicio de envío",
+                cantidad=1.0,
+                precioUnitario=costo_envio,
+                importe=costo_envio
+            )
             productos.append(producto_envio)
     
     # Extraer totales
@@ -100,34 +265,33 @@ def extraer_informacion_cotizacion_tvc(texto_pdf):
     total = float(total_match.group(1).replace(',', '')) if total_match else 0.0
     
     # Crear el JSON final
-    resultado = {
-        "folio": folio,
-        "fecha": fecha,
-        "ejecutivo": ejecutivo,
-        "productos": productos,
-        "totales": {
+    return Cotizacion(
+        folio=folio,
+        fecha=fecha,
+        ejecutivo=ejecutivo,
+        productos=productos,
+        totales={
             "subTotal": subtotal,
             "iva": iva,
             "total": total
         }
-    }
+    )
+
+def extraer_datos_tvc(archivo_pdf):
+    """
+    Lee el PDF de TVC y regresa el diccionario con la información extraída
+    """
+    texto_completo = texto_paginas.texto_completo(archivo_pdf, texto_paginas.motor_para('tvc', MOTOR_TEXTO), separador="", omitir_vacias=False)
     
-    return resultado
+    return extraer_informacion_cotizacion_tvc(texto_completo)
 
 def procesar_pdf_tvc(archivo_pdf):
     """
     Función principal para procesar un archivo PDF de cotización TVC
     """
     try:
-        with open(archivo_pdf, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            texto_completo = ""
-            
-            for page in pdf_reader.pages:
-                texto_completo += page.extract_text()
-        
-        resultado = extraer_informacion_cotizacion_tvc(texto_completo)
-        return json.dumps(resultado, indent=2, ensure_ascii=False)
+        resultado, medicion = metricas.medir(extraer_con_cache, 'tvc', VERSION_PARSER, archivo_pdf, extraer_datos_tvc)
+        return formato_salida.serializar(resultado, medicion, indent=2, ensure_ascii=False)
         
     except Exception as e:
         return json.dumps({"error": f"Error procesando PDF: {str(e)}"}, indent=2)
@@ -137,11 +301,12 @@ def procesar_texto_tvc(texto_pdf):
     Función para procesar texto directo de PDF
     """
     resultado = extraer_informacion_cotizacion_tvc(texto_pdf)
-    return json.dumps(resultado, indent=2, ensure_ascii=False)
+    return json.dumps(resultado, indent=2, ensure_ascii=False, default=a_json)
 
 # Ejemplo de uso
 if __name__ == "__main__":
+        sys.argv = argumentos.procesar(sys.argv)
 
-        # Usar archivo PDF como argumento
-        archivo = sys.argv[1]
+        # Usar archivo PDF como argumento ('-' para leerlo de la entrada estándar)
+        archivo = texto_paginas.leer_origen(sys.argv[1])
         print(procesar_pdf_tvc(archivo))
@@ -0,0 +1,115 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import formato_salida
+import metricas
+from modelo_cotizacion import a_json
+import texto_paginas
+from extractores import extraer, normalizar_proveedor
+import detector_proveedor
+
+# Configurar la codificación de salida para evitar problemas en Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+def listar_pdfs(origen, recursivo=False):
+    """
+    Regresa los PDFs de un directorio o de un patrón glob, del más grande al más chico
+    """
+    if os.path.isdir(origen):
+        patron = os.path.join(origen, '**', '*') if recursivo else os.path.join(origen, '*')
+        archivos = glob.glob(patron, recursive=recursivo)
+    else:
+        archivos = glob.glob(origen, recursive=True)
+
+    pdfs = [a for a in archivos if os.path.isfile(a) and a.lower().endswith('.pdf')]
+    # Los archivos grandes van primero para que no queden al final en un solo proceso
+    pdfs.sort(key=lambda a: (-os.path.getsize(a), a))
+    return pdfs
+
+def procesar_archivo(proveedor, archivo_pdf):
+    """
+    Extrae un PDF dentro del proceso trabajador; los errores quedan en el registro del archivo
+    """
+    inicio = time.perf_counter()
+    registro = {"archivo": archivo_pdf, "proveedor": proveedor}
+    medicion = metricas.iniciar()
+    try:
+        if normalizar_proveedor(proveedor) == 'auto':
+            deteccion = detector_proveedor.detectar(archivo_pdf)
+            registro["proveedor"] = deteccion["proveedor"]
+            registro["confianza"] = deteccion["confianza"]
+        resultado = extraer(registro["proveedor"], archivo_pdf)
+        metricas.terminar(medicion)
+        registro["resultado"] = formato_salida.preparar(metricas.agregar_timings(resultado, medicion))
+        registro["ok"] = True
+    except Exception as e:
+        metricas.terminar(medicion)
+        registro["ok"] = False
+        registro["error"] = f"Error procesando PDF: {str(e)}"
+    registro["ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+    return registro
+
+def procesar_lote(archivos, proveedor, procesos=None):
+    """
+    Reparte los archivos en un pool de procesos y regresa los registros conforme terminan
+    """
+    with ProcessPoolExecutor(max_workers=procesos or os.cpu_count()) as pool:
+        futuros = {pool.submit(procesar_archivo, proveedor, archivo): archivo for archivo in archivos}
+        for futuro in as_completed(futuros):
+            try:
+                yield futuro.result()
+            except Exception as e:
+                # Falla del proceso trabajador (p. ej. memoria agotada): solo afecta a este archivo
+                yield {"archivo": futuros[futuro], "proveedor": proveedor, "ok": False,
+                       "error": f"Error en el proceso trabajador: {str(e)}"}
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Extrae en lote las cotizaciones de un directorio o patrón glob (salida NDJSON)"
+    )
+    parser.add_argument('origen', help="Directorio o patrón glob, p. ej. server/pdfs o 'uploads/**/*.pdf'")
+    parser.add_argument('proveedor', help="syscom, grupo dice, tvc, portenntum, ... o auto")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos del pool (por defecto, núcleos disponibles)")
+    parser.add_argument('--recursivo', action='store_true', help="Incluir subdirectorios cuando el origen es un directorio")
+    parser.add_argument('--timings', action='store_true', help="Agregar _metadata.timings a cada resultado")
+    parser.add_argument('--perfil', help="Archivo pstats por proceso; {pid} se reemplaza por el id del proceso")
+    parser.add_argument('--motor', help="Motor de texto para todos (crudo) o por proveedor (tvc=crudo,syscom=pypdf2)")
+    parser.add_argument('--compact', nargs='?', const='json', choices=('json', 'columnas'),
+                        help="Productos con un solo nombre por campo (json) o en columnas, sin espacios")
+    args = parser.parse_args()
+    metricas.activar(args.timings, args.perfil)
+    if args.compact:
+        formato_salida.activar(formato_salida.MODOS_COMPACT[args.compact])
+    if args.motor:
+        texto_paginas.forzar_motor(args.motor)
+
+    archivos = listar_pdfs(args.origen, args.recursivo)
+    if not archivos:
+        print(f"No se encontraron PDFs en {args.origen}", file=sys.stderr)
+        sys.exit(1)
+
+    inicio = time.perf_counter()
+    correctos = errores = 0
+    for registro in procesar_lote(archivos, args.proveedor, args.procesos):
+        if registro["ok"]:
+            correctos += 1
+        else:
+            errores += 1
+        sys.stdout.write(json.dumps(registro, ensure_ascii=False, default=a_json,
+                                    separators=formato_salida.separadores()) + "\n")
+        sys.stdout.flush()
+
+    segundos = time.perf_counter() - inicio
+    print(f"{len(archivos)} PDFs en {segundos:.2f} s ({len(archivos) / segundos:.1f} PDFs/s): "
+          f"{correctos} correctos, {errores} con error", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import io
+import json
+import os
+
+import metricas
+from modelo_cotizacion import a_json
+
+# Formato de la salida JSON de los extractores.
+#   bonita    json.dumps con indent=2 (por defecto, lo que espera el servidor Node)
+#   compacta  JSON minificado con un solo nombre por campo en los productos
+#   columnas  como compacta, pero "productos" es un objeto con un arreglo por campo
+#   ndjson    una línea de encabezado, una por producto y un cierre con los totales;
+#             los parsers que recorren página por página la escriben conforme leen
+# Se elige con --compact[=json|columnas|ndjson] o TIMANAGER_SALIDA.
+
+MODOS = ('bonita', 'compacta', 'columnas', 'ndjson')
+# El parser de Portenntum clásico repite cada valor con el nombre que usaba la
+# versión compatible con Syscom; en modo compacto solo queda el nombre canónico
+ALIAS_CLASICOS = {'clave': 'codigo', 'concepto': 'descripcion', 'precio': 'precioUnitario', 'total': 'importe'}
+MODOS_COMPACT = {'': 'compacta', 'json': 'compacta', 'columnas': 'columnas', 'columnar': 'columnas', 'ndjson': 'ndjson'}
+SEPARADORES = (',', ':')
+
+_configuracion = {'modo': os.environ.get('TIMANAGER_SALIDA', 'bonita')}
+
+def activar(modo):
+    """Cambia el formato en este proceso y en los procesos hijos que cree"""
+    if modo not in MODOS:
+        raise ValueError(f"Formato de salida no soportado: {modo}")
+    _configuracion['modo'] = modo
+    os.environ['TIMANAGER_SALIDA'] = modo
+
+def configurar(argumentos):
+    """Quita --compact y --compact=<modo> de los argumentos y los aplica"""
+    restantes = []
+    for argumento in argumentos:
+        if argumento == '--compact' or argumento.startswith('--compact='):
+            valor = argumento.partition('=')[2].lower()
+            if valor not in MODOS_COMPACT:
+                raise ValueError(f"Formato compacto no soportado: {valor}")
+            activar(MODOS_COMPACT[valor])
+        else:
+            restantes.append(argumento)
+    return restantes
+
+def modo():
+    return _configuracion['modo']
+
+def separadores():
+    """Separadores de json.dumps para salidas de una línea (--serve, lote, servicio HTTP)"""
+    return None if modo() == 'bonita' else SEPARADORES
+
+def canonizar_producto(producto):
+    """Producto con un solo nombre por valor; conserva el orden de los campos"""
+    if not any(alias in producto for alias in ALIAS_CLASICOS):
+        return producto
+    canonico = {}
+    for campo, valor in producto.items():
+        destino = ALIAS_CLASICOS.get(campo)
+        if destino is None:
+            canonico[campo] = valor
+        elif destino not in producto:
+            canonico[destino] = valor
+    return canonico
+
+def columnas(productos):
+    """Un arreglo por campo; los productos sin un campo llevan null en esa posición"""
+    campos = {}
+    for producto in productos:
+        for campo in producto:
+            campos.setdefault(campo, None)
+    return {campo: [producto.get(campo) for producto in productos] for campo in campos}
+
+def preparar(resultado, modo_salida=None):
+    """
+    Copia del resultado con los productos en el formato elegido (sin tocar la caché).
+    En las salidas de un JSON por línea ndjson se trata como compacta.
+    """
+    modo_salida = modo_salida or modo()
+    if modo_salida == 'bonita' or not isinstance(resultado, dict) or 'productos' not in resultado:
+        return resultado
+    productos = [canonizar_producto(p) for p in resultado['productos']]
+    if modo_salida == 'columnas':
+        productos = columnas(productos)
+    return dict(resultado, productos=productos)
+
+def serializar(resultado, medicion=None, **opciones):
+    """
+    Serializa el resultado de un extractor en el formato configurado.
+    Las opciones (indent, ensure_ascii) son las del formato bonito de cada script.
+    """
+    modo_salida = modo()
+    opciones.setdefault('default', a_json)
+    if modo_salida == 'bonita':
+        return metricas.serializar(resultado, medicion, **opciones)
+
+    if modo_salida == 'ndjson' and isinstance(resultado, dict) and 'productos' in resultado:
+        salida = io.StringIO()
+        escribir_ndjson(eventos_resultado(resultado), salida, medicion, **opciones)
+        return salida.getvalue().rstrip("\n")
+
+    opciones = dict(opciones, separators=SEPARADORES)
+    opciones.pop('indent', None)
+    return metricas.serializar(preparar(resultado, modo_salida), medicion, **opciones)
+
+# ==== NDJSON ====
+# Un parser en streaming genera ('encabezado', dict) antes del primer producto,
+# ('producto', producto) por cada uno y al final ('cierre', dict) con los totales
+# y los campos del encabezado que aparecieron después de emitirlo.
+
+CAMPOS_CIERRE = ('totales', '_metadata')
+
+def eventos_resultado(resultado):
+    """Las partes de un resultado ya completo (caché o parsers sin streaming)"""
+    yield 'encabezado', {clave: valor for clave, valor in resultado.items()
+                         if clave != 'productos' and clave not in CAMPOS_CIERRE}
+    for producto in resultado['productos']:
+        yield 'producto', producto
+    yield 'cierre', {clave: resultado[clave] for clave in CAMPOS_CIERRE if clave in resultado}
+
+def escribir_ndjson(eventos, salida, medicion=None, **opciones):
+    """
+    Escribe cada parte en cuanto llega. El cierre lleva el número de productos y,
+    con métricas activas, _metadata.timings; la medición termina antes del cierre.
+    Regresa el número de productos escritos.
+    """
+    opciones = dict(opciones, separators=SEPARADORES)
+    opciones.pop('indent', None)
+    opciones.setdefault('default', a_json)
+    productos = 0
+    for tipo, datos in eventos:
+        if tipo == 'producto':
+            productos += 1
+            salida.write(json.dumps(canonizar_producto(datos), **opciones) + "\n")
+        elif tipo == 'encabezado':
+            salida.write(json.dumps(datos, **opciones) + "\n")
+        else:
+            if medicion is not None and medicion.total is None:
+                metricas.terminar(medicion)
+            cierre = dict(datos, productos=productos)
+            salida.write(metricas.serializar(cierre, medicion, **opciones) + "\n")
+        salida.flush()
+    return productos
@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import metricas
+from modelo_cotizacion import numero
+
+# Índice local de precios con cada producto de las cotizaciones extraídas, para
+# consultar el historial de un código sin volver a cargar los PDFs.
+# Cada extracción correcta se registra desde cache_extraccion.extraer_con_cache
+# (y script_auto_portenntum), identificada por el SHA-256 del PDF.
+# TIMANAGER_INDICE=0 lo desactiva; TIMANAGER_INDICE_DB cambia la ubicación.
+#
+#   python indice_precios.py historial <codigo> [--proveedor syscom] [--limite 50]
+#   python indice_precios.py ultimo <codigo> [<codigo> ...] [--proveedor syscom]
+#   python indice_precios.py cargar <directorio|patrón> <proveedor|auto> [--recursivo] [--procesos N]
+
+# Configurar la codificación de salida para evitar problemas en Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+RUTA_INDICE = os.environ.get(
+    'TIMANAGER_INDICE_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'indice_precios.sqlite3')
+)
+# Los formatos de Portenntum son del mismo proveedor
+PROVEEDORES_INDICE = {'portenntum clasico': 'portenntum', 'portenntum aruba': 'portenntum'}
+COLUMNAS = ('proveedor', 'folio', 'fecha', 'codigo', 'descripcion', 'cantidad', 'precioUnitario', 'precioLista')
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS precios (
+    id INTEGER PRIMARY KEY,
+    huella TEXT NOT NULL,
+    proveedor TEXT NOT NULL,
+    folio TEXT,
+    fecha TEXT,
+    codigo TEXT NOT NULL,
+    descripcion TEXT,
+    cantidad REAL,
+    precioUnitario REAL,
+    precioLista REAL,
+    registrado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_precios_codigo ON precios (codigo, fecha);
+CREATE INDEX IF NOT EXISTS idx_precios_proveedor_fecha ON precios (proveedor, fecha);
+CREATE INDEX IF NOT EXISTS idx_precios_huella ON precios (huella);
+"""
+
+PATRON_FECHA_DMY = re.compile(r'^(\d{1,2})[/\-.](\d{1,2})[/\-.](\d{4})')
+PATRON_FECHA_ISO = re.compile(r'^(\d{4})-(\d{2})-(\d{2})')
+
+_conexiones = {}
+
+def indice_habilitado():
+    return os.environ.get('TIMANAGER_INDICE', '1') != '0'
+
+def conectar(ruta=None):
+    """Conexión reutilizada por proceso; crea el archivo y las tablas si no existen"""
+    ruta = ruta or RUTA_INDICE
+    conexion = _conexiones.get(ruta)
+    if conexion is None:
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        # En lote varios procesos escriben a la vez: WAL y espera en lugar de error por bloqueo
+        conexion = sqlite3.connect(ruta, timeout=30)
+        conexion.row_factory = sqlite3.Row
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        conexion.executescript(ESQUEMA)
+        _conexiones[ruta] = conexion
+    return conexion
+
+def normalizar_proveedor(proveedor):
+    clave = " ".join(proveedor.strip().lower().split())
+    return PROVEEDORES_INDICE.get(clave, clave)
+
+def normalizar_codigo(codigo):
+    return str(codigo or "").strip().upper()
+
+def normalizar_fecha(fecha):
+    """Fecha en AAAA-MM-DD para ordenar; DD/MM/AAAA es el formato de Syscom y Portenntum"""
+    fecha = str(fecha or "").strip()
+    if not fecha:
+        return None
+    match = PATRON_FECHA_ISO.match(fecha)
+    if match:
+        return match.group(0)
+    match = PATRON_FECHA_DMY.match(fecha)
+    if match:
+        dia, mes, año = match.groups()
+        return f"{año}-{int(mes):02d}-{int(dia):02d}"
+    return fecha
+
+def filas_resultado(proveedor, huella, resultado, registrado):
+    """Una fila por producto con código del resultado de un extractor"""
+    folio = str(resultado.get("folio") or "").strip() or None
+    fecha = normalizar_fecha(resultado.get("fecha"))
+    for producto in resultado.get("productos") or []:
+        codigo = normalizar_codigo(producto.get("codigo"))
+        if not codigo:
+            continue
+        yield (
+            huella, proveedor, folio, fecha, codigo, producto.get("descripcion"),
+            numero(producto.get("cantidad")), numero(producto.get("precioUnitario")),
+            numero(producto.get("precioLista")), registrado,
+        )
+
+def registrar(proveedor, huella, resultado, reemplazar=True, ruta=None):
+    """
+    Guarda los productos del resultado. Con reemplazar=False no hace nada si el PDF
+    ya está en el índice (resultado tomado de la caché). Regresa las filas escritas.
+    """
+    if not isinstance(resultado, dict) or 'error' in resultado or not resultado.get("productos"):
+        return 0
+    proveedor = normalizar_proveedor(proveedor)
+    conexion = conectar(ruta)
+    with conexion:
+        existente = conexion.execute(
+            "SELECT 1 FROM precios WHERE huella = ? AND proveedor = ? LIMIT 1", (huella, proveedor)
+        ).fetchone()
+        if existente and not reemplazar:
+            return 0
+        if existente:
+            conexion.execute("DELETE FROM precios WHERE huella = ? AND proveedor = ?", (huella, proveedor))
+        registrado = datetime.now().isoformat(timespec='seconds')
+        cursor = conexion.executemany(
+            "INSERT INTO precios (huella, proveedor, folio, fecha, codigo, descripcion, cantidad,"
+            " precioUnitario, precioLista, registrado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            filas_resultado(proveedor, huella, resultado, registrado),
+        )
+        return cursor.rowcount
+
+def registrar_extraccion(proveedor, archivo_pdf, resultado, huella=None, reemplazar=True):
+    """
+    Registra el resultado de un extractor; un error del índice no debe afectar la extracción
+    """
+    if not indice_habilitado():
+        return 0
+    with metricas.etapa('indice'):
+        try:
+            if huella is None:
+                from cache_extraccion import hash_pdf
+                huella = hash_pdf(archivo_pdf)
+            return registrar(proveedor, huella, resultado, reemplazar)
+        except (sqlite3.Error, OSError) as e:
+            print(f"No se pudo actualizar el índice de precios: {str(e)}", file=sys.stderr)
+            return 0
+
+def _consulta(codigo, proveedor, orden, limite):
+    condiciones = ["codigo = ?"]
+    parametros = [normalizar_codigo(codigo)]
+    if proveedor:
+        # El + evita que SQLite prefiera el índice (proveedor, fecha) sobre el de código
+        condiciones.append("+proveedor = ?")
+        parametros.append(normalizar_proveedor(proveedor))
+    parametros.append(limite)
+    return (f"SELECT {', '.join(COLUMNAS)} FROM precios WHERE {' AND '.join(condiciones)} "
+            f"ORDER BY {orden} LIMIT ?", parametros)
+
+def historial(codigo, proveedor=None, limite=50, ruta=None):
+    """Precios de un código de la cotización más reciente a la más antigua"""
+    sql, parametros = _consulta(codigo, proveedor, "fecha DESC, id DESC", limite)
+    return [dict(fila) for fila in conectar(ruta).execute(sql, parametros)]
+
+def ultimo_precio(codigo, proveedor=None, ruta=None):
+    """Último precio registrado de un código, o None"""
+    filas = historial(codigo, proveedor, 1, ruta)
+    return filas[0] if filas else None
+
+def ultimos_precios(codigos, proveedor=None, ruta=None):
+    return {normalizar_codigo(codigo): ultimo_precio(codigo, proveedor, ruta) for codigo in codigos}
+
+def cargar(origen, proveedor, recursivo=False, procesos=None):
+    """
+    Extrae en lote los PDFs de un directorio; cada extracción se registra en el índice.
+    Los PDFs ya indexados y en caché solo se confirman.
+    """
+    from extraer_lote import listar_pdfs, procesar_lote
+
+    archivos = listar_pdfs(origen, recursivo)
+    correctos = errores = 0
+    for registro in procesar_lote(archivos, proveedor, procesos):
+        if registro["ok"]:
+            correctos += 1
+        else:
+            errores += 1
+            print(f"{registro['archivo']}: {registro['error']}", file=sys.stderr)
+    return {"archivos": len(archivos), "correctos": correctos, "errores": errores}
+
+def main():
+    parser = argparse.ArgumentParser(description="Índice local de precios de las cotizaciones extraídas")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+
+    p_historial = comandos.add_parser('historial', help="Historial de precios de un código")
+    p_historial.add_argument('codigo')
+    p_historial.add_argument('--proveedor')
+    p_historial.add_argument('--limite', type=int, default=50)
+
+    p_ultimo = comandos.add_parser('ultimo', help="Último precio de uno o más códigos")
+    p_ultimo.add_argument('codigos', nargs='+')
+    p_ultimo.add_argument('--proveedor')
+
+    p_cargar = comandos.add_parser('cargar', help="Extraer e indexar los PDFs de un directorio o patrón glob")
+    p_cargar.add_argument('origen')
+    p_cargar.add_argument('proveedor', help="syscom, grupo dice, tvc, portenntum, ... o auto")
+    p_cargar.add_argument('--recursivo', action='store_true')
+    p_cargar.add_argument('--procesos', type=int, default=None)
+
+    args = parser.parse_args()
+    inicio = time.perf_counter()
+    if args.comando == 'historial':
+        datos = historial(args.codigo, args.proveedor, args.limite)
+    elif args.comando == 'ultimo':
+        datos = ultimos_precios(args.codigos, args.proveedor)
+    else:
+        if not indice_habilitado():
+            print("El índice de precios está desactivado (TIMANAGER_INDICE=0)", file=sys.stderr)
+            sys.exit(1)
+        datos = cargar(args.origen, args.proveedor, args.recursivo, args.procesos)
+        datos["lineas_indice"] = conectar().execute("SELECT COUNT(*) FROM precios").fetchone()[0]
+
+    print(json.dumps(datos, indent=2, ensure_ascii=False))
+    print(f"{(time.perf_counter() - inicio) * 1000:.1f} ms", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
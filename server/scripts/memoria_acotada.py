@@ -0,0 +1,172 @@
+import os
+import sys
+
+# Modo de memoria acotada para PDFs muy grandes. Se activa con un límite en MB:
+# TIMANAGER_MEMORIA_MAX_MB=<MB> o --memoria-max=<MB>. En este modo:
+#   - texto_paginas libera después de cada página, además de los objetos de layout,
+#     los objetos del PDF ya resueltos: pdfminer y PyPDF2 guardan los flujos de
+#     contenido e imágenes de cada página visitada hasta cerrar el documento
+#     (medido: ~3 MB por página en un PDF escaneado). Tampoco reparte páginas entre procesos.
+#   - Syscom y Portenntum recorren las líneas conforme llegan, con solo la ventana
+#     que necesita su lectura adelantada, en lugar de unir el texto del documento.
+#   - Después de cada página se compara el RSS con el límite y se proyecta, con la
+#     tendencia de las páginas ya leídas, el RSS al terminar el documento; si lo
+#     excedería, la extracción se detiene con MemoriaExcedida antes de llegar.
+#   - _metadata.memoria reporta el RSS pico de la extracción y el límite. En Linux el
+#     pico se reinicia antes de cada extracción; en Windows y macOS es el pico desde que
+#     inició el proceso, así que en --serve y el servicio HTTP refleja la extracción más
+#     pesada atendida hasta ese momento, no la actual.
+
+# Las primeras páginas cargan fuentes y módulos; la tendencia se mide a partir de
+# esta página y se proyecta después de otras tantas
+PAGINAS_CALENTAMIENTO = 4
+
+class MemoriaExcedida(MemoryError):
+    """La extracción excedió (o excedería) el límite de memoria configurado"""
+
+def limite_mb():
+    """Límite de TIMANAGER_MEMORIA_MAX_MB o None si el modo está desactivado"""
+    valor = os.environ.get('TIMANAGER_MEMORIA_MAX_MB', '').strip()
+    if not valor or valor == '0':
+        return None
+    try:
+        return float(valor)
+    except ValueError:
+        raise ValueError(f"Límite de memoria no válido: {valor}")
+
+def acotada():
+    return limite_mb() is not None
+
+def activar(megas):
+    """Aplica el límite en este proceso y en los procesos hijos que cree"""
+    os.environ['TIMANAGER_MEMORIA_MAX_MB'] = str(megas)
+
+def configurar(argumentos):
+    """Quita --memoria-max=<MB> de los argumentos y lo aplica"""
+    restantes = []
+    for argumento in argumentos:
+        if argumento.startswith('--memoria-max='):
+            activar(argumento.split('=', 1)[1])
+        else:
+            restantes.append(argumento)
+    return restantes
+
+# ==== MEDICIÓN DEL RSS ====
+
+def _contadores_windows():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi = ctypes.windll.psapi
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+    contadores = PROCESS_MEMORY_COUNTERS()
+    contadores.cb = ctypes.sizeof(contadores)
+    psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(contadores), contadores.cb)
+    return contadores
+
+def _estado_linux(campo):
+    with open('/proc/self/status') as file:
+        for linea in file:
+            if linea.startswith(campo + ':'):
+                return int(linea.split()[1]) / 1024
+    return None
+
+def _pico_getrusage():
+    import resource
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+def rss_mb():
+    """RSS actual del proceso en MB"""
+    if sys.platform == 'win32':
+        return _contadores_windows().WorkingSetSize / (1024 * 1024)
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        # Sin /proc (macOS) solo se conoce el pico, que acota el RSS actual por arriba
+        return _pico_getrusage()
+
+def pico_mb():
+    """RSS pico en MB desde reiniciar_pico() (Linux) o desde que inició el proceso"""
+    if sys.platform == 'win32':
+        return _contadores_windows().PeakWorkingSetSize / (1024 * 1024)
+    try:
+        pico = _estado_linux('VmHWM')
+        if pico is not None:
+            return pico
+    except OSError:
+        pass
+    return _pico_getrusage()
+
+def reiniciar_pico():
+    """
+    Reinicia el pico de RSS del proceso (Linux) para medir una sola extracción en
+    procesos que atienden varias (--serve, servicio HTTP, cola)
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        pass
+
+# ==== VIGILANCIA POR PÁGINA ====
+
+class Vigilancia:
+    """Compara el RSS con el límite después de cada página de un documento"""
+
+    def __init__(self, limite, total_paginas=None):
+        self.limite = limite
+        self.total = total_paginas
+        self.paginas = 0
+        self.rss_base = None
+        self.revisar()
+
+    def _exceder(self, detalle):
+        raise MemoriaExcedida(f"La extracción excede el límite de memoria de {self.limite:g} MB: {detalle}")
+
+    def revisar(self):
+        rss = rss_mb()
+        if rss > self.limite:
+            if self.paginas:
+                self._exceder(f"{rss:.0f} MB después de {self.paginas} páginas")
+            self._exceder(f"el proceso ya usa {rss:.0f} MB antes de leer el PDF")
+        return rss
+
+    def pagina(self):
+        self.paginas += 1
+        rss = self.revisar()
+        if self.paginas == PAGINAS_CALENTAMIENTO:
+            self.rss_base = rss
+        if self.total is None or self.paginas < 2 * PAGINAS_CALENTAMIENTO or self.paginas >= self.total:
+            return
+        por_pagina = (rss - self.rss_base) / (self.paginas - PAGINAS_CALENTAMIENTO)
+        proyectado = rss + por_pagina * (self.total - self.paginas)
+        if proyectado > self.limite:
+            self._exceder(f"{rss:.0f} MB después de {self.paginas} de {self.total} páginas, "
+                          f"con {por_pagina:.1f} MB por página se llegaría a {proyectado:.0f} MB")
+
+def vigilancia(total_paginas=None):
+    """Vigilancia para un documento o None si el modo está desactivado"""
+    limite = limite_mb()
+    return Vigilancia(limite, total_paginas) if limite is not None else None
+
+def anotar(resultado):
+    """Copia del resultado con _metadata.memoria (sin tocar el objeto guardado en caché)"""
+    limite = limite_mb()
+    if limite is None or not isinstance(resultado, dict):
+        return resultado
+    memoria = {"pico_rss_mb": round(pico_mb(), 1), "limite_mb": limite}
+    return dict(resultado, _metadata=dict(resultado.get("_metadata") or {}, memoria=memoria))
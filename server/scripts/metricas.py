@@ -0,0 +1,172 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Tiempos por etapa de una extracción (apertura del PDF, extracción de texto,
+# caché, parseo y serialización) y perfil cProfile opcional.
+# Se activan con TIMANAGER_TIMINGS=1 / --timings y TIMANAGER_PERFIL=<archivo> / --perfil=<archivo>.
+# Desactivadas, cada etapa cuesta una consulta a una variable global.
+
+_configuracion = {
+    'timings': os.environ.get('TIMANAGER_TIMINGS', '0') == '1',
+    'perfil': os.environ.get('TIMANAGER_PERFIL') or None,
+}
+_actual = None
+
+def configurar(argumentos):
+    """
+    Quita --timings y --perfil=<archivo> de los argumentos y los aplica.
+    Regresa los argumentos restantes para que cada script los valide como antes.
+    """
+    restantes = []
+    for argumento in argumentos:
+        if argumento == '--timings':
+            activar(timings=True)
+        elif argumento.startswith('--perfil='):
+            activar(perfil=argumento.split('=', 1)[1])
+        else:
+            restantes.append(argumento)
+    return restantes
+
+def activar(timings=False, perfil=None):
+    """Activa las métricas en este proceso y en los procesos hijos que cree"""
+    if timings:
+        _configuracion['timings'] = True
+        os.environ['TIMANAGER_TIMINGS'] = '1'
+    if perfil:
+        _configuracion['perfil'] = perfil
+        os.environ['TIMANAGER_PERFIL'] = perfil
+
+def habilitadas():
+    return _configuracion['timings'] or _configuracion['perfil'] is not None
+
+class Medicion:
+    def __init__(self):
+        self.etapas = {}
+        self.paginas = 0
+        self.caracteres = 0
+        self.cache = None
+        self.inicio = time.perf_counter()
+        self.total = None
+        self.perfilador = None
+
+    def sumar(self, etapa, segundos):
+        self.etapas[etapa] = self.etapas.get(etapa, 0.0) + segundos
+
+    def resumen(self, resultado):
+        """Bloque _metadata.timings; el parseo es el tiempo que no cae en otra etapa"""
+        total = self.total if self.total is not None else time.perf_counter() - self.inicio
+        etapas = {nombre: segundos for nombre, segundos in self.etapas.items() if nombre != 'serializacion'}
+        timings = {f"{nombre}_ms": round(segundos * 1000, 3) for nombre, segundos in etapas.items()}
+        timings["parseo_ms"] = round(max(total - sum(etapas.values()), 0.0) * 1000, 3)
+        if 'serializacion' in self.etapas:
+            timings["serializacion_ms"] = round(self.etapas['serializacion'] * 1000, 3)
+        timings["total_ms"] = round((total + self.etapas.get('serializacion', 0.0)) * 1000, 3)
+        timings["paginas"] = self.paginas
+        timings["caracteres"] = self.caracteres
+        timings["productos"] = contar_productos(resultado.get("productos"))
+        if self.cache:
+            timings["cache"] = self.cache
+        return timings
+
+def contar_productos(productos):
+    # Lista de productos, columnas por campo (--compact=columnas) o el conteo del encabezado NDJSON
+    if isinstance(productos, int):
+        return productos
+    if isinstance(productos, dict):
+        return len(next(iter(productos.values()), []))
+    return len(productos or [])
+
+def iniciar():
+    """Empieza a medir una extracción; regresa None si las métricas están desactivadas"""
+    global _actual
+    if not habilitadas():
+        return None
+    _actual = Medicion()
+    if _configuracion['perfil']:
+        import cProfile
+        _actual.perfilador = cProfile.Profile()
+        _actual.perfilador.enable()
+    return _actual
+
+def terminar(medicion):
+    """Cierra la medición y, si se pidió, escribe el perfil en formato pstats"""
+    global _actual
+    if medicion is None:
+        return
+    medicion.total = time.perf_counter() - medicion.inicio
+    if medicion.perfilador:
+        medicion.perfilador.disable()
+        # {pid} permite un archivo por proceso en modo --serve o en lote
+        ruta = _configuracion['perfil'].replace('{pid}', str(os.getpid()))
+        try:
+            medicion.perfilador.dump_stats(ruta)
+        except OSError:
+            pass
+    if _actual is medicion:
+        _actual = None
+
+def medir(funcion, *args):
+    """Ejecuta funcion(*args) y regresa (resultado, medicion o None)"""
+    medicion = iniciar()
+    try:
+        return funcion(*args), medicion
+    finally:
+        terminar(medicion)
+
+@contextmanager
+def etapa(nombre):
+    medicion = _actual
+    if medicion is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion.sumar(nombre, time.perf_counter() - inicio)
+
+def contar_pagina(texto):
+    if _actual is not None:
+        _actual.paginas += 1
+        _actual.caracteres += len(texto)
+
+def marcar_cache(estado):
+    if _actual is not None:
+        _actual.cache = estado
+
+def agregar_timings(resultado, medicion):
+    """Copia del resultado con _metadata.timings (sin tocar el objeto guardado en caché)"""
+    if medicion is None or not isinstance(resultado, dict):
+        return resultado
+    copia = dict(resultado)
+    copia["_metadata"] = dict(resultado.get("_metadata") or {}, timings=medicion.resumen(resultado))
+    return copia
+
+def serializar(resultado, medicion=None, **opciones):
+    """
+    json.dumps del resultado con _metadata.timings al final, incluyendo el tiempo
+    de serialización. El bloque de métricas se agrega al texto ya serializado para
+    no serializar el resultado dos veces.
+    """
+    if medicion is None or not isinstance(resultado, dict):
+        return json.dumps(resultado, **opciones)
+
+    cuerpo = {clave: valor for clave, valor in resultado.items() if clave != "_metadata"}
+    inicio = time.perf_counter()
+    texto = json.dumps(cuerpo, **opciones)
+    medicion.sumar('serializacion', time.perf_counter() - inicio)
+
+    metadata = dict(resultado.get("_metadata") or {}, timings=medicion.resumen(resultado))
+    indent = opciones.get("indent")
+    if indent is None:
+        separador, dos_puntos = opciones.get("separators") or (", ", ": ")
+        fragmento = '"_metadata"' + dos_puntos + json.dumps(metadata, **opciones)
+        return texto[:-1] + (separador if cuerpo else "") + fragmento + "}"
+
+    sangria = " " * indent if isinstance(indent, int) else indent
+    fragmento = sangria + '"_metadata": ' + json.dumps(metadata, **opciones).replace("\n", "\n" + sangria)
+    if not cuerpo:
+        return "{\n" + fragmento + "\n}"
+    return texto[:-2] + ",\n" + fragmento + "\n}"
@@ -0,0 +1,96 @@
+from collections.abc import Mapping
+
+# Modelo común de los extractores. Cada parser llena objetos Producto (con
+# __slots__, sin un dict por producto) y arma el resultado con Cotizacion.
+# Cada proveedor conserva el esquema JSON y los tipos que ya recibe el frontend
+# (la cantidad de Syscom y los descuentos siguen como texto): un ESQUEMA_*
+# relaciona cada clave de salida con el atributo donde vive el valor, así que los
+# alias (clave, concepto, precio, total de Portenntum clásico) no se guardan dos veces.
+
+class Producto(Mapping):
+    """
+    Producto de una cotización. Se lee como un dict de solo lectura con las
+    claves de su esquema, y json.dumps lo serializa con default=a_json.
+    """
+    __slots__ = (
+        'esquema', 'partida', 'cantidad', 'unidad', 'codigo', 'descripcion', 'marca', 'modelo',
+        'alm', 'precioLista', 'precioUnitario', 'descuento', 'importe', 'stock',
+    )
+
+    def __init__(self, esquema, partida=None, cantidad=None, unidad=None, codigo=None, descripcion=None,
+                 marca=None, modelo=None, alm=None, precioLista=None, precioUnitario=None,
+                 descuento=None, importe=None, stock=None):
+        self.esquema = esquema
+        self.partida = partida
+        self.cantidad = cantidad
+        self.unidad = unidad
+        self.codigo = codigo
+        self.descripcion = descripcion
+        self.marca = marca
+        self.modelo = modelo
+        self.alm = alm
+        self.precioLista = precioLista
+        self.precioUnitario = precioUnitario
+        self.descuento = descuento
+        self.importe = importe
+        self.stock = stock
+
+    def __getitem__(self, clave):
+        try:
+            return getattr(self, self.esquema[clave])
+        except KeyError:
+            raise KeyError(clave) from None
+
+    def __iter__(self):
+        return iter(self.esquema)
+
+    def __len__(self):
+        return len(self.esquema)
+
+    def a_dict(self):
+        return {clave: getattr(self, atributo) for clave, atributo in self.esquema.items()}
+
+    def __repr__(self):
+        return f"Producto({self.a_dict()!r})"
+
+def esquema(*claves, **alias):
+    """Esquema de salida: claves en orden; alias={'clave': 'codigo'} lee otro atributo"""
+    return {clave: alias.get(clave, clave) for clave in claves}
+
+ESQUEMA_SYSCOM = esquema('cantidad', 'unidad', 'codigo', 'descripcion', 'alm', 'precioLista', 'precioUnitario', 'importe')
+ESQUEMA_DICE = esquema(
+    'partida', 'cantidad', 'codigo', 'descripcion', 'precioLista', 'precioUnitario', 'descuento',
+    'precioExtendido', 'stock', precioExtendido='importe',
+)
+ESQUEMA_TVC = esquema('codigo', 'descripcion', 'cantidad', 'precioUnitario', 'importe')
+ESQUEMA_PORTENNTUM = esquema(
+    'cantidad', 'unidad', 'codigo', 'clave', 'descripcion', 'concepto', 'marca', 'modelo',
+    'precioUnitario', 'precio', 'importe', 'total', 'precioLista', 'descuento', 'alm',
+    clave='codigo', concepto='descripcion', precio='precioUnitario', total='importe',
+)
+ESQUEMA_ARUBA = esquema(
+    'cantidad', 'codigo', 'descripcion', 'precioLista', 'porcentaje', 'precioUnitario', 'pExtendido',
+    porcentaje='descuento', pExtendido='importe',
+)
+
+class Cotizacion(dict):
+    """Resultado de un extractor: encabezado en el orden recibido, productos y totales"""
+    __slots__ = ()
+
+    def __init__(self, productos, totales, **encabezado):
+        super().__init__(encabezado, productos=productos, totales=totales)
+
+def numero(valor):
+    """'1,234.50' o '$ 99' a float; None si no es un número"""
+    if valor is None or valor == "":
+        return None
+    try:
+        return float(str(valor).replace(",", "").replace("$", "").strip())
+    except ValueError:
+        return None
+
+def a_json(objeto):
+    """default= de json.dumps para los resultados con objetos Producto"""
+    if isinstance(objeto, Producto):
+        return objeto.a_dict()
+    raise TypeError(f"Object of type {type(objeto).__name__} is not JSON serializable")
@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from modelo_cotizacion import a_json
+
+# Re-extracción incremental del archivo de cotizaciones (uploads/documentos).
+# Un manifiesto SQLite guarda por PDF (huella, proveedor, versión del parser,
+# resultado). En cada corrida solo se procesan los PDFs nuevos o modificados y
+# los de proveedores cuyo VERSION_PARSER cambió desde la última extracción.
+# Cada resultado se confirma al llegar, así que una corrida interrumpida
+# continúa donde se quedó. Al final se reportan el rendimiento y los PDFs cuyo
+# resultado cambió con la nueva versión.
+#
+#   python reextraer_archivo.py [directorio] [--proveedor syscom] [--procesos N] [--recursivo]
+#   python reextraer_archivo.py --reintentar-errores
+
+# Configurar la codificación de salida para evitar problemas en Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+DIRECTORIO_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DIRECTORIO_ARCHIVO = os.path.join(DIRECTORIO_SERVER, 'uploads', 'documentos')
+RUTA_MANIFIESTO = os.environ.get(
+    'TIMANAGER_MANIFIESTO_DB',
+    os.path.join(DIRECTORIO_SERVER, 'data', 'manifiesto_extraccion.sqlite3')
+)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    huella TEXT PRIMARY KEY,
+    archivo TEXT NOT NULL,
+    tamano INTEGER,
+    mtime_ns INTEGER,
+    proveedor TEXT,
+    version TEXT,
+    ok INTEGER NOT NULL,
+    productos INTEGER,
+    resultado TEXT,
+    error TEXT,
+    actualizado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documentos_archivo ON documentos (archivo);
+"""
+
+def conectar(ruta=None):
+    ruta = ruta or RUTA_MANIFIESTO
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    conexion = sqlite3.connect(ruta, timeout=30)
+    conexion.row_factory = sqlite3.Row
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.executescript(ESQUEMA)
+    return conexion
+
+def versiones_actuales():
+    """VERSION_PARSER vigente de cada proveedor de extractores.EXTRACTORES"""
+    from extractores import EXTRACTORES, cargar_extractor
+    return {clave: str(cargar_extractor(clave)[1]) for clave in EXTRACTORES}
+
+def resultado_comparable(resultado):
+    """JSON del resultado sin _metadata (tiempos, detección) para detectar cambios"""
+    if not isinstance(resultado, dict):
+        return None
+    datos = {clave: valor for clave, valor in resultado.items() if clave != '_metadata'}
+    return json.dumps(datos, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=a_json)
+
+def pendientes(conexion, archivos, versiones, proveedor=None, reintentar_errores=False):
+    """
+    Regresa [(archivo, huella, proveedor conocido o None)] de los PDFs que hay que
+    extraer y el número de PDFs al día. La huella solo se recalcula si el archivo
+    cambió de tamaño o de fecha desde la última corrida.
+    """
+    from cache_extraccion import hash_pdf
+
+    por_archivo = {fila["archivo"]: fila for fila in conexion.execute(
+        "SELECT archivo, huella, tamano, mtime_ns FROM documentos")}
+    trabajos = []
+    al_dia = 0
+    for archivo in archivos:
+        info = os.stat(archivo)
+        previo = por_archivo.get(archivo)
+        if previo and previo["tamano"] == info.st_size and previo["mtime_ns"] == info.st_mtime_ns:
+            huella = previo["huella"]
+        else:
+            huella = hash_pdf(archivo)
+        fila = conexion.execute("SELECT proveedor, version, ok FROM documentos WHERE huella = ?", (huella,)).fetchone()
+        if fila is None:
+            if proveedor is None:
+                trabajos.append((archivo, huella, None))
+            continue
+        if proveedor is not None and fila["proveedor"] != proveedor:
+            continue
+        if fila["proveedor"] is None:
+            # No se reconoció el proveedor; solo se vuelve a intentar si se pide
+            if reintentar_errores:
+                trabajos.append((archivo, huella, None))
+            else:
+                al_dia += 1
+        elif fila["version"] != versiones.get(fila["proveedor"]) or (reintentar_errores and not fila["ok"]):
+            trabajos.append((archivo, huella, fila["proveedor"]))
+        else:
+            al_dia += 1
+    return trabajos, al_dia
+
+def extraer_documento(archivo, huella, proveedor):
+    """Se ejecuta en el proceso trabajador: detecta el proveedor si no se conoce y extrae el PDF"""
+    from extractores import extraer, cargar_extractor
+    import detector_proveedor
+
+    inicio = time.perf_counter()
+    registro = {"archivo": archivo, "huella": huella, "proveedor": proveedor, "version": None}
+    try:
+        if proveedor is None:
+            registro["proveedor"] = proveedor = detector_proveedor.detectar(archivo)["proveedor"]
+        registro["version"] = str(cargar_extractor(proveedor)[1])
+        resultado = extraer(proveedor, archivo)
+        if isinstance(resultado, dict) and 'error' in resultado:
+            registro["ok"] = False
+            registro["error"] = resultado["error"]
+        else:
+            registro["ok"] = True
+            registro["productos"] = len(resultado.get("productos") or [])
+            registro["resultado"] = resultado_comparable(resultado)
+    except Exception as e:
+        registro["ok"] = False
+        registro["error"] = f"Error procesando PDF: {str(e)}"
+    registro["ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+    return registro
+
+def registrar(conexion, registro):
+    """Guarda el registro en el manifiesto y regresa la fila anterior (o None)"""
+    info = os.stat(registro["archivo"])
+    with conexion:
+        anterior = conexion.execute(
+            "SELECT version, ok, productos, resultado FROM documentos WHERE huella = ?", (registro["huella"],)
+        ).fetchone()
+        conexion.execute(
+            "INSERT OR REPLACE INTO documentos (huella, archivo, tamano, mtime_ns, proveedor, version, ok,"
+            " productos, resultado, error, actualizado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (registro["huella"], registro["archivo"], info.st_size, info.st_mtime_ns, registro["proveedor"],
+             registro["version"], int(registro["ok"]), registro.get("productos"), registro.get("resultado"),
+             registro.get("error"), datetime.now().isoformat(timespec='seconds')),
+        )
+    return anterior
+
+def reextraer(origen=None, proveedor=None, procesos=None, recursivo=False, reintentar_errores=False, ruta=None):
+    """Procesa los PDFs pendientes del archivo y regresa el reporte de la corrida"""
+    from extraer_lote import listar_pdfs
+    from extractores import normalizar_proveedor
+
+    inicio = time.perf_counter()
+    conexion = conectar(ruta)
+    versiones = versiones_actuales()
+    if proveedor is not None:
+        proveedor = normalizar_proveedor(proveedor)
+        if proveedor not in versiones:
+            raise ValueError(f"Proveedor no soportado: {proveedor}")
+
+    archivos = [os.path.abspath(archivo) for archivo in listar_pdfs(origen or DIRECTORIO_ARCHIVO, recursivo)]
+    trabajos, al_dia = pendientes(conexion, archivos, versiones, proveedor, reintentar_errores)
+    reporte = {"archivos": len(archivos), "al_dia": al_dia, "pendientes": len(trabajos), "procesados": 0,
+               "nuevos": 0, "cambiados": 0, "sin_cambios": 0, "errores": 0, "interrumpido": False, "cambios": []}
+    print(f"{len(archivos)} PDFs: {al_dia} al día, {len(trabajos)} por extraer", file=sys.stderr)
+
+    inicio_extraccion = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=procesos or os.cpu_count())
+    try:
+        futuros = {pool.submit(extraer_documento, *trabajo): trabajo for trabajo in trabajos}
+        for futuro in as_completed(futuros):
+            try:
+                registro = futuro.result()
+            except Exception as e:
+                # Falla del proceso trabajador: sin versión, se vuelve a intentar en la siguiente corrida
+                archivo, huella, conocido = futuros[futuro]
+                registro = {"archivo": archivo, "huella": huella, "proveedor": conocido, "version": None,
+                            "ok": False, "error": f"Error en el proceso trabajador: {str(e)}"}
+            anterior = registrar(conexion, registro)
+            reporte["procesados"] += 1
+            if not registro["ok"]:
+                reporte["errores"] += 1
+                print(f"{registro['archivo']}: {registro['error']}", file=sys.stderr)
+            elif anterior is None or anterior["resultado"] is None:
+                reporte["nuevos"] += 1
+            elif anterior["resultado"] == registro["resultado"]:
+                reporte["sin_cambios"] += 1
+            else:
+                reporte["cambiados"] += 1
+                reporte["cambios"].append({
+                    "archivo": registro["archivo"], "proveedor": registro["proveedor"],
+                    "version_anterior": anterior["version"], "version": registro["version"],
+                    "productos_antes": anterior["productos"], "productos": registro["productos"],
+                })
+    except KeyboardInterrupt:
+        # Lo ya confirmado queda en el manifiesto; la siguiente corrida sigue desde ahí
+        reporte["interrumpido"] = True
+    finally:
+        pool.shutdown(wait=not reporte["interrumpido"], cancel_futures=True)
+        conexion.close()
+
+    segundos_extraccion = time.perf_counter() - inicio_extraccion
+    reporte["segundos"] = round(time.perf_counter() - inicio, 2)
+    reporte["pdfs_por_s"] = round(reporte["procesados"] / segundos_extraccion, 2) if reporte["procesados"] else None
+    return reporte
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-extrae los PDFs del archivo cuyo parser cambió de versión")
+    parser.add_argument('origen', nargs='?', help="Directorio o patrón glob (por defecto server/uploads/documentos)")
+    parser.add_argument('--proveedor', help="Solo los PDFs de este proveedor")
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos del pool (por defecto, núcleos disponibles)")
+    parser.add_argument('--recursivo', action='store_true', help="Incluir subdirectorios")
+    parser.add_argument('--reintentar-errores', action='store_true',
+                        help="Volver a extraer los PDFs con error o sin proveedor reconocido")
+    parser.add_argument('--manifiesto', help="Ruta del manifiesto SQLite (TIMANAGER_MANIFIESTO_DB)")
+    args = parser.parse_args()
+
+    try:
+        reporte = reextraer(args.origen, args.proveedor, args.procesos, args.recursivo,
+                            args.reintentar_errores, args.manifiesto)
+    except ValueError as e:
+        print(json.dumps({"error": str(e)}, indent=2, ensure_ascii=False))
+        sys.exit(1)
+    print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    print(f"{reporte['procesados']} PDFs extraídos en {reporte['segundos']} s "
+          f"({reporte['pdfs_por_s'] or 0} PDFs/s): {reporte['nuevos']} nuevos, {reporte['cambiados']} cambiados, "
+          f"{reporte['sin_cambios']} sin cambios, {reporte['errores']} con error", file=sys.stderr)
+    if reporte["interrumpido"]:
+        sys.exit(130)
+
+if __name__ == "__main__":
+    main()
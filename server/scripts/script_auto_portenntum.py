@@ -1,9 +1,24 @@
-import pdfplumber
-import re
 import sys
-import subprocess
 import json
-import os
+from itertools import chain, islice
+
+from cache_extraccion import cache_habilitado, hash_pdf, obtener, guardar, version_cache
+import detector_proveedor
+import argumentos
+import formato_salida
+import indice_precios
+import memoria_acotada
+import metricas
+import texto_paginas
+from extraer_datos_portenntum import extraer_informacion_portentum_lineas, VERSION_PARSER as VERSION_CLASICO
+from extraer_datos_portenntum_aruba import extraer_informacion_aruba, VERSION_PARSER as VERSION_ARUBA
+
+# La versión del despachador incluye la de ambos parsers; cambiar el prefijo al modificar la detección
+VERSION_PARSER = f"3-{VERSION_CLASICO}-{VERSION_ARUBA}"
+# Claves de ambos formatos en detector_proveedor.INDICADORES (detección del proveedor desde el PDF)
+FORMATOS = ('portenntum clasico', 'portenntum aruba')
+# Ambos formatos se validaron con pdfplumber; la detección usa el mismo texto
+MOTOR_TEXTO = 'pdfplumber'
 
 # Configurar la codificación de salida para evitar problemas en Windows
 if sys.platform == 'win32':
@@ -11,119 +26,134 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-def detectar_formato_portentum(archivo_pdf):
+def leer_textos_paginas(archivo_pdf):
+    """
+    Abre el PDF una sola vez y regresa el texto de cada página
     """
-    Detecta automáticamente el formato de cotización de Portentum
+    return texto_paginas.textos_paginas(archivo_pdf, texto_paginas.motor_para('portenntum', MOTOR_TEXTO))
+
+def leer_formato(archivo_pdf):
+    """
+    Regresa (texto de cada página, formato detectado con las primeras páginas).
+    En modo de memoria acotada las páginas siguientes se leen hasta que el
+    parser las recorre, sin guardar el texto del documento.
+    """
+    if not memoria_acotada.acotada():
+        textos_paginas = leer_textos_paginas(archivo_pdf)
+        return textos_paginas, detectar_formato_texto(texto_deteccion(textos_paginas))
+    paginas = texto_paginas.iterar_paginas(archivo_pdf, texto_paginas.motor_para('portenntum', MOTOR_TEXTO))
+    primeras = list(islice(paginas, detector_proveedor.PAGINAS_DETECCION))
+    return chain(primeras, paginas), detectar_formato_texto(texto_deteccion(primeras))
+
+def detectar_formato_texto(texto_completo):
+    """
+    Detecta el formato de cotización de Portentum a partir del texto de las primeras
+    páginas con la regla de detector_proveedor.FORMATOS_PORTENNTUM
     Retorna: 'clasico', 'aruba' o 'desconocido'
     """
+    return detector_proveedor.formato_portenntum(texto_completo)
+
+def texto_deteccion(textos_paginas):
+    # Solo necesitamos las primeras páginas para detectar
+    return "".join(texto + "\n" for texto in textos_paginas[:detector_proveedor.PAGINAS_DETECCION])
+
+def detectar_formato_portentum(archivo_pdf):
+    """
+    Detecta automáticamente el formato de cotización de Portentum con el detector
+    de proveedores (metadatos y texto crudo, sin pdfplumber)
+    Retorna: 'clasico', 'aruba', 'desconocido' o 'error: ...'
+    """
     try:
-        with pdfplumber.open(archivo_pdf) as pdf:
-            texto_completo = ""
-            # Solo necesitamos las primeras páginas para detectar
-            for page in pdf.pages[:2]:  
-                texto_completo += page.extract_text() + "\n"
-        
-        # Indicadores del formato Aruba (más específicos)
-        indicadores_aruba = [
-            r'Folio:\s*\w+',                    # Campo "Folio:"
-            r'Elaborado por:',                  # Campo "Elaborado por:"
-            r'P\.Venta Canal',                  # Total "P.Venta Canal"
-            r'\*\w+\s+\d+\s+[A-Z0-9\-]+',     # Productos con asterisco
-            r'Concepto\s+Cantidad\s+No\.\s+De\s+Parte'  # Headers específicos
-        ]
-        
-        # Indicadores del formato Clásico
-        indicadores_clasico = [
-            r'Cot\.\s*\d+',                    # Campo "Cot."
-            r'Linea\s+Parte\s+Descripción',    # Headers específicos
-            r'% Dto\.',                        # Columna "% Dto."
-            r'Precio costo',                   # Columna "Precio costo"
-            r'U/M'                             # Columna "U/M"
-        ]
-        
-        puntos_aruba = sum(1 for patron in indicadores_aruba if re.search(patron, texto_completo, re.IGNORECASE))
-        puntos_clasico = sum(1 for patron in indicadores_clasico if re.search(patron, texto_completo, re.IGNORECASE))
-        
-        if puntos_aruba >= 3:
-            return 'aruba'
-        elif puntos_clasico >= 3:
-            return 'clasico'
-        else:
-            return 'desconocido'
-            
+        deteccion = detector_proveedor.detectar(archivo_pdf, candidatos=FORMATOS)
+        return deteccion["proveedor"].split()[-1]
+    except ValueError:
+        return 'desconocido'
     except Exception as e:
         return f'error: {str(e)}'
 
-def ejecutar_script_formato(archivo_pdf, formato):
+def procesar_formato(textos_paginas, formato):
     """
-    Ejecuta el script correspondiente según el formato detectado
+    Llama al parser del formato detectado con el texto ya extraído, sin volver a abrir el PDF
     """
-    try:
-        # Obtener el directorio del script actual
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        if formato == 'aruba':
-            script_path = os.path.join(script_dir, 'extraer_datos_portenntum_aruba.py')
-        elif formato == 'clasico':
-            script_path = os.path.join(script_dir, 'extraer_datos_portenntum.py')
-        else:
-            return {"error": f"Formato no soportado: {formato}"}
-        
-        # Verificar que el script existe
-        if not os.path.exists(script_path):
-            return {"error": f"Script no encontrado: {script_path}"}
-        
-        # Ejecutar el script correspondiente con manejo mejorado de codificación
-        result = subprocess.run(
-            ['python', script_path, archivo_pdf], 
-            capture_output=True, 
-            text=True, 
-            encoding='utf-8',
-            errors='replace'  # Reemplaza caracteres problemáticos
-        )
-        
-        if result.returncode == 0:
-            # Intentar parsear como JSON
-            try:
-                return json.loads(result.stdout)
-            except json.JSONDecodeError:
-                return {"output": result.stdout.strip()}
-        else:
-            return {"error": f"Error ejecutando script: {result.stderr}"}
-            
-    except Exception as e:
-        return {"error": f"Error: {str(e)}"}
+    if formato == 'aruba':
+        return extraer_informacion_aruba(textos_paginas)
+    elif formato == 'clasico':
+        return extraer_informacion_portentum_lineas(texto_paginas.lineas(textos_paginas))
+    else:
+        raise ValueError(f"Formato no soportado: {formato}")
+
+def agregar_metadata(resultado, formato):
+    # Agregar metadata del formato detectado
+    resultado['_metadata'] = {
+        'formato_detectado': formato,
+        'procesado_con': f'script_{formato}.py'
+    }
+    return resultado
+
+def extraer_datos_portentum_auto(archivo_pdf):
+    """
+    Detecta el formato y extrae la cotización abriendo el PDF una sola vez
+    """
+    textos_paginas, formato = leer_formato(archivo_pdf)
+    if formato == 'desconocido':
+        raise ValueError("Formato de PDF no reconocido")
+    return agregar_metadata(procesar_formato(textos_paginas, formato), formato)
 
 def main():
+    sys.argv = argumentos.procesar(sys.argv)
     if len(sys.argv) != 2:
-        print("Uso: python script_auto_portenntum.py archivo.pdf")
+        print("Uso: python script_auto_portenntum.py archivo.pdf|-")
         sys.exit(1)
     
-    archivo_pdf = sys.argv[1]
+    archivo_pdf = texto_paginas.leer_origen(sys.argv[1])
+    medicion = metricas.iniciar()
+    if memoria_acotada.acotada():
+        memoria_acotada.reiniciar_pico()
     
-    # Detectar formato
-    formato = detectar_formato_portentum(archivo_pdf)
-    
-    if formato.startswith('error'):
-        print(json.dumps({"error": formato}, indent=2, ensure_ascii=True))
+    # Leer el PDF una sola vez; el mismo texto sirve para detectar y para extraer
+    try:
+        with metricas.etapa('cache'):
+            huella = hash_pdf(archivo_pdf) if cache_habilitado() else None
+            guardado = obtener('portenntum', version_cache('portenntum', VERSION_PARSER), huella) if huella else None
+        if guardado is not None:
+            metricas.marcar_cache('hit')
+            indice_precios.registrar_extraccion('portenntum', archivo_pdf, guardado, huella, reemplazar=False)
+            metricas.terminar(medicion)
+            guardado = memoria_acotada.anotar(guardado)
+            print(formato_salida.serializar(guardado, medicion, indent=2, ensure_ascii=True))
+            return
+        if huella:
+            metricas.marcar_cache('miss')
+        textos_paginas, formato = leer_formato(archivo_pdf)
+    except Exception as e:
+        print(json.dumps({"error": f'error: {str(e)}'}, indent=2, ensure_ascii=True))
         sys.exit(1)
     
     if formato == 'desconocido':
         print(json.dumps({"error": "Formato de PDF no reconocido"}, indent=2, ensure_ascii=True))
         sys.exit(1)
     
-    # Ejecutar script correspondiente
-    resultado = ejecutar_script_formato(archivo_pdf, formato)
+    # Ejecutar el parser correspondiente dentro del mismo proceso
+    try:
+        resultado = agregar_metadata(procesar_formato(textos_paginas, formato), formato)
+    except Exception as e:
+        resultado = {"error": f"Error procesando PDF: {str(e)}"}
     
-    # Agregar metadata del formato detectado
-    if isinstance(resultado, dict) and 'error' not in resultado:
-        resultado['_metadata'] = {
-            'formato_detectado': formato,
-            'procesado_con': f'script_{formato}.py'
-        }
+    if huella and 'error' not in resultado:
+        with metricas.etapa('cache'):
+            try:
+                guardar('portenntum', version_cache('portenntum', VERSION_PARSER), huella, resultado)
+            except OSError:
+                pass
+    if 'error' not in resultado:
+        indice_precios.registrar_extraccion('portenntum', archivo_pdf, resultado, huella)
+        resultado = memoria_acotada.anotar(resultado)
     
     # Usar ensure_ascii=True para evitar problemas de codificación
-    print(json.dumps(resultado, indent=2, ensure_ascii=True))
+    metricas.terminar(medicion)
+    if 'error' in resultado:
+        medicion = None
+    print(formato_salida.serializar(resultado, medicion, indent=2, ensure_ascii=True))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit, parse_qs
+
+import formato_salida
+import indice_precios
+import metricas
+from modelo_cotizacion import a_json
+from extractores import extraer
+
+# Servicio HTTP local de extracción para que el servidor Node no lance un
+# proceso de Python por cada carga.
+#
+#   POST /extract?vendor=syscom            cuerpo: bytes del PDF
+#   POST /extract?vendor=tvc&path=/ruta    PDF ya guardado en server/uploads
+#   GET  /status                           procesos, trabajos en proceso y en cola
+#   GET  /precios?codigo=X&proveedor=      historial de precios (indice_precios.py)
+#   GET  /precios/ultimo?codigo=A,B        último precio de cada código
+#
+# Los trabajos corren en un pool de procesos de tamaño fijo. Los que no caben
+# esperan en una cola acotada; con la cola llena se responde 429.
+
+# Configurar la codificación de salida para evitar problemas en Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+ESTADOS_HTTP = {
+    200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed',
+    411: 'Length Required', 413: 'Payload Too Large', 429: 'Too Many Requests',
+    500: 'Internal Server Error',
+}
+TAMANO_MAXIMO_ENCABEZADOS = 64 * 1024
+# ?path= solo puede leer archivos bajo este directorio, donde el servidor Node guarda las cargas
+DIRECTORIO_UPLOADS = os.environ.get(
+    'TIMANAGER_UPLOADS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads')
+)
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+def ruta_permitida(ruta):
+    """Ruta real del PDF si está dentro de DIRECTORIO_UPLOADS (sin seguir enlaces hacia fuera)"""
+    base = os.path.realpath(DIRECTORIO_UPLOADS)
+    real = os.path.realpath(ruta)
+    if os.path.commonpath([base, real]) != base:
+        raise ErrorHTTP(403, "La ruta del PDF debe estar dentro del directorio de cargas")
+    return real
+
+def procesar_trabajo(proveedor, origen):
+    """Se ejecuta en el proceso trabajador; regresa el resultado con sus métricas si están activas"""
+    resultado, medicion = metricas.medir(extraer, proveedor, origen)
+    return formato_salida.preparar(metricas.agregar_timings(resultado, medicion))
+
+class ServicioExtraccion:
+    def __init__(self, procesos, limite_cola, tamano_maximo):
+        self.procesos = procesos
+        self.limite_cola = limite_cola
+        self.tamano_maximo = tamano_maximo
+        self.pool = ProcessPoolExecutor(max_workers=procesos)
+        self.espacios = asyncio.Semaphore(procesos)
+        self.pendientes = 0
+        self.en_proceso = 0
+        self.atendidos = 0
+        self.rechazados = 0
+
+    def estado(self):
+        return {
+            "procesos": self.procesos,
+            "en_proceso": self.en_proceso,
+            "en_cola": self.pendientes - self.en_proceso,
+            "limite_cola": self.limite_cola,
+            "atendidos": self.atendidos,
+            "rechazados": self.rechazados,
+        }
+
+    async def extraer(self, proveedor, origen):
+        # Los trabajos en proceso más los que esperan no pueden exceder pool + cola
+        if self.pendientes >= self.procesos + self.limite_cola:
+            self.rechazados += 1
+            raise ErrorHTTP(429, "Cola de extracción llena, intente más tarde")
+
+        self.pendientes += 1
+        try:
+            async with self.espacios:
+                self.en_proceso += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    pool = self.pool
+                    return await loop.run_in_executor(pool, procesar_trabajo, proveedor, origen)
+                except BrokenProcessPool:
+                    # Un trabajador murió (p. ej. memoria agotada): se reemplaza el pool. Todos los
+                    # trabajos del pool roto llegan aquí; solo el primero lo reemplaza, para no
+                    # cerrar el pool nuevo que ya recibe trabajos
+                    if self.pool is pool:
+                        pool.shutdown(wait=False)
+                        self.pool = ProcessPoolExecutor(max_workers=self.procesos)
+                    raise ErrorHTTP(500, "Error procesando PDF: el proceso trabajador terminó inesperadamente")
+                finally:
+                    self.en_proceso -= 1
+                    self.atendidos += 1
+        finally:
+            self.pendientes -= 1
+
+    def consultar_precios(self, ruta, parametros):
+        # Las consultas usan el índice por código y tardan milisegundos; no pasan por el pool
+        if not parametros.get('codigo'):
+            raise ErrorHTTP(400, "Falta el parámetro codigo")
+        proveedor = parametros.get('proveedor')
+        try:
+            if ruta == '/precios/ultimo':
+                return indice_precios.ultimos_precios(parametros['codigo'].split(','), proveedor)
+            return indice_precios.historial(parametros['codigo'], proveedor, int(parametros.get('limite', 50)))
+        except ValueError:
+            raise ErrorHTTP(400, "El parámetro limite debe ser un número")
+        except sqlite3.Error as e:
+            raise ErrorHTTP(500, f"Error consultando el índice de precios: {str(e)}")
+
+    async def atender(self, reader, writer):
+        try:
+            try:
+                estado, cuerpo = await self._responder(reader)
+            except ErrorHTTP as e:
+                estado, cuerpo = e.estado, {"error": str(e)}
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                return
+            datos = json.dumps(cuerpo, ensure_ascii=False, separators=formato_salida.separadores(),
+                               default=a_json).encode('utf-8')
+            encabezados = (
+                f"HTTP/1.1 {estado} {ESTADOS_HTTP.get(estado, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(datos)}\r\n"
+                "Connection: close\r\n"
+            )
+            if estado == 429:
+                encabezados += "Retry-After: 1\r\n"
+            writer.write(encabezados.encode('latin-1') + b"\r\n" + datos)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _responder(self, reader):
+        encabezado = await reader.readuntil(b"\r\n\r\n")
+        lineas = encabezado.decode('latin-1').split("\r\n")
+        try:
+            metodo, objetivo, _ = lineas[0].split(" ", 2)
+        except ValueError:
+            raise ErrorHTTP(400, "Solicitud HTTP inválida")
+        encabezados = {}
+        for linea in lineas[1:]:
+            if ':' in linea:
+                nombre, valor = linea.split(':', 1)
+                encabezados[nombre.strip().lower()] = valor.strip()
+
+        url = urlsplit(objetivo)
+        parametros = {clave: valores[0] for clave, valores in parse_qs(url.query).items()}
+
+        if url.path == '/status':
+            if metodo != 'GET':
+                raise ErrorHTTP(405, "Método no permitido")
+            return 200, self.estado()
+
+        if url.path in ('/precios', '/precios/ultimo'):
+            if metodo != 'GET':
+                raise ErrorHTTP(405, "Método no permitido")
+            return 200, self.consultar_precios(url.path, parametros)
+
+        if url.path != '/extract':
+            raise ErrorHTTP(404, "Ruta no encontrada")
+        if metodo != 'POST':
+            raise ErrorHTTP(405, "Método no permitido")
+        if not parametros.get('vendor'):
+            raise ErrorHTTP(400, "Falta el parámetro vendor")
+
+        if parametros.get('path'):
+            origen = ruta_permitida(parametros['path'])
+        else:
+            if 'content-length' not in encabezados:
+                raise ErrorHTTP(411, "Se requiere Content-Length con los bytes del PDF")
+            try:
+                longitud = int(encabezados['content-length'])
+            except ValueError:
+                raise ErrorHTTP(400, "Content-Length inválido")
+            if longitud < 0:
+                raise ErrorHTTP(400, "Content-Length inválido")
+            if longitud > self.tamano_maximo:
+                raise ErrorHTTP(413, "El PDF excede el tamaño máximo permitido")
+            if longitud == 0:
+                raise ErrorHTTP(400, "El cuerpo de la solicitud está vacío")
+            origen = await reader.readexactly(longitud)
+
+        try:
+            return 200, await self.extraer(parametros['vendor'], origen)
+        except ErrorHTTP:
+            raise
+        except FileNotFoundError as e:
+            raise ErrorHTTP(404, f"Error procesando PDF: {str(e)}")
+        except ValueError as e:
+            raise ErrorHTTP(400, f"Error procesando PDF: {str(e)}")
+        except Exception as e:
+            raise ErrorHTTP(500, f"Error procesando PDF: {str(e)}")
+
+async def iniciar_servicio(host, puerto, procesos, limite_cola, tamano_maximo):
+    servicio = ServicioExtraccion(procesos, limite_cola, tamano_maximo)
+    servidor = await asyncio.start_server(servicio.atender, host, puerto, limit=TAMANO_MAXIMO_ENCABEZADOS)
+    print(f"Servicio de extracción en http://{host}:{puerto} "
+          f"({procesos} procesos, cola de {limite_cola})", file=sys.stderr)
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servicio.pool.shutdown(wait=False, cancel_futures=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de extracción de cotizaciones")
+    parser.add_argument('--host', default='127.0.0.1', help="Interfaz de escucha (solo local por defecto)")
+    parser.add_argument('--puerto', type=int, default=int(os.environ.get('TIMANAGER_SERVICIO_PUERTO', '8765')))
+    parser.add_argument('--procesos', type=int, default=int(os.environ.get('TIMANAGER_SERVICIO_PROCESOS', '2')),
+                        help="Tamaño fijo del pool de procesos")
+    parser.add_argument('--cola', type=int, default=int(os.environ.get('TIMANAGER_SERVICIO_COLA', '8')),
+                        help="Trabajos que pueden esperar cuando el pool está ocupado; los demás reciben 429")
+    parser.add_argument('--max-mb', type=float, default=50, help="Tamaño máximo del PDF recibido")
+    parser.add_argument('--timings', action='store_true', help="Agregar _metadata.timings a cada resultado")
+    parser.add_argument('--compact', nargs='?', const='json', choices=('json', 'columnas'),
+                        help="Respuestas sin espacios con un solo nombre por campo (json) o en columnas")
+    args = parser.parse_args()
+    metricas.activar(args.timings)
+    if args.compact:
+        formato_salida.activar(formato_salida.MODOS_COMPACT[args.compact])
+
+    try:
+        asyncio.run(iniciar_servicio(args.host, args.puerto, args.procesos, args.cola,
+                                     int(args.max_mb * 1024 * 1024)))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
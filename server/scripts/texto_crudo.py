@@ -0,0 +1,372 @@
+import re
+
+# Motor de texto "crudo": lee directamente los operadores de texto (Tj, TJ, ', ")
+# del content stream de cada página, sin el análisis de layout de pdfplumber ni
+# los objetos intermedios de PyPDF2. Las líneas salen en el orden del stream y se
+# separan cuando cambia la coordenada vertical del texto.
+# Las páginas con fuentes que no sabe decodificar (Type3, /Differences sin
+# ToUnicode, CMaps predefinidos) se extraen con PyPDF2.
+
+# Tokens de un content stream: cadena literal (con un nivel de paréntesis sin
+# escapar), cadena hexadecimal, delimitadores de diccionario y arreglo, nombre,
+# número y operador
+PATRON_TOKEN = re.compile(
+    rb"\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\)"
+    rb"|<[0-9A-Fa-f\s]*>"
+    rb"|<<|>>|\[|\]"
+    rb"|/[^\s/\[\]()<>{}%]*"
+    rb"|[-+]?(?:\d+\.?\d*|\.\d+)"
+    rb"|[A-Za-z'\"*][A-Za-z0-9'\"*]*",
+    re.S
+)
+PATRON_IMAGEN_EN_LINEA = re.compile(rb'\bBI\b.*?\bID\s.*?\sEI\b', re.S)
+PATRON_ESCAPE = re.compile(rb'\\([nrtbf()\\]|[0-7]{1,3}|\r\n|\r|\n)')
+PATRON_ESPACIOS_HEX = re.compile(rb'\s+')
+PATRON_BFCHAR = re.compile(rb'beginbfchar(.*?)endbfchar', re.S)
+PATRON_BFRANGE = re.compile(rb'beginbfrange(.*?)endbfrange', re.S)
+PATRON_ENTRADA_CMAP = re.compile(rb'<([0-9A-Fa-f\s]*)>|\[|\]')
+
+ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+           b'(': b'(', b')': b')', b'\\': b'\\'}
+CODIFICACIONES_SIMPLES = {None: 'cp1252', '/WinAnsiEncoding': 'cp1252',
+                          '/StandardEncoding': 'latin-1', '/MacRomanEncoding': 'mac_roman',
+                          '/PDFDocEncoding': 'latin-1'}
+IDENTIDAD = (1, 0, 0, 1, 0, 0)
+ANCHO_OMISION = 500
+# Un hueco mayor a esta fracción del tamaño de la fuente se toma como espacio entre palabras
+FRACCION_ESPACIO = 0.2
+# Un cambio vertical mayor a esta fracción del tamaño de la fuente empieza una línea nueva
+FRACCION_LINEA = 0.5
+TOLERANCIA_LINEA = 1.0
+PROFUNDIDAD_FORMULARIOS = 5
+
+class NoSoportado(Exception):
+    """La página usa una fuente que este motor no decodifica"""
+
+def _literal(token):
+    def reemplazar(match):
+        escape = match.group(1)
+        if escape in ESCAPES:
+            return ESCAPES[escape]
+        if escape[:1] in b'\r\n':
+            return b''
+        return bytes([int(escape, 8) & 0xFF])
+    return PATRON_ESCAPE.sub(reemplazar, token[1:-1])
+
+def _hexadecimal(token):
+    digitos = PATRON_ESPACIOS_HEX.sub(b'', token[1:-1])
+    if len(digitos) % 2:
+        digitos += b'0'
+    return bytes.fromhex(digitos.decode('ascii'))
+
+def _unicode(destino, desplazamiento=0):
+    if desplazamiento:
+        valor = int.from_bytes(destino, 'big') + desplazamiento
+        destino = valor.to_bytes(len(destino), 'big')
+    return destino.decode('utf-16-be', errors='ignore')
+
+def leer_cmap(datos):
+    """Mapa código -> texto de un CMap ToUnicode (bfchar y bfrange)"""
+    mapa = {}
+    for seccion in PATRON_BFCHAR.findall(datos):
+        valores = [_hexadecimal(b'<' + h + b'>') for h in PATRON_ENTRADA_CMAP.findall(seccion) if h]
+        for origen, destino in zip(valores[0::2], valores[1::2]):
+            mapa[int.from_bytes(origen, 'big')] = _unicode(destino)
+
+    for seccion in PATRON_BFRANGE.findall(datos):
+        entradas = []
+        lista = None
+        for match in PATRON_ENTRADA_CMAP.finditer(seccion):
+            if match.group(0) == b'[':
+                lista = []
+            elif match.group(0) == b']':
+                entradas.append(lista)
+                lista = None
+            elif lista is not None:
+                lista.append(_hexadecimal(match.group(0)))
+            else:
+                entradas.append(_hexadecimal(match.group(0)))
+        for i in range(0, len(entradas) - 2, 3):
+            bajo, alto, destino = entradas[i:i + 3]
+            bajo, alto = int.from_bytes(bajo, 'big'), int.from_bytes(alto, 'big')
+            if alto < bajo or alto - bajo > 0xFFFF:
+                continue
+            for desplazamiento, codigo in enumerate(range(bajo, alto + 1)):
+                if isinstance(destino, list):
+                    if desplazamiento < len(destino):
+                        mapa[codigo] = _unicode(destino[desplazamiento])
+                else:
+                    mapa[codigo] = _unicode(destino, desplazamiento)
+    return mapa
+
+class Fuente:
+    def __init__(self, diccionario):
+        subtipo = diccionario.get('/Subtype')
+        codificacion = diccionario.get('/Encoding')
+        codificacion = codificacion.get_object() if codificacion is not None else None
+        self.ancho = 2 if subtipo == '/Type0' else 1
+        self.mapa = None
+        self.codec = None
+
+        if '/ToUnicode' in diccionario:
+            self.mapa = leer_cmap(diccionario['/ToUnicode'].get_object().get_data())
+        elif subtipo == '/Type0':
+            # Sin ToUnicode solo Identity-H con códigos Unicode sería legible; no se intenta
+            raise NoSoportado(f"Fuente Type0 sin ToUnicode ({codificacion})")
+
+        if subtipo == '/Type3':
+            raise NoSoportado("Fuente Type3")
+        if self.ancho == 1 and isinstance(codificacion, dict):
+            if '/Differences' in codificacion and self.mapa is None:
+                raise NoSoportado("Codificación con /Differences sin ToUnicode")
+            codificacion = codificacion.get('/BaseEncoding')
+        if self.mapa is None:
+            if codificacion not in CODIFICACIONES_SIMPLES:
+                raise NoSoportado(f"Codificación {codificacion}")
+            self.codec = CODIFICACIONES_SIMPLES[codificacion]
+
+        self.anchos = {}
+        if subtipo == '/Type0':
+            self._leer_anchos_cid(diccionario['/DescendantFonts'].get_object()[0].get_object())
+        else:
+            self._leer_anchos_simples(diccionario)
+
+    def _leer_anchos_simples(self, diccionario):
+        descriptor = diccionario.get('/FontDescriptor')
+        descriptor = descriptor.get_object() if descriptor is not None else {}
+        # Las 14 fuentes estándar pueden no traer /Widths; se usa un ancho promedio
+        self.ancho_omision = float(descriptor.get('/MissingWidth', 0)) or ANCHO_OMISION
+        primero = int(diccionario.get('/FirstChar', 0))
+        anchos = diccionario.get('/Widths')
+        for indice, ancho in enumerate(anchos.get_object() if anchos is not None else ()):
+            self.anchos[primero + indice] = float(ancho)
+
+    def _leer_anchos_cid(self, descendiente):
+        self.ancho_omision = float(descendiente.get('/DW', 1000))
+        anchos = descendiente.get('/W')
+        anchos = list(anchos.get_object()) if anchos is not None else []
+        i = 0
+        while i + 1 < len(anchos):
+            primero = int(anchos[i])
+            siguiente = anchos[i + 1].get_object()
+            if isinstance(siguiente, list):
+                for indice, ancho in enumerate(siguiente):
+                    self.anchos[primero + indice] = float(ancho)
+                i += 2
+            else:
+                if i + 2 >= len(anchos):
+                    break
+                ancho = float(anchos[i + 2])
+                for codigo in range(primero, min(int(siguiente), primero + 0xFFFF) + 1):
+                    self.anchos[codigo] = ancho
+                i += 3
+
+    def codigos(self, datos):
+        if self.ancho == 2:
+            return [(datos[i] << 8) | datos[i + 1] for i in range(0, len(datos) - 1, 2)]
+        return datos
+
+    def decodificar(self, codigos, datos):
+        if self.mapa is None:
+            return datos.decode(self.codec, errors='replace')
+        mapa = self.mapa
+        if self.ancho == 2:
+            return ''.join(mapa.get(c, '') for c in codigos)
+        return ''.join(mapa.get(c) or chr(c) for c in codigos)
+
+    def avance(self, codigos):
+        """Ancho de los glifos en milésimas de em"""
+        anchos = self.anchos
+        omision = self.ancho_omision
+        return sum(anchos.get(c, omision) for c in codigos)
+
+class LectorPagina:
+    """Recorre los content streams de una página (y sus formularios) y arma las líneas"""
+
+    def __init__(self):
+        self.lineas = []
+        self.actual = []
+        self.ultima_y = None
+        self.ultimo_x = None
+        self.fuentes = {}
+
+    def _emitir(self, texto, x, y, x_fin, tamano):
+        if not texto:
+            return
+        if self.ultima_y is None or abs(y - self.ultima_y) > max(tamano * FRACCION_LINEA, TOLERANCIA_LINEA):
+            if self.actual:
+                self.lineas.append(''.join(self.actual))
+            self.actual = []
+        else:
+            hueco = x - self.ultimo_x
+            # Un hueco visible, o un salto hacia atrás en la misma línea, separa palabras
+            if (hueco > tamano * FRACCION_ESPACIO or hueco < -tamano) \
+                    and not self.actual[-1].endswith(' ') and not texto.startswith(' '):
+                self.actual.append(' ')
+        self.actual.append(texto)
+        self.ultima_y = y
+        self.ultimo_x = x_fin
+
+    def _fuente(self, recursos, nombre):
+        fuentes = recursos.get('/Font')
+        fuentes = fuentes.get_object() if fuentes is not None else {}
+        referencia = fuentes.get(nombre)
+        if referencia is None:
+            raise NoSoportado(f"Fuente {nombre} no encontrada")
+        clave = id(referencia.get_object())
+        if clave not in self.fuentes:
+            self.fuentes[clave] = Fuente(referencia.get_object())
+        return self.fuentes[clave]
+
+    def leer(self, datos, recursos, ctm=IDENTIDAD, profundidad=0):
+        datos = PATRON_IMAGEN_EN_LINEA.sub(b'', datos)
+        pila_ctm = []
+        operandos = []
+        marcas = []
+        fuente = None
+        tamano_fuente = 0.0
+        espaciado_caracteres = 0.0
+        espaciado_palabras = 0.0
+        escala_horizontal = 1.0
+        interlineado = 0.0
+        tm = tlm = IDENTIDAD
+
+        def mover(tx, ty):
+            nonlocal tm, tlm
+            a, b, c, d, e, f = tlm
+            tlm = tm = (a, b, c, d, tx * a + ty * c + e, tx * b + ty * d + f)
+
+        def avanzar(tx):
+            nonlocal tm
+            a, b, c, d, e, f = tm
+            tm = (a, b, c, d, tx * a + e, tx * b + f)
+
+        def mostrar(cadena):
+            if fuente is None:
+                raise NoSoportado("Texto sin fuente seleccionada")
+            codigos = fuente.codigos(cadena)
+            texto = fuente.decodificar(codigos, cadena)
+            m = _multiplicar(tm, ctm)
+            tamano = tamano_fuente * (m[2] * m[2] + m[3] * m[3]) ** 0.5
+            espacios = cadena.count(b' ') if fuente.ancho == 1 else 0
+            avanzar((fuente.avance(codigos) / 1000 * tamano_fuente + len(codigos) * espaciado_caracteres
+                     + espacios * espaciado_palabras) * escala_horizontal)
+            self._emitir(texto, m[4], m[5], tm[4] * ctm[0] + tm[5] * ctm[2] + ctm[4], tamano)
+
+        for match in PATRON_TOKEN.finditer(datos):
+            token = match.group(0)
+            inicial = token[:1]
+            if inicial == b'(':
+                operandos.append(_literal(token))
+            elif token == b'<<' or token == b'[':
+                marcas.append(len(operandos))
+            elif token == b'>>' or token == b']':
+                inicio = marcas.pop() if marcas else 0
+                operandos[inicio:] = [operandos[inicio:]]
+            elif inicial == b'<':
+                operandos.append(_hexadecimal(token))
+            elif inicial == b'/':
+                operandos.append(token)
+            elif inicial in b'+-.0123456789':
+                operandos.append(float(token))
+            else:
+                operador = token
+                try:
+                    if operador == b'Tj':
+                        mostrar(operandos[-1])
+                    elif operador == b'TJ':
+                        for elemento in operandos[-1]:
+                            if isinstance(elemento, bytes):
+                                mostrar(elemento)
+                            else:
+                                avanzar(-elemento / 1000 * tamano_fuente * escala_horizontal)
+                    elif operador == b"'":
+                        mover(0, -interlineado)
+                        mostrar(operandos[-1])
+                    elif operador == b'"':
+                        espaciado_palabras, espaciado_caracteres = operandos[-3], operandos[-2]
+                        mover(0, -interlineado)
+                        mostrar(operandos[-1])
+                    elif operador == b'Td':
+                        mover(operandos[-2], operandos[-1])
+                    elif operador == b'TD':
+                        interlineado = -operandos[-1]
+                        mover(operandos[-2], operandos[-1])
+                    elif operador == b'T*':
+                        mover(0, -interlineado)
+                    elif operador == b'TL':
+                        interlineado = operandos[-1]
+                    elif operador == b'Tc':
+                        espaciado_caracteres = operandos[-1]
+                    elif operador == b'Tw':
+                        espaciado_palabras = operandos[-1]
+                    elif operador == b'Tz':
+                        escala_horizontal = operandos[-1] / 100
+                    elif operador == b'Tm':
+                        tm = tlm = tuple(operandos[-6:])
+                    elif operador == b'BT':
+                        tm = tlm = IDENTIDAD
+                    elif operador == b'Tf':
+                        fuente = self._fuente(recursos, operandos[-2].decode('latin-1'))
+                        tamano_fuente = operandos[-1]
+                    elif operador == b'q':
+                        pila_ctm.append(ctm)
+                    elif operador == b'Q':
+                        if pila_ctm:
+                            ctm = pila_ctm.pop()
+                    elif operador == b'cm':
+                        ctm = _multiplicar(tuple(operandos[-6:]), ctm)
+                    elif operador == b'Do' and profundidad < PROFUNDIDAD_FORMULARIOS:
+                        self._formulario(recursos, operandos[-1].decode('latin-1'), ctm, profundidad)
+                except (IndexError, TypeError, AttributeError, ValueError):
+                    # Operandos incompletos: se ignora el operador como lo haría un visor
+                    pass
+                operandos = []
+                marcas = []
+
+    def _formulario(self, recursos, nombre, ctm, profundidad):
+        xobjects = recursos.get('/XObject')
+        xobjects = xobjects.get_object() if xobjects is not None else {}
+        referencia = xobjects.get(nombre)
+        if referencia is None:
+            return
+        formulario = referencia.get_object()
+        if formulario.get('/Subtype') != '/Form':
+            return
+        matriz = tuple(float(v) for v in formulario.get('/Matrix', IDENTIDAD))
+        propios = formulario.get('/Resources')
+        propios = propios.get_object() if propios is not None else recursos
+        self.leer(formulario.get_data(), propios, _multiplicar(matriz, ctm), profundidad + 1)
+
+    def texto(self):
+        if self.actual:
+            self.lineas.append(''.join(self.actual))
+            self.actual = []
+        return '\n'.join(self.lineas)
+
+def _multiplicar(m1, m2):
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + b1 * c2, a1 * b2 + b1 * d2,
+            c1 * a2 + d1 * c2, c1 * b2 + d1 * d2,
+            e1 * a2 + f1 * c2 + e2, e1 * b2 + f1 * d2 + f2)
+
+def _datos_contenido(page):
+    contenido = page.get_contents()
+    if contenido is None:
+        return b''
+    if isinstance(contenido, list):
+        # /Contents puede ser un arreglo de streams que se leen como uno solo
+        return b'\n'.join(parte.get_object().get_data() for parte in contenido)
+    return contenido.get_data()
+
+def texto_pagina(page):
+    """Texto de una página de PyPDF2 leyendo sus operadores; PyPDF2 si la fuente no es soportada"""
+    recursos = page.get('/Resources')
+    recursos = recursos.get_object() if recursos is not None else {}
+    lector = LectorPagina()
+    try:
+        lector.leer(_datos_contenido(page), recursos)
+    except NoSoportado:
+        return page.extract_text() or ""
+    return lector.texto()
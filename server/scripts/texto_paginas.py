@@ -0,0 +1,242 @@
+# Proveedor compartido del texto de las páginas de un PDF.
+# Cada página se extrae una sola vez y, con pdfplumber, se liberan sus objetos
+# de layout en cuanto se obtiene el texto para no acumularlos durante el documento.
+#
+# Motores: pdfplumber (análisis de layout por carácter), pypdf2 y crudo (lectura
+# directa de los operadores de texto, ver texto_crudo.py). Cada parser declara en
+# MOTOR_TEXTO el motor con el que fue validado; TIMANAGER_MOTOR_TEXTO o --motor
+# lo reemplazan para todos ('crudo') o por proveedor ('tvc=crudo,syscom=pypdf2').
+#
+# Con TIMANAGER_PARALELO=N o --paralelo[=N] los documentos de PAGINAS_MINIMAS_PARALELO
+# páginas o más se reparten en rangos de páginas entre N procesos. Los textos se
+# regresan en el orden del documento, así que los parsers reciben lo mismo que en
+# la extracción secuencial (incluidos los productos que cruzan de página).
+#
+# En modo de memoria acotada (memoria_acotada.py) también se liberan los objetos
+# del PDF ya resueltos después de cada página y se vigila el RSS.
+
+import io
+import os
+import sys
+
+import memoria_acotada
+import metricas
+
+MOTORES = ('pdfplumber', 'pypdf2', 'crudo')
+PAGINAS_MINIMAS_PARALELO = 8
+# Páginas mínimas por rango: cada rango vuelve a abrir el PDF en su proceso
+PAGINAS_POR_RANGO = 4
+
+# El PDF puede llegar como ruta o como bytes (entrada estándar o trama del modo
+# --serve). Con bytes se parsea desde un BytesIO, que comparte el buffer del
+# objeto bytes sin copiarlo mientras no se escriba en él.
+
+def es_bytes(origen):
+    return isinstance(origen, (bytes, bytearray, memoryview))
+
+def origen_existe(origen):
+    return es_bytes(origen) or os.path.exists(origen)
+
+def leer_origen(argumento, entrada=None):
+    """'-' lee el PDF completo de la entrada estándar; cualquier otro valor es una ruta"""
+    if argumento == '-':
+        return (entrada or sys.stdin.buffer).read()
+    return argumento
+
+def abrir_origen(origen):
+    """Archivo abierto en modo binario o BytesIO sobre los bytes recibidos"""
+    return io.BytesIO(origen) if es_bytes(origen) else open(origen, 'rb')
+
+def _liberar_pagina(page):
+    # pdfplumber >= 0.10 expone close(); versiones anteriores solo flush_cache()
+    cerrar = getattr(page, 'close', None) or getattr(page, 'flush_cache', None)
+    if cerrar:
+        cerrar()
+
+def _paginas_pdfplumber(archivo_pdf, limite, inicio=0):
+    with metricas.etapa('apertura'):
+        import pdfplumber
+        pdf = pdfplumber.open(io.BytesIO(archivo_pdf) if es_bytes(archivo_pdf) else archivo_pdf)
+    with pdf:
+        with metricas.etapa('apertura'):
+            paginas = pdf.pages[inicio:limite]
+        vigilancia = memoria_acotada.vigilancia(len(paginas))
+        for page in paginas:
+            with metricas.etapa('texto'):
+                texto = page.extract_text() or ""
+                _liberar_pagina(page)
+            if vigilancia:
+                # pdfminer guarda cada objeto resuelto (flujos de contenido e imágenes) hasta cerrar el PDF.
+                # _cached_objs es privado: si otra versión de pdfminer no lo tiene, solo no se libera
+                objetos = getattr(pdf.doc, '_cached_objs', None)
+                if objetos is not None:
+                    objetos.clear()
+                vigilancia.pagina()
+            metricas.contar_pagina(texto)
+            yield texto
+
+def _paginas_pypdf2(archivo_pdf, limite, crudo=False, inicio=0):
+    with abrir_origen(archivo_pdf) as file:
+        with metricas.etapa('apertura'):
+            import PyPDF2
+            pdf_reader = PyPDF2.PdfReader(file)
+            if crudo:
+                from texto_crudo import texto_pagina
+        fin = len(pdf_reader.pages) if limite is None else min(limite, len(pdf_reader.pages))
+        vigilancia = memoria_acotada.vigilancia(max(fin - inicio, 0))
+        for numero in range(inicio, fin):
+            page = pdf_reader.pages[numero]
+            with metricas.etapa('texto'):
+                texto = (texto_pagina(page) if crudo else page.extract_text()) or ""
+            if vigilancia:
+                # Igual que en pdfminer: los objetos resueltos se vuelven a leer si otra página los usa
+                objetos = getattr(pdf_reader, 'resolved_objects', None)
+                if objetos is not None:
+                    objetos.clear()
+                vigilancia.pagina()
+            metricas.contar_pagina(texto)
+            yield texto
+
+def _paginas_secuencial(archivo_pdf, motor, limite=None, inicio=0):
+    if motor == 'pdfplumber':
+        return _paginas_pdfplumber(archivo_pdf, limite, inicio)
+    if motor == 'pypdf2':
+        return _paginas_pypdf2(archivo_pdf, limite, inicio=inicio)
+    if motor == 'crudo':
+        return _paginas_pypdf2(archivo_pdf, limite, crudo=True, inicio=inicio)
+    raise ValueError(f"Motor de texto no soportado: {motor}")
+
+def iterar_paginas(archivo_pdf, motor='pdfplumber', limite=None):
+    """
+    Regresa un iterador con el texto de cada página (cadena vacía si la página no tiene texto)
+    """
+    # Los documentos completos pasan por las capturas de texto (capturas_texto.py)
+    if limite is None and os.environ.get('TIMANAGER_CAPTURAS', '1') != '0':
+        import capturas_texto
+        return capturas_texto.paginas(archivo_pdf, motor, lambda: _decodificar(archivo_pdf, motor, limite))
+    return _decodificar(archivo_pdf, motor, limite)
+
+def _decodificar(archivo_pdf, motor, limite):
+    procesos = procesos_paralelos()
+    # Con memoria acotada no se reparten páginas: cada proceso cargaría su propia copia del PDF
+    if procesos > 1 and not memoria_acotada.acotada():
+        return _paginas_paralelo(archivo_pdf, motor, limite, procesos)
+    return _paginas_secuencial(archivo_pdf, motor, limite)
+
+def textos_paginas(archivo_pdf, motor='pdfplumber', limite=None):
+    """Lista con el texto de cada página"""
+    return list(iterar_paginas(archivo_pdf, motor, limite))
+
+def unir_textos(textos, separador="\n", omitir_vacias=True):
+    """Une el texto de las páginas como lo esperan los parsers"""
+    if omitir_vacias:
+        return separador.join(texto for texto in textos if texto)
+    return separador.join(textos)
+
+def lineas(textos):
+    """
+    Líneas de unir_textos(textos).split('\\n') una por una, sin unir el documento
+    (modo de memoria acotada)
+    """
+    for texto in textos:
+        if texto:
+            yield from texto.split('\n')
+
+def iterar_lineas(archivo_pdf, motor='pdfplumber'):
+    return lineas(iterar_paginas(archivo_pdf, motor))
+
+def texto_completo(archivo_pdf, motor='pdfplumber', separador="\n", omitir_vacias=True):
+    """Texto de todo el documento en una sola cadena"""
+    return unir_textos(iterar_paginas(archivo_pdf, motor), separador, omitir_vacias)
+
+# ==== EXTRACCIÓN EN PARALELO ====
+
+def procesos_paralelos():
+    valor = os.environ.get('TIMANAGER_PARALELO', '').strip().lower()
+    if valor == 'auto':
+        return os.cpu_count() or 1
+    return int(valor) if valor.isdigit() else 1
+
+def contar_paginas(archivo_pdf):
+    import PyPDF2
+    with abrir_origen(archivo_pdf) as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+def rangos_paginas(total, procesos):
+    """Rangos contiguos [inicio, fin); dos por proceso para repartir mejor las páginas pesadas"""
+    tamano = max(PAGINAS_POR_RANGO, -(-total // (procesos * 2)))
+    return [(inicio, min(inicio + tamano, total)) for inicio in range(0, total, tamano)]
+
+def textos_rango(archivo_pdf, motor, inicio, fin):
+    """Se ejecuta en el proceso trabajador: texto de las páginas [inicio, fin)"""
+    return list(_paginas_secuencial(archivo_pdf, motor, fin, inicio))
+
+def _paginas_paralelo(archivo_pdf, motor, limite, procesos):
+    if motor not in MOTORES:
+        raise ValueError(f"Motor de texto no soportado: {motor}")
+    with metricas.etapa('apertura'):
+        total = contar_paginas(archivo_pdf)
+    if limite is not None:
+        total = min(total, limite)
+    if total < PAGINAS_MINIMAS_PARALELO:
+        yield from _paginas_secuencial(archivo_pdf, motor, limite)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    rangos = rangos_paginas(total, procesos)
+    with ProcessPoolExecutor(max_workers=min(procesos, len(rangos))) as pool:
+        futuros = [pool.submit(textos_rango, archivo_pdf, motor, inicio, fin) for inicio, fin in rangos]
+        # Los rangos se entregan en orden; el siguiente ya se está extrayendo mientras se parsea este
+        for futuro in futuros:
+            with metricas.etapa('texto'):
+                textos = futuro.result()
+            for texto in textos:
+                metricas.contar_pagina(texto)
+                yield texto
+
+def _normalizar(proveedor):
+    return " ".join(str(proveedor).lower().replace('_', ' ').split())
+
+def motores_forzados():
+    """Motores de TIMANAGER_MOTOR_TEXTO por proveedor; la clave '*' aplica a todos"""
+    forzados = {}
+    for parte in os.environ.get('TIMANAGER_MOTOR_TEXTO', '').split(','):
+        if not parte.strip():
+            continue
+        proveedor, _, motor = parte.rpartition('=')
+        motor = motor.strip().lower()
+        if motor not in MOTORES:
+            raise ValueError(f"Motor de texto no soportado: {motor}")
+        forzados[_normalizar(proveedor) or '*'] = motor
+    return forzados
+
+def motor_forzado(proveedor):
+    """Motor configurado para el proveedor o None si usa el que declara su parser"""
+    forzados = motores_forzados()
+    return forzados.get(_normalizar(proveedor)) or forzados.get('*')
+
+def motor_para(proveedor, declarado):
+    return motor_forzado(proveedor) or declarado
+
+def forzar_motor(valor):
+    """Aplica un valor como el de TIMANAGER_MOTOR_TEXTO en este proceso y en sus hijos"""
+    os.environ['TIMANAGER_MOTOR_TEXTO'] = valor
+
+def activar_paralelo(procesos):
+    """Aplica un valor como el de TIMANAGER_PARALELO (número de procesos o 'auto')"""
+    os.environ['TIMANAGER_PARALELO'] = str(procesos)
+
+def configurar(argumentos):
+    """
+    Quita --motor=<valor> y --paralelo[=N] de los argumentos y los aplica;
+    regresa los argumentos restantes
+    """
+    restantes = []
+    for argumento in argumentos:
+        if argumento.startswith('--motor='):
+            forzar_motor(argumento.split('=', 1)[1])
+        elif argumento == '--paralelo' or argumento.startswith('--paralelo='):
+            activar_paralelo(argumento.partition('=')[2] or 'auto')
+        else:
+            restantes.append(argumento)
+    return restantes
@@ -0,0 +1,22 @@
+import os
+import sys
+
+# Punto de entrada único de los extractores de cotizaciones:
+#
+#   python -m timanager_extract <proveedor|auto> archivo.pdf|-
+#   python -m timanager_extract --serve
+#
+# Los scripts de cada proveedor siguen en server/scripts (el servidor Node los
+# llama por ruta); este paquete los registra sin importarlos. Solo se importa el
+# módulo del proveedor pedido, y pdfplumber/PyPDF2 hasta que se lee el PDF, así
+# que una respuesta desde la caché no carga ninguna biblioteca de PDF.
+
+DIRECTORIO_SCRIPTS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DIRECTORIO_SCRIPTS not in sys.path:
+    sys.path.insert(0, DIRECTORIO_SCRIPTS)
+
+from extractores import (
+    EXTRACTORES, cargar_extractor, detectar_proveedor, extraer, main, normalizar_proveedor,
+)
+
+__all__ = ['EXTRACTORES', 'cargar_extractor', 'detectar_proveedor', 'extraer', 'main', 'normalizar_proveedor']
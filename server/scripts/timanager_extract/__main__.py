@@ -0,0 +1,4 @@
+from timanager_extract import main
+
+if __name__ == "__main__":
+    main('python -m timanager_extract')